@@ -4,7 +4,7 @@ import json
 from typing import List, Optional
 import feedparser
 from datetime import datetime, timedelta
-from fastapi import FastAPI, HTTPException, Response
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import threading
@@ -15,11 +15,14 @@ import logging
 PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
+from db.database import request_session
 from services.portfolio_service import get_all_holdings
-from services.price_service_v5 import get_live_values_for_holdings, clear_cache
+from services.price_service_v5 import clear_cache
 from intelligence.engine import IntelligenceEngine
 from intelligence.engine import IntelligenceEngine
 from intelligence.memory.json_memory import JsonVectorMemory
+from services.embedding_service import get_stats as embedding_stats
+from services.portfolio_model import portfolio_model
 from services.council import council # Singleton instance
 
 import logging
@@ -59,6 +62,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def db_session_per_request(request: Request, call_next):
+    """One DB session shared by all service calls of a request (opened on first use)."""
+    with request_session():
+        return await call_next(request)
+
 @app.get("/api/logs")
 def get_logs():
     return {"logs": list(log_buffer)}
@@ -71,11 +80,12 @@ def background_price_refresher():
         try:
             # Wait for any initial startup activity to settle
             logger.info("🔄 Starting periodic price refresh...")
-            holdings = get_all_holdings()
-            if holdings:
-                # This call updates the persistent JSON cache internally
-                get_live_values_for_holdings(holdings)
-                logger.info(f"✅ Background refresh completed for {len(holdings)} holdings.")
+            portfolio_model.ensure_loaded()
+            if portfolio_model.holdings:
+                # Updates the persistent price cache and re-values only what moved
+                changed = portfolio_model.refresh_prices()
+                changed += portfolio_model.refresh_fx()
+                logger.info(f"✅ Background refresh completed for {len(portfolio_model.holdings)} holdings ({changed} changed).")
             else:
                 logger.info("ℹ️ No holdings found to refresh.")
             
@@ -104,6 +114,29 @@ def startup_event():
     except Exception as e:
         logger.warning(f"Scheduler failed to start: {e}")
 
+@app.on_event("startup")
+async def start_live_alerts_event():
+    # Price alerts fire on quote ticks (event bus); needs the running loop
+    try:
+        from services.alert_engine import start_live_alerts
+        await start_live_alerts()
+    except Exception as e:
+        logger.warning(f"Live alerts failed to start: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    try:
+        from services.scheduler_service import stop_scheduler
+        stop_scheduler()
+    except Exception as e:
+        logger.warning(f"Scheduler failed to stop: {e}")
+    
+    from services.alert_engine import stop_live_alerts
+    stop_live_alerts()
+    
+    from services.async_runtime import shutdown
+    await shutdown()
+
 @app.delete("/api/logs")
 def clear_logs():
     log_buffer.clear()
@@ -214,7 +247,6 @@ class CouncilRequest(BaseModel):
     query: Optional[str] = None
 
 # --- PERSISTENCE HELPERS ---
-PORTFOLIO_SNAPSHOT = PROJECT_ROOT / "data" / "portfolio_snapshot.json"
 INTELLIGENCE_SNAPSHOT = PROJECT_ROOT / "data" / "intelligence_snapshot.json"
 
 def _save_snapshot(path: Path, data: dict):
@@ -236,130 +268,8 @@ def _load_snapshot(path: Path):
     return None
 
 def build_portfolio_data():
-    """Calculate complete portfolio data (heavy operation)."""
-    holdings = get_all_holdings()
-    if not holdings:
-        return {"holdings": [], "totals": {}, "total_value": 0}
-        
-    live_data = get_live_values_for_holdings(holdings)
-    
-    # Calculate Totals
-    broker_totals = {}
-    processed_holdings = []
-    total_day_pl = 0
-
-    for h in holdings:
-        hid = h["id"]
-        ld = live_data.get(hid, {})
-
-        # Calculate fallback cost basis from DB
-        db_cost = float(h.get("quantity", 0) or 0) * float(h.get("purchase_price", 0) or 0)
-        
-        # Merge live data into holding
-        h_data = {
-            **h,
-            "quantity": float(h.get("quantity", 0) or 0),
-            "live_price": ld.get("live_price") or h.get("current_price") or 0,
-            "current_value": ld.get("live_value") or h.get("current_value") or 0,
-            "cost_basis": ld.get("cost_basis") or db_cost,
-            "source": ld.get("source", "DB"),
-            "native_current_value": ld.get("native_current_value"),
-            "exchange_rate_used": ld.get("exchange_rate_used"),
-        }
-        
-        # Recalculate P&L if not in ld or if we had to fallback to DB cost
-        if "pnl" in ld:
-            h_data["pnl"] = ld["pnl"]
-            h_data["pnl_pct"] = ld["pnl_pct"]
-        else:
-            h_data["pnl"] = h_data["current_value"] - h_data["cost_basis"]
-            h_data["pnl_pct"] = (h_data["pnl"] / h_data["cost_basis"] * 100) if h_data["cost_basis"] > 0 else 0
-
-        h_data["day_pl"] = ld.get("day_pl") or 0
-        h_data["day_change_pct"] = ld.get("day_change_pct") or 0
-        
-        processed_holdings.append(h_data)
-        total_day_pl += h_data["day_pl"]
-
-        # Aggregation
-        broker = h["broker"]
-        if broker not in broker_totals:
-            broker_totals[broker] = {"value": 0, "cost": 0, "day_pl": 0}
-
-        broker_totals[broker]["value"] += h_data["current_value"]
-        broker_totals[broker]["day_pl"] += h_data["day_pl"]
-
-        # Use pre-calculated cost basis from service (handles FX)
-        cost = ld.get("cost_basis", 0)
-        if cost == 0 and h["quantity"] and h["purchase_price"]:
-            cost = h["quantity"] * h["purchase_price"]
-
-        broker_totals[broker]["cost"] += cost
-
-    total_value = sum(b["value"] for b in broker_totals.values())
-    total_cost = sum(b["cost"] for b in broker_totals.values())
-    total_pnl = total_value - total_cost
-    total_pnl_pct = (total_pnl / total_cost * 100) if total_cost > 0 else 0
-    total_day_change_pct = (
-        (total_day_pl / (total_value - total_day_pl) * 100)
-        if (total_value - total_day_pl) > 0
-        else 0
-    )
-
-    # Post-process Broker Totals for Percentages
-    for bname, bstats in broker_totals.items():
-        bstats["pnl"] = bstats["value"] - bstats["cost"]
-        bstats["pnl_pct"] = (
-            (bstats["pnl"] / bstats["cost"] * 100) if bstats["cost"] > 0 else 0
-        )
-        prev_value = bstats["value"] - bstats["day_pl"]
-        bstats["day_change_pct"] = (
-            (bstats["day_pl"] / prev_value * 100) if prev_value > 0 else 0
-        )
-
-    # Asset Allocation
-    asset_totals = {}
-    for h in processed_holdings:
-        atype = h.get("asset_type", "Unknown")
-        if atype not in asset_totals:
-            asset_totals[atype] = 0
-        asset_totals[atype] += h["current_value"]
-
-    # Fetch latest FX rates for frontend currency toggle
-    try:
-        from services.forex_service import get_exchange_rate
-        usd_rate = get_exchange_rate("EUR", "USD")
-        gbp_rate = get_exchange_rate("EUR", "GBP")
-        chf_rate = get_exchange_rate("EUR", "CHF")
-        print(f"DEBUG_MAIN: FX Rates fetched: USD={usd_rate}, GBP={gbp_rate}, CHF={chf_rate}")
-        fx_rates = {
-            "EUR": 1.0,
-            "USD": float(usd_rate),
-            "GBP": float(gbp_rate),
-            "CHF": float(chf_rate)
-        }
-    except Exception as e:
-        import traceback
-        print(f"FX Rate fetch error: {e}")
-        traceback.print_exc()
-        fx_rates = {"EUR": 1.0, "USD": 1.05} # Fallback
-
-    data = {
-        "holdings": processed_holdings,
-        "broker_totals": broker_totals,
-        "asset_totals": asset_totals,
-        "total_value": total_value,
-        "total_cost": total_cost,
-        "total_pnl": total_pnl,
-        "total_pnl_pct": total_pnl_pct,
-        "total_day_pl": total_day_pl,
-        "total_day_change_pct": total_day_change_pct,
-        "count": len(holdings),
-        "last_updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "fx_rates": fx_rates,
-    }
-    _save_snapshot(PORTFOLIO_SNAPSHOT, data)
-    return data
+    """Full recomputation of the in-process portfolio model (heavy operation)."""
+    return portfolio_model.rebuild()
 
 from datetime import datetime, timedelta
 
@@ -448,13 +358,11 @@ def create_transaction_endpoint(request: TransactionRequest):
         from services.transaction_service import log_transaction
         result = log_transaction(request.dict())
         
-        # Invalidate Portfolio Snapshot to force rebuild on next fetch
-        if PORTFOLIO_SNAPSHOT.exists():
-            try:
-                PORTFOLIO_SNAPSHOT.unlink()
-                logger.info("Invalidated portfolio snapshot")
-            except Exception as e:
-                logger.warning(f"Failed to delete snapshot: {e}")
+        # Re-value only the holdings touched by the transaction
+        try:
+            portfolio_model.sync_holdings()
+        except Exception as e:
+            logger.warning(f"Failed to sync portfolio model: {e}")
 
         return result
     except Exception as e:
@@ -499,7 +407,7 @@ def trigger_background_refresh():
     
     def run_refresh():
         try:
-            build_portfolio_data()
+            portfolio_model.refresh_prices()
             logger.info("✅ Background refresh finished.")
         except Exception as e:
             logger.error(f"❌ Background refresh failed: {e}")
@@ -508,36 +416,20 @@ def trigger_background_refresh():
     thread.start()
 
 @app.get("/api/portfolio")
-def get_portfolio():
+def get_portfolio(request: Request):
     try:
-        # 1. Try to load existing snapshot (FAST!)
-        data = _load_snapshot(PORTFOLIO_SNAPSHOT)
-        
-        # 2. Check if we need to refresh in background
-        should_refresh = False
-        if not data:
-            # First run ever: Blocking build (slow but necessary)
-            logger.info("First run: Building portfolio synchronously...")
-            return build_portfolio_data()
-        
-        # Check staleness
-        last_updated_str = data.get("last_updated")
-        if last_updated_str:
-            try:
-                last_updated = datetime.strptime(last_updated_str, "%Y-%m-%d %H:%M:%S")
-                # If data is older than 2 minutes, trigger refresh
-                if datetime.now() - last_updated > timedelta(minutes=2):
-                    should_refresh = True
-            except ValueError:
-                should_refresh = True
-        else:
-             should_refresh = True
-             
-        if should_refresh:
+        # Served from memory; first run ever builds synchronously (slow but necessary)
+        portfolio_model.ensure_loaded()
+
+        # If prices are older than 2 minutes, refresh in background
+        if portfolio_model.age_seconds() > timedelta(minutes=2).total_seconds():
             trigger_background_refresh()
-            
-        return data
-        
+
+        body, etag = portfolio_model.payload()
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
     except Exception as e:
         logger.error(f"Portfolio Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -625,10 +517,9 @@ def debug_cleanup():
 
             db.commit()
             
-            # Invalidate Snapshot
-            if PORTFOLIO_SNAPSHOT.exists():
-                PORTFOLIO_SNAPSHOT.unlink()
-                logs.append("Snapshot deleted")
+            # Re-value the reverted holdings
+            touched = portfolio_model.sync_holdings()
+            logs.append(f"Portfolio model synced ({touched} holdings)")
             
             return {"status": "Cleaned", "logs": logs}
         except Exception as e:
@@ -660,9 +551,8 @@ def run_ingestion():
         )
         logger.info(f"Ingestion Output: {result.stdout}")
         
-        # Invalidate Portfolio Snapshot
-        if PORTFOLIO_SNAPSHOT.exists():
-            PORTFOLIO_SNAPSHOT.unlink()
+        # DB was wiped & reloaded: full rebuild of the portfolio model
+        build_portfolio_data()
             
         return {"status": "success", "logs": result.stdout}
         
@@ -677,9 +567,8 @@ def run_ingestion():
 def export_portfolio_csv():
     """Export portfolio holdings as CSV file."""
     try:
-        data = _load_snapshot(PORTFOLIO_SNAPSHOT)
-        if not data:
-            data = build_portfolio_data()
+        portfolio_model.ensure_loaded()
+        data = portfolio_model.to_dict()
         
         holdings = data.get("holdings", [])
         
@@ -759,7 +648,7 @@ def run_scan(request: IntelligenceScanRequest):
         # Rebuild snapshot to include new items
         build_intelligence_data()
         
-        return {"new_items": len(new_items), "items": new_items}
+        return {"new_items": len(new_items), "items": new_items, "scan": engine.last_scan}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -807,7 +696,7 @@ def delete_source(handle: str):
 
 @app.get("/api/status")
 def health_check():
-    return {"status": "online", "version": "0.5.0"}
+    return {"status": "online", "version": "0.5.0", "embeddings": embedding_stats()}
 
 if __name__ == "__main__":
     import uvicorn
@@ -853,12 +742,12 @@ async def refresh_council_item(request: RefreshItemRequest):
 @app.get("/api/council/history")
 async def get_council_history():
     """Returns a list of dates ("YYYY-MM-DD") that have archived Council Sessions."""
-    return council.get_session_history()
+    return await council.get_session_history()
 
 @app.get("/api/council/models")
 async def get_council_models():
     """Returns a list of available AI models from Ollama."""
-    return council.get_available_ollama_models()
+    return await council.get_available_ollama_models()
 
 @app.get("/api/council/session/{date_str}")
 async def get_council_session_by_date(date_str: str):
@@ -866,7 +755,7 @@ async def get_council_session_by_date(date_str: str):
     try:
         from datetime import date
         target_date = date.fromisoformat(date_str)
-        session = council.get_session_by_date(target_date)
+        session = await council.get_session_by_date(target_date)
         
         if not session:
              raise HTTPException(status_code=404, detail="No session found for this date")
@@ -976,6 +865,16 @@ def save_snapshot():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/analytics/backfill")
+def backfill_history(overwrite: bool = False):
+    """Rebuild daily snapshots from transactions x historical prices (missing days only unless overwrite)."""
+    try:
+        from services.nav_engine import nav_engine
+        written = nav_engine.backfill_snapshots(overwrite=overwrite)
+        return {"status": "ok", "days_written": written}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/analytics/history")
 def get_portfolio_history_endpoint(days: int = 30):
     """Get portfolio value history for the last N days."""
@@ -995,11 +894,11 @@ def get_benchmarks_endpoint(days: int = 30):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/analytics/risk-metrics")
-def get_risk_metrics_endpoint():
-    """Get risk metrics: Sharpe ratio, volatility, max drawdown."""
+def get_risk_metrics_endpoint(days: int = 365):
+    """Get risk metrics: Sharpe/Sortino, volatility, drawdowns, VaR/CVaR, betas, contributions."""
     try:
         from services.analytics_service import calculate_risk_metrics
-        return calculate_risk_metrics()
+        return calculate_risk_metrics(days=days)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1016,11 +915,11 @@ def get_latest_snapshot_endpoint():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/analytics/invested-history")
-def get_invested_history_endpoint():
-    """Get historical net invested capital."""
+def get_invested_history_endpoint(by_broker: bool = False):
+    """Get historical net invested capital (EUR), optionally split per broker."""
     try:
         from services.analytics_service import get_invested_capital_history
-        return get_invested_capital_history()
+        return get_invested_capital_history(by_broker=by_broker)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1048,11 +947,13 @@ def generate_pdf_report_endpoint():
 
 
 @app.get("/api/analytics/correlation")
-def get_correlation_matrix_endpoint():
-    """Get correlation matrix of top holdings."""
+def get_correlation_matrix_endpoint(top_n: int = 15, window: int = 365, method: str = "pearson"):
+    """Get correlation matrix of top holdings (top_n=0: all holdings, method: pearson | ewma)."""
     try:
         from services.analytics_service import calculate_correlation_matrix
-        return calculate_correlation_matrix()
+        return calculate_correlation_matrix(top_n=top_n or None, window=window, method=method)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Correlation Endpoint Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,7 +1,10 @@
 """
 WAR ROOM - Database Package
 """
-from db.database import Base, engine, SessionLocal, get_db, init_db
+from db.database import (
+    Base, engine, SessionLocal, AsyncSessionLocal, get_db, get_async_db, init_db,
+    request_session, session_scope
+)
 from db.models import (
     Holding,
     Transaction,
@@ -12,8 +15,12 @@ __all__ = [
     "Base",
     "engine", 
     "SessionLocal",
+    "AsyncSessionLocal",
     "get_db",
+    "get_async_db",
     "init_db",
+    "request_session",
+    "session_scope",
     "Holding",
     "Transaction",
     "ImportLog"
@@ -0,0 +1,45 @@
+"""
+Migration: Add holding batches (atomic holdings snapshot swap)
+Creates the holding_batches table and adds holdings.import_batch_id.
+
+Run: python db/migrations/add_holding_batches.py
+"""
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from sqlalchemy import text
+from db.database import engine
+from db.models import HoldingBatch
+
+
+def upgrade():
+    """Create holding_batches and holdings.import_batch_id"""
+    print("🔄 Adding holding batches...")
+
+    HoldingBatch.__table__.create(bind=engine, checkfirst=True)
+    print("  + Table holding_batches")
+
+    with engine.connect() as conn:
+        conn.execute(text("ALTER TABLE holdings ADD COLUMN IF NOT EXISTS import_batch_id UUID"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_holdings_import_batch ON holdings (import_batch_id)"))
+        conn.commit()
+    print("✅ Migration completed: holding_batches + holdings.import_batch_id")
+
+
+def downgrade():
+    """Drop holding_batches and holdings.import_batch_id"""
+    print("🔄 Removing holding batches...")
+
+    with engine.connect() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS idx_holdings_import_batch"))
+        conn.execute(text("ALTER TABLE holdings DROP COLUMN IF EXISTS import_batch_id"))
+        conn.execute(text("DROP TABLE IF EXISTS holding_batches"))
+        conn.commit()
+    print("✅ Migration rolled back: Removed holding batches")
+
+
+if __name__ == "__main__":
+    upgrade()
@@ -0,0 +1,55 @@
+"""
+Migration: Unique content hash on import_log
+Creates the unique index on import_log.file_hash used by the document
+registry (Gatekeeper duplicate skip) and DataLoader.log_import (upsert).
+
+Older duplicate hashes keep only their latest entry; the others are set
+to NULL (rows are kept). Rows logged before this change have no hash:
+their files are not in the inbox anymore, nothing to backfill.
+
+Run: python db/migrations/add_import_log_hash_index.py
+"""
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from sqlalchemy import text
+from db.database import engine
+
+
+def upgrade():
+    """Deduplicate and index import_log.file_hash"""
+    print("🔄 Adding unique index on import_log.file_hash...")
+
+    with engine.connect() as conn:
+        result = conn.execute(text(
+            "UPDATE import_log SET file_hash = NULL WHERE id IN ("
+            "  SELECT id FROM ("
+            "    SELECT id, ROW_NUMBER() OVER (PARTITION BY file_hash ORDER BY import_timestamp DESC, id) AS rn"
+            "    FROM import_log WHERE file_hash IS NOT NULL"
+            "  ) ranked WHERE rn > 1"
+            ")"
+        ))
+        print(f"  + Cleared {result.rowcount} duplicate hashes")
+
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_import_log_file_hash ON import_log (file_hash)"
+        ))
+        conn.commit()
+        print("✅ Migration completed: import_log.file_hash unique index")
+
+
+def downgrade():
+    """Drop the unique index"""
+    print("🔄 Removing unique index on import_log.file_hash...")
+
+    with engine.connect() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS uq_import_log_file_hash"))
+        conn.commit()
+        print("✅ Migration rolled back: Removed uq_import_log_file_hash")
+
+
+if __name__ == "__main__":
+    upgrade()
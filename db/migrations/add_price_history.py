@@ -0,0 +1,40 @@
+"""
+Migration: Add local price history store
+Creates price_history (daily OHLC, PK symbol + date) and price_history_ranges
+(downloaded range per symbol) used by services/price_history.py.
+
+Run: python db/migrations/add_price_history.py
+"""
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from sqlalchemy import text
+from db.database import engine
+from db.models import PriceHistory, PriceHistoryRange
+
+
+def upgrade():
+    """Create price_history and price_history_ranges"""
+    print("🔄 Adding price history store...")
+
+    PriceHistory.__table__.create(bind=engine, checkfirst=True)
+    PriceHistoryRange.__table__.create(bind=engine, checkfirst=True)
+    print("✅ Migration completed: price_history + price_history_ranges")
+
+
+def downgrade():
+    """Drop the price history store"""
+    print("🔄 Removing price history store...")
+
+    with engine.connect() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS price_history_ranges"))
+        conn.execute(text("DROP TABLE IF EXISTS price_history"))
+        conn.commit()
+    print("✅ Migration rolled back: Removed price history store")
+
+
+if __name__ == "__main__":
+    upgrade()
@@ -0,0 +1,72 @@
+"""
+Migration: Add fingerprint (natural-key hash) to transactions table
+Adds the fingerprint column, backfills it for existing rows and creates the
+unique index used by DataLoader.load_transactions (INSERT ... ON CONFLICT DO NOTHING).
+
+Existing duplicates keep fingerprint NULL (reported, not deleted).
+
+Run: python db/migrations/add_transaction_fingerprint.py
+"""
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from sqlalchemy import text
+from db.database import engine
+from ingestion.pipeline.data_loader import assign_fingerprints
+
+
+def upgrade():
+    """Add, backfill and index transactions.fingerprint"""
+    print("🔄 Adding fingerprint to transactions table...")
+
+    with engine.connect() as conn:
+        conn.execute(text("ALTER TABLE transactions ADD COLUMN IF NOT EXISTS fingerprint VARCHAR(64)"))
+
+        rows = conn.execute(text(
+            "SELECT id, broker, ticker, isin, operation, quantity, total_amount, timestamp, "
+            "source_page, source_document FROM transactions "
+            "WHERE fingerprint IS NULL ORDER BY source_document, created_at, id"
+        )).mappings().all()
+
+        # Fingerprints are numbered per source document, like a fresh load of that file
+        by_document = {}
+        for row in rows:
+            by_document.setdefault(row["source_document"], []).append(dict(row))
+
+        taken = {fp for (fp,) in conn.execute(text("SELECT fingerprint FROM transactions WHERE fingerprint IS NOT NULL"))}
+        updates, duplicates = [], 0
+        for doc_rows in by_document.values():
+            for row in assign_fingerprints(doc_rows):
+                if row["fingerprint"] in taken:
+                    duplicates += 1
+                    continue
+                taken.add(row["fingerprint"])
+                updates.append({"id": row["id"], "fp": row["fingerprint"]})
+
+        if updates:
+            conn.execute(text("UPDATE transactions SET fingerprint = :fp WHERE id = :id"), updates)
+        print(f"  + Backfilled {len(updates)} rows ({duplicates} duplicates left without fingerprint)")
+
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_transactions_fingerprint ON transactions (fingerprint)"
+        ))
+        conn.commit()
+        print("✅ Migration completed: transactions.fingerprint + unique index")
+
+
+def downgrade():
+    """Drop the fingerprint index and column"""
+    print("🔄 Removing fingerprint from transactions table...")
+
+    with engine.connect() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS uq_transactions_fingerprint"))
+        conn.execute(text("ALTER TABLE transactions DROP COLUMN IF EXISTS fingerprint"))
+        conn.commit()
+        print("✅ Migration rolled back: Removed transactions.fingerprint")
+
+
+if __name__ == "__main__":
+    upgrade()
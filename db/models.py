@@ -55,6 +55,7 @@ class Holding(Base):
     # Tracking
     last_updated: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     source_document: Mapped[Optional[str]] = mapped_column(String(255))  # File name
+    import_batch_id: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True))  # holding_batches.id
     notes: Mapped[Optional[str]] = mapped_column(Text)
     
     # Asset metadata (propagated from Transactions for valuation)
@@ -71,6 +72,35 @@ class Holding(Base):
         Index("idx_holdings_broker", "broker"),
         Index("idx_holdings_ticker", "ticker"),
         Index("idx_holdings_broker_ticker", "broker", "ticker"),
+        Index("idx_holdings_import_batch", "import_batch_id"),
+    )
+
+
+# ============================================================
+# HOLDING BATCHES - Imported holdings sets per broker
+# ============================================================
+class HoldingBatch(Base):
+    """
+    One imported holdings set of a broker (see services/holdings_snapshot.py).
+    The ACTIVE batch is what the holdings table contains; the PREVIOUS one keeps
+    its rows in `positions` for instant rollback.
+    """
+    __tablename__ = "holding_batches"
+    
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
+    )
+    broker: Mapped[str] = mapped_column(String(50), nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False)  # ACTIVE, PREVIOUS
+    source_document: Mapped[Optional[str]] = mapped_column(String(255))
+    row_count: Mapped[int] = mapped_column(Integer, default=0)
+    positions: Mapped[Optional[list]] = mapped_column(JSONB)  # Holdings rows, kept while PREVIOUS
+    
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    activated_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    
+    __table_args__ = (
+        Index("idx_holding_batches_broker_status", "broker", "status"),
     )
 
 
@@ -114,6 +144,7 @@ class Transaction(Base):
     # Source tracking
     source_document: Mapped[Optional[str]] = mapped_column(String(255))  # File name
     source_page: Mapped[Optional[int]] = mapped_column(Integer)  # Page number in document
+    fingerprint: Mapped[Optional[str]] = mapped_column(String(64))  # Natural-key hash for dedup (see data_loader)
     
     # Metadata
     notes: Mapped[Optional[str]] = mapped_column(Text)
@@ -130,6 +161,7 @@ class Transaction(Base):
         Index("idx_transactions_broker", "broker"),
         Index("idx_transactions_ticker", "ticker"),
         Index("idx_transactions_timestamp", "timestamp"),
+        Index("uq_transactions_fingerprint", "fingerprint", unique=True),
     )
 
 
@@ -149,7 +181,7 @@ class ImportLog(Base):
     broker: Mapped[str] = mapped_column(String(50), nullable=False)
     filename: Mapped[str] = mapped_column(String(255), nullable=False)
     file_path: Mapped[Optional[str]] = mapped_column(String(500))
-    file_hash: Mapped[Optional[str]] = mapped_column(String(64))  # SHA256 to detect duplicates
+    file_hash: Mapped[Optional[str]] = mapped_column(String(64))  # SHA256 to detect duplicates (unique, see DocumentRegistry)
     
     import_timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     
@@ -163,6 +195,7 @@ class ImportLog(Base):
     __table_args__ = (
         Index("idx_import_log_broker", "broker"),
         Index("idx_import_log_filename", "filename"),
+        Index("uq_import_log_file_hash", "file_hash", unique=True),
     )
 
 
@@ -278,6 +311,39 @@ class PortfolioSnapshot(Base):
     )
 
 
+# ============================================================
+# PRICE HISTORY - Local daily OHLC store (see services/price_history.py)
+# ============================================================
+class PriceHistory(Base):
+    """
+    Daily bar of a Yahoo symbol (split/dividend adjusted, like yf auto_adjust=True).
+    Shared by benchmarks, correlation, risk metrics and backtests.
+    """
+    __tablename__ = "price_history"
+
+    symbol: Mapped[str] = mapped_column(String(30), primary_key=True)
+    date: Mapped[date] = mapped_column(Date, primary_key=True)
+
+    open: Mapped[Optional[float]] = mapped_column(Float)
+    high: Mapped[Optional[float]] = mapped_column(Float)
+    low: Mapped[Optional[float]] = mapped_column(Float)
+    close: Mapped[float] = mapped_column(Float, nullable=False)
+    volume: Mapped[Optional[float]] = mapped_column(Float)
+
+
+class PriceHistoryRange(Base):
+    """
+    Date range already downloaded for a symbol: only dates outside it are fetched.
+    first_date/last_date stay NULL while Yahoo returned nothing (retried after the TTL).
+    """
+    __tablename__ = "price_history_ranges"
+
+    symbol: Mapped[str] = mapped_column(String(30), primary_key=True)
+    first_date: Mapped[Optional[date]] = mapped_column(Date)
+    last_date: Mapped[Optional[date]] = mapped_column(Date)
+    fetched_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
 class IngestionBatch(Base):
     __tablename__ = "ingestion_batches"
 
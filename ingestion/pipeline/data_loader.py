@@ -4,6 +4,7 @@ Normalizes data and loads into SQLite database.
 """
 import sys
 import re
+import hashlib
 from pathlib import Path
 from datetime import datetime, date
 from decimal import Decimal, InvalidOperation
@@ -13,8 +14,11 @@ import logging
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
+from sqlalchemy import func
+
 from db.database import SessionLocal
-from db.models import Holding, Transaction, ImportLog
+from db.models import Transaction, ImportLog
+from services.holdings_snapshot import swap_holdings
 import uuid
 
 logger = logging.getLogger(__name__)
@@ -188,6 +192,104 @@ def validate_isin(value: str) -> Optional[str]:
     return None
 
 
+# =============================================================================
+# TRANSACTION FINGERPRINT
+# =============================================================================
+
+# Rows per multi-row INSERT (keeps bind parameters well below driver limits)
+BULK_INSERT_CHUNK = 1000
+
+
+def _fp_number(value: Any, places: int) -> str:
+    """
+    Canonical text for a number at the column's scale:
+    10, 10.0 and Decimal('10.00') all give '10'.
+    """
+    if value is None:
+        return ''
+    d = Decimal(str(value)).quantize(Decimal(1).scaleb(-places)).normalize()
+    return format(d, 'f') if d != 0 else '0'
+
+
+def transaction_fingerprint(
+    broker: str,
+    tx_date: Optional[date],
+    ticker: Optional[str],
+    isin: Optional[str],
+    operation: str,
+    quantity: Any,
+    total_amount: Any,
+    source_page: Optional[int] = None,
+    occurrence: int = 0
+) -> str:
+    """
+    Deterministic natural key of a transaction (SHA-256 hex).
+    `occurrence` separates genuinely identical rows of the same statement
+    (2nd identical row -> 1, ...), so re-importing the file still dedups them.
+    """
+    parts = [
+        (broker or '').upper(),
+        tx_date.isoformat() if tx_date else '',
+        (isin or ticker or '').upper(),
+        operation or '',
+        _fp_number(quantity, 8),       # DECIMAL(18, 8)
+        _fp_number(total_amount, 2),   # DECIMAL(18, 2)
+        str(source_page) if source_page is not None else '',
+    ]
+    if occurrence:
+        parts.append(f"#{occurrence}")
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def assign_fingerprints(rows: List[Dict]) -> List[Dict]:
+    """
+    Set row['fingerprint'] on Transaction column dicts of ONE statement/load,
+    numbering identical natural keys in order of appearance.
+    """
+    seen: Dict[str, int] = {}
+    for row in rows:
+        ts = row.get('timestamp')
+        key = (
+            row['broker'], ts.date() if ts else None, row.get('ticker'), row.get('isin'),
+            row['operation'], row.get('quantity'), row.get('total_amount'), row.get('source_page')
+        )
+        base = transaction_fingerprint(*key)
+        occurrence = seen.get(base, 0)
+        seen[base] = occurrence + 1
+        row['fingerprint'] = transaction_fingerprint(*key, occurrence=occurrence) if occurrence else base
+    return rows
+
+
+def bulk_insert_transactions(session, rows: List[Dict], chunk_size: int = BULK_INSERT_CHUNK) -> int:
+    """
+    Multi-row INSERT ... ON CONFLICT (fingerprint) DO NOTHING.
+    Rows must carry 'id' and 'fingerprint'. Returns the number of rows actually inserted.
+    Does not commit.
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Bulk transaction insert not supported on {dialect}")
+
+    if not rows:
+        return 0
+
+    # executemany + RETURNING: SQLAlchemy renders pages of `chunk_size` rows
+    # into single multi-row INSERT statements ("insertmanyvalues"), compiled once
+    stmt = (
+        insert(Transaction.__table__)
+        .on_conflict_do_nothing(index_elements=['fingerprint'])
+        .returning(Transaction.__table__.c.id)
+    )
+    result = session.connection().execute(
+        stmt.execution_options(insertmanyvalues_page_size=chunk_size), rows
+    )
+    return len(result.fetchall())
+
+
 # =============================================================================
 # DATA LOADER
 # =============================================================================
@@ -195,10 +297,11 @@ def validate_isin(value: str) -> Optional[str]:
 class DataLoader:
     """
     Loads normalized data into the database.
-    Implements UPSERT logic for Holdings and duplicate detection for Transactions.
+    Implements snapshot-swap loading for Holdings and fingerprint-based duplicate detection for Transactions.
     """
     
-    def __init__(self):
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
         self.stats = {
             'holdings_created': 0,
             'holdings_updated': 0,
@@ -215,8 +318,9 @@ class DataLoader:
         snapshot_date: Optional[date] = None
     ) -> int:
         """
-        Load holdings into database with UPSERT logic.
-        Deletes existing holdings for this broker before inserting new ones.
+        Replace the broker's holdings with `items` as one import batch.
+        Bulk insert + swap happen in a single transaction (see services/holdings_snapshot),
+        the previous set is kept for rollback.
         
         Returns:
             Number of records inserted
@@ -227,52 +331,34 @@ class DataLoader:
         
         snapshot_date = snapshot_date or date.today()
         
-        session = SessionLocal()
-        count = 0
+        rows = []
+        for item in items:
+            try:
+                rows.append({
+                    'ticker': item.get('ticker', 'UNKNOWN'),
+                    'isin': validate_isin(item.get('isin', '')),
+                    'name': item.get('name', item.get('ticker', '')),
+                    'asset_type': normalize_asset_type(item.get('asset_type', 'STOCK')),
+                    'quantity': parse_european_number(item.get('quantity', 0)) or Decimal('0'),
+                    'purchase_price': parse_european_number(item.get('purchase_price')),
+                    'current_price': parse_european_number(item.get('current_price')),
+                    'current_value': parse_european_number(item.get('current_value', 0)) or Decimal('0'),
+                    'currency': item.get('currency', 'EUR'),
+                })
+            except Exception as e:
+                logger.error(f"   Error adding holding: {e}")
+                self.stats['errors'] += 1
         
         try:
-            # Clear existing holdings for this broker
-            existing = session.query(Holding).filter(Holding.broker == broker).count()
-            if existing > 0:
-                logger.info(f"   Deleting {existing} existing holdings for {broker}")
-                session.query(Holding).filter(Holding.broker == broker).delete()
-            
-            # Insert new holdings
-            for item in items:
-                try:
-                    holding = Holding(
-                        id=uuid.uuid4(),
-                        broker=broker,
-                        ticker=item.get('ticker', 'UNKNOWN'),
-                        isin=validate_isin(item.get('isin', '')),
-                        name=item.get('name', item.get('ticker', '')),
-                        asset_type=normalize_asset_type(item.get('asset_type', 'STOCK')),
-                        quantity=parse_european_number(item.get('quantity', 0)) or Decimal('0'),
-                        purchase_price=parse_european_number(item.get('purchase_price')),
-                        current_price=parse_european_number(item.get('current_price')),
-                        current_value=parse_european_number(item.get('current_value', 0)) or Decimal('0'),
-                        currency=item.get('currency', 'EUR'),
-                        source_document=source_file,
-                        last_updated=datetime.now()
-                    )
-                    session.add(holding)
-                    count += 1
-                    
-                except Exception as e:
-                    logger.error(f"   Error adding holding: {e}")
-                    self.stats['errors'] += 1
-            
-            session.commit()
+            result = swap_holdings(broker, rows, source_file, session_factory=self.session_factory)
+            count = result.rows
             self.stats['holdings_created'] = count
-            logger.info(f"   ✅ Inserted {count} holdings for {broker}")
+            self.stats['holdings_updated'] = len(result.diff.changed)
+            logger.info(f"   ✅ Inserted {count} holdings for {broker} ({result.diff.summary()})")
             
         except Exception as e:
-            session.rollback()
             logger.error(f"   ❌ Database error: {e}")
             count = 0
-            
-        finally:
-            session.close()
         
         return count
     
@@ -283,8 +369,10 @@ class DataLoader:
         source_file: str
     ) -> int:
         """
-        Load transactions into database with duplicate detection.
-        Skips transactions that already exist based on key fields.
+        Bulk-load transactions with duplicate detection.
+        Each row gets a deterministic fingerprint (broker, date, ISIN/ticker, operation,
+        quantity, amount, source page) backed by a unique index; rows are written with
+        multi-row INSERT ... ON CONFLICT DO NOTHING, so existing ones are skipped by the DB.
         
         Returns:
             Number of new records inserted
@@ -293,58 +381,40 @@ class DataLoader:
             logger.warning("No transactions to load")
             return 0
         
-        session = SessionLocal()
+        rows = []
+        for item in items:
+            try:
+                tx_date = parse_date(item.get('date'))
+                page = item.get('source_page', item.get('_source_page', item.get('page')))
+                rows.append({
+                    'id': uuid.uuid4(),
+                    'broker': broker,
+                    'ticker': item.get('ticker', 'UNKNOWN'),
+                    'isin': validate_isin(item.get('isin', '')),
+                    'operation': normalize_operation(item.get('operation', 'OTHER')),
+                    'status': 'COMPLETED',
+                    'quantity': parse_european_number(item.get('quantity', 0)) or Decimal('0'),
+                    'price': parse_european_number(item.get('price', 0)) or Decimal('0'),
+                    'total_amount': parse_european_number(item.get('total_amount', 0)) or Decimal('0'),
+                    'currency': item.get('currency', 'EUR'),
+                    'fees': parse_european_number(item.get('fees', 0)) or Decimal('0'),
+                    'timestamp': datetime.combine(tx_date, datetime.min.time()) if tx_date else datetime.now(),
+                    'source_document': source_file,
+                    'source_page': int(page) if page not in (None, '') else None,
+                })
+            except Exception as e:
+                logger.error(f"   Error adding transaction: {e}")
+                self.stats['errors'] += 1
+        
+        assign_fingerprints(rows)
+        
+        session = self.session_factory()
         inserted = 0
-        skipped = 0
         
         try:
-            for item in items:
-                try:
-                    # Build transaction
-                    tx_date = parse_date(item.get('date'))
-                    ticker = item.get('ticker', 'UNKNOWN')
-                    operation = normalize_operation(item.get('operation', 'OTHER'))
-                    quantity = parse_european_number(item.get('quantity', 0)) or Decimal('0')
-                    price = parse_european_number(item.get('price', 0)) or Decimal('0')
-                    total = parse_european_number(item.get('total_amount', 0)) or Decimal('0')
-                    
-                    # Check for duplicate (same broker, date, ticker, operation, amount)
-                    if tx_date:
-                        existing = session.query(Transaction).filter(
-                            Transaction.broker == broker,
-                            Transaction.ticker == ticker,
-                            Transaction.operation == operation,
-                            Transaction.total_amount == total
-                        ).first()
-                        
-                        if existing:
-                            skipped += 1
-                            continue
-                    
-                    # Insert new transaction
-                    tx = Transaction(
-                        id=uuid.uuid4(),
-                        broker=broker,
-                        ticker=ticker,
-                        isin=validate_isin(item.get('isin', '')),
-                        operation=operation,
-                        status='COMPLETED',
-                        quantity=quantity,
-                        price=price,
-                        total_amount=total,
-                        currency=item.get('currency', 'EUR'),
-                        fees=parse_european_number(item.get('fees', 0)) or Decimal('0'),
-                        timestamp=datetime.combine(tx_date, datetime.min.time()) if tx_date else datetime.now(),
-                        source_document=source_file,
-                    )
-                    session.add(tx)
-                    inserted += 1
-                    
-                except Exception as e:
-                    logger.error(f"   Error adding transaction: {e}")
-                    self.stats['errors'] += 1
-            
+            inserted = bulk_insert_transactions(session, rows)
             session.commit()
+            skipped = len(rows) - inserted
             self.stats['transactions_created'] = inserted
             self.stats['transactions_skipped'] = skipped
             
@@ -368,23 +438,47 @@ class DataLoader:
         holdings_count: int,
         transactions_count: int,
         status: str = 'SUCCESS',
-        errors: Optional[dict] = None
+        errors: Optional[dict] = None,
+        file_hash: Optional[str] = None
     ):
-        """Log the import operation."""
-        session = SessionLocal()
+        """
+        Log the import operation.
+        With a content hash the row is upserted on import_log.file_hash (unique):
+        a forced re-import refreshes the existing entry instead of duplicating it.
+        """
+        session = self.session_factory()
         
         try:
-            import_log = ImportLog(
+            values = dict(
                 id=uuid.uuid4(),
                 broker=broker,
                 filename=filename,
                 file_path=file_path,
+                file_hash=file_hash,
                 holdings_created=holdings_count,
                 transactions_created=transactions_count,
                 status=status,
                 errors=errors
             )
-            session.add(import_log)
+            if file_hash:
+                dialect = session.get_bind().dialect.name
+                if dialect == 'postgresql':
+                    from sqlalchemy.dialects.postgresql import insert
+                elif dialect == 'sqlite':
+                    from sqlalchemy.dialects.sqlite import insert
+                else:
+                    raise NotImplementedError(f"Import log upsert not supported on {dialect}")
+                
+                stmt = insert(ImportLog.__table__).values(**values)
+                refreshed = ('broker', 'filename', 'file_path', 'holdings_created',
+                             'transactions_created', 'status', 'errors')
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=['file_hash'],
+                    set_={**{c: stmt.excluded[c] for c in refreshed}, 'import_timestamp': func.now()},
+                )
+                session.execute(stmt)
+            else:
+                session.add(ImportLog(**values))
             session.commit()
             
         except Exception as e:
@@ -0,0 +1,75 @@
+"""
+IDP Pipeline - Document Registry
+Content-hash skip list for already-imported documents.
+
+- file_sha256(): streaming SHA-256 (fixed-size chunks, constant memory).
+- DocumentRegistry: the set of import_log.file_hash values of successful
+  imports, loaded with one query; lookups are O(1) and never open the file
+  as a PDF. Hashes claimed during a run count as known, so two copies of a
+  statement in the same inbox are processed once.
+"""
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, Set
+
+from sqlalchemy import select
+
+from db.database import SessionLocal
+from db.models import ImportLog
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK = 1024 * 1024  # 1 MiB
+
+
+def file_sha256(file_path: Path, chunk_size: int = HASH_CHUNK) -> str:
+    """Hex SHA-256 of a file's content, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DocumentRegistry:
+    """
+    Known document hashes (import_log), loaded lazily on first lookup.
+    """
+    
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self._lock = threading.Lock()
+        self._known: Optional[Set[str]] = None
+    
+    def _load(self) -> Set[str]:
+        if self._known is None:
+            session = self.session_factory()
+            try:
+                self._known = set(session.execute(
+                    select(ImportLog.file_hash).where(
+                        ImportLog.file_hash.is_not(None),
+                        ImportLog.status != 'FAILED',
+                    )
+                ).scalars())
+            except Exception as e:
+                logger.error(f"Document registry unavailable, nothing will be skipped: {e}")
+                self._known = set()
+            finally:
+                session.close()
+            logger.info(f"📚 Document registry: {len(self._known)} known documents")
+        return self._known
+    
+    def __contains__(self, file_hash: str) -> bool:
+        with self._lock:
+            return file_hash in self._load()
+    
+    def claim(self, file_hash: str) -> bool:
+        """Reserve a hash for this run. False if it was imported (or claimed) already."""
+        with self._lock:
+            known = self._load()
+            if file_hash in known:
+                return False
+            known.add(file_hash)
+            return True
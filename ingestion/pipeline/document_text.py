@@ -0,0 +1,278 @@
+"""
+IDP Pipeline - Document Text Layer
+Extracts each PDF page's text once and shares it across all stages
+(Router preview, ParserRegistry fingerprint, DynamicPDFParser, extraction
+samples, llm_ingestion_service).
+
+- Backend: PyMuPDF (~10-30x faster than pdfplumber). Its words are regrouped
+  into visual lines with pdfplumber's tolerances, so line-based miners see
+  the same layout. Falls back to pdfplumber when PyMuPDF is missing or
+  fails on a document (DOC_TEXT_BACKEND=pdfplumber forces it).
+- Cache: one file per page under DOC_TEXT_CACHE_DIR, keyed by
+  (file sha256, extractor version, page). Bumping an extractor version
+  invalidates its pages.
+- open_document() returns a lazy per-page accessor, memoized per process
+  so all stages of one run share the open handle and the in-memory pages.
+"""
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterator, Optional
+
+from ingestion.pipeline.document_registry import file_sha256
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+TEXT_CACHE_DIR = Path(os.getenv("DOC_TEXT_CACHE_DIR", str(PROJECT_ROOT / "data" / "text_cache")))
+TEXT_BACKEND = os.getenv("DOC_TEXT_BACKEND", "auto")  # auto | pymupdf | pdfplumber
+
+# Bump when the text produced by a backend changes
+EXTRACTOR_VERSIONS = {
+    'pymupdf': 'pymupdf-lines-1',
+    'pdfplumber': 'pdfplumber-1',
+}
+
+# pdfplumber extract_text() defaults
+X_TOLERANCE = 3
+Y_TOLERANCE = 3
+
+MAX_OPEN_DOCUMENTS = 8
+
+
+# ============================================================
+# BACKENDS
+# ============================================================
+
+def _import_pymupdf():
+    try:
+        import pymupdf
+        return pymupdf
+    except ImportError:
+        try:
+            import fitz
+            return fitz
+        except ImportError:
+            return None
+
+
+def words_to_lines(words: list) -> str:
+    """
+    Rebuild visual lines from positioned words (x0, top, x1, bottom, text):
+    words whose tops are within Y_TOLERANCE form a line, ordered left to right.
+    """
+    if not words:
+        return ""
+    words = sorted(words, key=lambda w: (round(w[1], 1), w[0]))
+    lines, current, line_top = [], [], None
+    for w in words:
+        if line_top is not None and abs(w[1] - line_top) > Y_TOLERANCE:
+            lines.append(current)
+            current = []
+        if not current:
+            line_top = w[1]
+        current.append(w)
+    lines.append(current)
+
+    out = []
+    for line in lines:
+        line.sort(key=lambda w: w[0])
+        text = line[0][4]
+        for prev, w in zip(line, line[1:]):
+            text += (" " if w[0] - prev[2] > X_TOLERANCE / 2 else "") + w[4]
+        out.append(text)
+    return "\n".join(out)
+
+
+class _PyMuPDFBackend:
+    name = 'pymupdf'
+
+    def __init__(self, file_path: Path):
+        self.doc = _import_pymupdf().open(str(file_path))
+
+    def page_count(self) -> int:
+        return self.doc.page_count
+
+    def page_text(self, index: int) -> str:
+        words = self.doc[index].get_text("words")
+        return words_to_lines([(w[0], w[1], w[2], w[3], w[4]) for w in words])
+
+    def close(self):
+        self.doc.close()
+
+
+class _PdfplumberBackend:
+    name = 'pdfplumber'
+
+    def __init__(self, file_path: Path):
+        import pdfplumber
+        self.pdf = pdfplumber.open(str(file_path))
+
+    def page_count(self) -> int:
+        return len(self.pdf.pages)
+
+    def page_text(self, index: int) -> str:
+        page = self.pdf.pages[index]
+        text = page.extract_text() or ""
+        page.flush_cache()
+        return text
+
+    def close(self):
+        self.pdf.close()
+
+
+def _open_backend(file_path: Path, backend: str):
+    if backend in ('auto', 'pymupdf') and _import_pymupdf() is not None:
+        try:
+            return _PyMuPDFBackend(file_path)
+        except Exception as e:
+            logger.warning(f"PyMuPDF failed on {file_path.name}, using pdfplumber: {e}")
+    return _PdfplumberBackend(file_path)
+
+
+# ============================================================
+# DOCUMENT
+# ============================================================
+
+class DocumentText:
+    """
+    Lazy per-page text of one PDF. Pages are served from memory, then the
+    disk cache, then extracted (the file is only opened on a cache miss).
+    """
+
+    def __init__(self, file_path: Path, backend: str = None, cache_dir: Optional[Path] = TEXT_CACHE_DIR):
+        self.file_path = Path(file_path)
+        self.backend_name = backend or TEXT_BACKEND
+        self.cache_dir = cache_dir
+        self._lock = threading.RLock()
+        self._sha256 = None
+        self._backend = None
+        self._page_count = None
+        self._pages = {}
+
+    @property
+    def sha256(self) -> str:
+        if self._sha256 is None:
+            self._sha256 = file_sha256(self.file_path)
+        return self._sha256
+
+    @property
+    def version(self) -> str:
+        """Extractor version the cached pages belong to."""
+        name = 'pdfplumber' if self.backend_name == 'pdfplumber' or _import_pymupdf() is None else 'pymupdf'
+        return EXTRACTOR_VERSIONS[name]
+
+    def _doc_dir(self) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        return Path(self.cache_dir) / self.sha256[:2] / self.sha256
+
+    def _read_cache(self, name: str) -> Optional[str]:
+        doc_dir = self._doc_dir()
+        if doc_dir is None:
+            return None
+        try:
+            return (doc_dir / name).read_text(encoding='utf-8')
+        except FileNotFoundError:
+            return None
+
+    def _write_cache(self, name: str, content: str):
+        doc_dir = self._doc_dir()
+        if doc_dir is None:
+            return
+        try:
+            doc_dir.mkdir(parents=True, exist_ok=True)
+            tmp = doc_dir / f".{name}.{os.getpid()}.{threading.get_ident()}.tmp"
+            tmp.write_text(content, encoding='utf-8')
+            os.replace(tmp, doc_dir / name)  # atomic: concurrent workers never see partial pages
+        except OSError as e:
+            logger.warning(f"Text cache write failed for {self.file_path.name}: {e}")
+
+    def _open(self):
+        if self._backend is None:
+            self._backend = _open_backend(self.file_path, self.backend_name)
+            if self._backend.name == 'pdfplumber':
+                # fallback: pages extracted from now on are cached under pdfplumber's version
+                self.backend_name = 'pdfplumber'
+        return self._backend
+
+    def __len__(self) -> int:
+        with self._lock:
+            if self._page_count is None:
+                meta = self._read_cache(f"{self.version}.json")
+                if meta is not None:
+                    self._page_count = json.loads(meta)['pages']
+                else:
+                    self._page_count = self._open().page_count()
+                    self._write_cache(f"{self.version}.json", json.dumps({'pages': self._page_count}))
+            return self._page_count
+
+    def page(self, index: int) -> str:
+        """Text of page `index` (0-based), lines separated by '\\n'."""
+        with self._lock:
+            text = self._pages.get(index)
+            if text is not None:
+                return text
+            text = self._read_cache(f"{self.version}-p{index:05d}.txt")
+            if text is None:
+                if not 0 <= index < len(self):
+                    raise IndexError(f"{self.file_path.name} has no page {index}")
+                backend = self._open()
+                text = backend.page_text(index)
+                self._write_cache(f"{self.version}-p{index:05d}.txt", text)
+            self._pages[index] = text
+            return text
+
+    def pages(self, indices=None) -> Iterator[str]:
+        """Page texts in order (all pages, or the given indices)."""
+        for index in (range(len(self)) if indices is None else indices):
+            yield self.page(index)
+
+    def lines(self) -> Iterator[str]:
+        """Every line of the document, page after page (streamed)."""
+        for text in self.pages():
+            if text:
+                yield from text.split('\n')
+
+    def text(self, max_pages: int = None, page_headers: bool = False) -> str:
+        """Joined text of the first `max_pages` pages (optionally '--- Page N ---' headers)."""
+        parts = []
+        for index in range(min(len(self), max_pages) if max_pages else len(self)):
+            text = self.page(index)
+            if text:
+                parts.append(f"--- Page {index + 1} ---\n{text}" if page_headers else text)
+        return '\n'.join(parts)
+
+    def close(self):
+        with self._lock:
+            if self._backend is not None:
+                self._backend.close()
+                self._backend = None
+
+
+# ============================================================
+# PER-PROCESS MEMO
+# ============================================================
+
+_open_documents: "OrderedDict[tuple, DocumentText]" = OrderedDict()
+_open_lock = threading.Lock()
+
+
+def open_document(file_path, backend: str = None) -> DocumentText:
+    """Shared DocumentText for a file (same path, size and mtime -> same instance)."""
+    file_path = Path(file_path)
+    stat = file_path.stat()
+    key = (str(file_path.resolve()), stat.st_size, stat.st_mtime_ns, backend or TEXT_BACKEND)
+    with _open_lock:
+        doc = _open_documents.get(key)
+        if doc is None:
+            doc = DocumentText(file_path, backend=backend)
+            _open_documents[key] = doc
+            while len(_open_documents) > MAX_OPEN_DOCUMENTS:
+                _, evicted = _open_documents.popitem(last=False)
+                evicted.close()
+        _open_documents.move_to_end(key)
+        return doc
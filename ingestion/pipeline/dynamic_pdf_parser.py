@@ -3,14 +3,18 @@ Dynamic PDF Parser for Financial IDP
 Strategy: "Omni-Parser" (Multi-Schema & Compressed Format Support)
 1. Blind Analyst (LLM): Discovers multiple schemas (Trading, Dividends, Transfers).
 2. Miner (Pure Python): Executes schema-specific extraction rules.
+Discovered schemas are cached in the ParserRegistry per (broker, layout fingerprint)
+and reused after a cheap hit-rate validation; the LLM only runs when that fails.
 """
 import re
 import json
 import logging
 from pathlib import Path
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Iterable, Optional, Any
 import requests
-import pdfplumber
+
+from ingestion.pipeline.llm_slots import llm_slot
+from ingestion.pipeline.document_text import open_document
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s | %(message)s', datefmt='%H:%M:%S')
 logger = logging.getLogger(__name__)
@@ -19,9 +23,101 @@ logger = logging.getLogger(__name__)
 OLLAMA_MODEL = "qwen2.5:14b-instruct-q6_K"
 OLLAMA_URL = "http://localhost:11434/api/chat"
 
+# Cached schema validation
+SCHEMA_MIN_KEYWORD_HIT_RATE = 0.3  # share of schemas whose start keyword anchors a line
+SCHEMA_MIN_ISIN_HIT_RATE = 0.5     # share of anchored blocks containing an ISIN
+SCHEMA_MAX_CANDIDATES = 3          # cached schema sets tried before re-discovering
+
+ISIN_REGEX = re.compile(r'\b([A-Z]{2}[A-Z0-9]{9}[0-9])\b')
+# Date Regex (dd-mmm-yyyy or dd/mm/yyyy)
+DATE_REGEX = re.compile(r'\b(\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{1,2}-[a-zA-Z]{3}-\d{2,4})\b')
+
+
+# ============================================================
+# RULE ENGINE
+# ============================================================
+
+class CompiledSchemas:
+    """
+    Discovered schemas compiled once for the Omni-Miner:
+    - all start keywords in one anchored alternation (tried in schema order,
+      so overlapping keywords resolve as before: first schema wins)
+    - field regexes (compressed_data, ticker) precompiled per schema
+    """
+
+    def __init__(self, schemas: List[Dict]):
+        # lower-case start keyword -> (schema, compressed_data regex, ticker regex)
+        self.rules = {}
+        for schema in schemas:
+            kw = schema.get('start_keyword', '').lower()
+            if kw:
+                fields = schema.get('fields', {})
+                self.rules[kw] = (schema, self._compile(fields, 'compressed_data'), self._compile(fields, 'ticker'))
+        self._anchor = re.compile('|'.join(re.escape(kw) for kw in self.rules)) if self.rules else None
+
+    @staticmethod
+    def _compile(fields: Dict, name: str) -> Optional[re.Pattern]:
+        rule = fields.get(name)
+        if not rule:
+            return None
+        try:
+            return re.compile(rule['regex'], re.IGNORECASE)
+        except (re.error, KeyError, TypeError) as e:
+            logger.warning(f"   ⚠️ Skipping invalid {name} rule: {e}")
+            return None
+
+    def anchor(self, line: str) -> Optional[str]:
+        """Start keyword the (stripped) line begins with, if any."""
+        if self._anchor is None:
+            return None
+        match = self._anchor.match(line.lower())
+        return match.group(0) if match else None
+
+    def build(self, lines: List[str], keyword: str, date_ctx: Optional[str], out: List[Dict]):
+        """Turn one finished block into a transaction (appended to `out` if it has an identifier)."""
+        schema, compressed_re, ticker_re = self.rules[keyword]
+        raw_anchor = lines[0]
+        t_data = {'type': schema.get('type', 'UNKNOWN'), 'raw_anchor': raw_anchor}
+        if date_ctx: t_data['date'] = date_ctx
+
+        # 1. Ticker / Main Line Data (on the Anchor Line)
+        # Apply "Compressed Data" regex from discovery if available
+        if compressed_re is not None:
+            match = compressed_re.search(raw_anchor)
+            if match:
+                t_data.update(match.groupdict())
+
+        # Specific Ticker Regex (on Anchor)
+        if ticker_re is not None:
+            match = ticker_re.search(raw_anchor)
+            if match:
+                val = match.group('ticker')
+                # Clean start keyword from ticker if accidentally captured
+                start_kw = schema.get('start_keyword', '')
+                if val and start_kw: 
+                    val = val.replace(start_kw, "").strip()
+                t_data['ticker'] = val
+
+        # 2. ISIN Scan (Anywhere in Block)
+        # Strictly 12 chars: Country Code + 9 Alphanum + check digit
+        isin_match = ISIN_REGEX.search("\n".join(lines))
+        if isin_match:
+            t_data['isin'] = isin_match.group(1)
+        
+        # 3. Cleanup & Normalize
+        if 'price' in t_data: t_data['price'] = t_data['price'].replace('USD','').replace('EUR','').strip()
+        if 'qty' in t_data: t_data['quantity'] = t_data['qty']
+        
+        if 'ticker' in t_data or 'isin' in t_data:
+            out.append(t_data)
+
+
 class DynamicPDFParser:
-    def __init__(self):
+    def __init__(self, registry=None, broker: str = None):
+        """registry/broker enable schema reuse across documents of the same layout."""
         self.schemas = []
+        self.registry = registry
+        self.broker = broker
 
     def _call_ollama(self, prompt: str, json_mode: bool = False) -> Optional[str]:
         try:
@@ -33,7 +129,8 @@ class DynamicPDFParser:
             if json_mode:
                 payload["format"] = "json"
                 
-            response = requests.post(OLLAMA_URL, json=payload, timeout=120)
+            with llm_slot():
+                response = requests.post(OLLAMA_URL, json=payload, timeout=120)
             if response.status_code == 200:
                 return response.json().get('message', {}).get('content', '')
             return None
@@ -49,36 +146,35 @@ class DynamicPDFParser:
         
         sample_text = ""
         try:
-            with pdfplumber.open(file_path) as pdf:
-                # Get a distributed sample: First 3 Pages, Middle Page, Last 2 Pages
-                pages_to_sample = []
-                total_pages = len(pdf.pages)
-                
-                # First 3 pages
-                for i in range(min(3, total_pages)):
+            doc = open_document(file_path)
+            # Get a distributed sample: First 3 Pages, Middle Page, Last 2 Pages
+            pages_to_sample = []
+            total_pages = len(doc)
+            
+            # First 3 pages
+            for i in range(min(3, total_pages)):
+                pages_to_sample.append(i)
+            
+            # Middle page
+            if total_pages > 4:
+                pages_to_sample.append(total_pages // 2)
+            
+            # Last 2 pages (avoid duplicates)
+            for i in range(max(0, total_pages - 2), total_pages):
+                if i not in pages_to_sample:
                     pages_to_sample.append(i)
-                
-                # Middle page
-                if total_pages > 4:
-                    pages_to_sample.append(total_pages // 2)
-                
-                # Last 2 pages (avoid duplicates)
-                for i in range(max(0, total_pages - 2), total_pages):
-                    if i not in pages_to_sample:
-                        pages_to_sample.append(i)
-                
-                pages_to_sample.sort()
-                
-                sampled_lines = []
-                for p_idx in pages_to_sample:
-                    text = pdf.pages[p_idx].extract_text()
-                    if text:
-                        # Full text of these pages
-                        lines = text.split('\n')
-                        sampled_lines.extend(lines)
-                        sampled_lines.append("... [PAGE BREAK] ...")
-                
-                sample_text = "\n".join(sampled_lines)
+            
+            pages_to_sample.sort()
+            
+            sampled_lines = []
+            for text in doc.pages(pages_to_sample):
+                if text:
+                    # Full text of these pages
+                    lines = text.split('\n')
+                    sampled_lines.extend(lines)
+                    sampled_lines.append("... [PAGE BREAK] ...")
+            
+            sample_text = "\n".join(sampled_lines)
 
         except Exception as e:
             logger.error(f"   ❌ Failed to read PDF: {e}")
@@ -151,123 +247,136 @@ RESPONSE JSON Format:
             return []
             
         logger.info("⚡ Executing extraction with Block-Based strategy...")
-        transactions = []
-        
-        # Prepare Keywords map
-        # Map lower-case start keyword to Schema
-        schema_map = {}
-        for schema in self.schemas:
-            kw = schema.get('start_keyword', '').lower()
-            if kw: schema_map[kw] = schema
+        # Same cached text layer as discover_structure: sampled pages are not extracted twice
+        transactions = self.mine(open_document(file_path).lines(), CompiledSchemas(self.schemas))
+        logger.info(f"   ✅ Extracted {len(transactions)} transactions")
+        return transactions
 
+    @staticmethod
+    def mine(lines: Iterable[str], rules: "CompiledSchemas") -> List[Dict]:
+        """Run the compiled schemas over a stream of lines (blocks may span pages)."""
+        transactions = []
         current_date = None
         current_block = []
-        current_schema = None
-        current_raw_anchor = ""
+        current_keyword = None
+        anchor, build = rules.anchor, rules.build
         
-        # Date Regex (dd-mmm-yyyy or dd/mm/yyyy)
-        date_regex = re.compile(r'\b(\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{1,2}-[a-zA-Z]{3}-\d{2,4})\b')
-        
-        # Helper to process a finished block
-        def process_block(lines, schema, raw_anchor, date_ctx):
-            if not lines or not schema: return
-            
-            block_text = "\n".join(lines)
-            t_data = {'type': schema.get('type', 'UNKNOWN'), 'raw_anchor': raw_anchor}
-            if date_ctx: t_data['date'] = date_ctx
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
 
-            # 1. Ticker / Main Line Data (Usually on the first line or anchor)
-            # Use the compressed regex from discovery if available
-            main_fields = schema.get('fields', {})
-            
-            # Apply "Compressed Data" regex on the Anchor Line (First line)
-            if 'compressed_data' in main_fields:
-                rule = main_fields['compressed_data']
-                match = re.search(rule['regex'], raw_anchor, re.IGNORECASE)
-                if match:
-                    t_data.update(match.groupdict())
-
-            # Specific Ticker Regex (on Anchor)
-            if 'ticker' in main_fields:
-                rule = main_fields['ticker']
-                match = re.search(rule['regex'], raw_anchor, re.IGNORECASE)
-                if match:
-                    val = match.group('ticker')
-                    # Clean start keyword from ticker if accidentally captured
-                    start_kw = schema.get('start_keyword', '')
-                    if val and start_kw: 
-                        val = val.replace(start_kw, "").strip()
-                    t_data['ticker'] = val
-
-            # 2. ISIN Scan (Anywhere in Block)
-            # Robust Regex: 2 Letters + 9 Alphanum + 1 Digit (Check digit usually number)
-            # But many ISINs end with letter? Actually standard is 12 chars.
-            # Strictly: [A-Z]{2}[A-Z0-9]{9}\d. 
-            # Let's use a slightly broader one but strictly 12 chars starting with Country Code.
-            isin_match = re.search(r'\b([A-Z]{2}[A-Z0-9]{9}[0-9])\b', block_text)
-            if isin_match:
-                t_data['isin'] = isin_match.group(1)
-            
-            # 3. Cleanup & Normalize
-            if 'price' in t_data: t_data['price'] = t_data['price'].replace('USD','').replace('EUR','').strip()
-            if 'qty' in t_data: t_data['quantity'] = t_data['qty']
+            # Check for Date Header (Context)
+            # Only if line is short to avoid false positives in long text
+            # (every date format has a '/' or '-' separator: skip the regex otherwise)
+            if len(line) < 40 and ('/' in line or '-' in line):
+                d_match = DATE_REGEX.search(line)
+                if d_match:
+                    current_date = d_match.group(0)
             
-            if 'ticker' in t_data or 'isin' in t_data:
-                transactions.append(t_data)
-
-        with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
-                if not text: continue
-                lines = text.split('\n')
+            # Check for Start Keyword (Start of NEW Block)
+            keyword = anchor(line)
+            if keyword:
+                # Process PREVIOUS block
+                if current_block:
+                    build(current_block, current_keyword, current_date, transactions)
                 
-                i = 0
-                while i < len(lines):
-                    line = lines[i].strip()
-                    if not line: 
-                        i += 1
-                        continue
-
-                    # Check for Date Header (Context)
-                    # Only if line is short to avoid false positives in long text
-                    if len(line) < 40:
-                        d_match = date_regex.search(line)
-                        if d_match:
-                            current_date = d_match.group(0)
-                    
-                    # Check for Start Keyword (Start of NEW Block)
-                    found_schema = None
-                    for kw, schema in schema_map.items():
-                        if line.lower().startswith(kw):
-                            found_schema = schema
-                            break
-                    
-                    if found_schema:
-                        # Process PREVIOUS block
-                        if current_block:
-                            process_block(current_block, current_schema, current_raw_anchor, current_date)
-                        
-                        # Start NEW block
-                        current_block = [line] # Include anchor in block text? Yes.
-                        current_raw_anchor = line
-                        current_schema = found_schema
-                    else:
-                        # Add to CURRENT block
-                        if current_block:
-                            current_block.append(line)
-                            
-                    i += 1
-
-            # Process FINAL block
-            if current_block:
-                process_block(current_block, current_schema, current_raw_anchor, current_date)
+                # Start NEW block (anchor included in block text)
+                current_block = [line]
+                current_keyword = keyword
+            elif current_block:
+                # Add to CURRENT block
+                current_block.append(line)
 
-        logger.info(f"   ✅ Extracted {len(transactions)} transactions")
+        # Process FINAL block
+        if current_block:
+            build(current_block, current_keyword, current_date, transactions)
         return transactions
 
+    def validate_schemas(self, schemas: List[Dict], lines: List[str]) -> Dict[str, Any]:
+        """
+        Cheap check that cached schemas fit a document (no LLM, no field regexes):
+        how many schemas' start keywords anchor a line, and how many of the
+        resulting blocks carry an ISIN (only required if the document has ISINs).
+        """
+        rules = CompiledSchemas(schemas)
+        hit_keywords = set()
+        blocks = blocks_with_isin = isins = 0
+        block_has_isin = False
+        
+        for line in lines:
+            line = line.strip()
+            kw = rules.anchor(line)
+            if kw:
+                blocks_with_isin += block_has_isin
+                blocks += 1
+                hit_keywords.add(kw)
+                block_has_isin = False
+            if ISIN_REGEX.search(line):
+                isins += 1
+                block_has_isin = block_has_isin or blocks > 0
+        blocks_with_isin += block_has_isin
+        
+        keyword_rate = len(hit_keywords) / len(rules.rules) if rules.rules else 0.0
+        isin_rate = blocks_with_isin / blocks if blocks else 0.0
+        valid = (
+            blocks > 0
+            and keyword_rate >= SCHEMA_MIN_KEYWORD_HIT_RATE
+            and (isins == 0 or isin_rate >= SCHEMA_MIN_ISIN_HIT_RATE)
+        )
+        return {'valid': valid, 'blocks': blocks, 'keyword_rate': keyword_rate, 'isin_rate': isin_rate}
+
+    def _parse_cached(self, file_path: str, layout: str) -> Optional[List[Dict]]:
+        """Try the broker's cached schemas (exact layout first). None if none fit."""
+        from ingestion.pipeline.parser_registry import SCHEMA_DOC_TYPE
+        
+        candidates = self.registry.get_schemas(self.broker, layout)[:SCHEMA_MAX_CANDIDATES]
+        if not candidates:
+            return None
+        lines = list(open_document(file_path).lines())
+        
+        for fingerprint, schemas in candidates:
+            check = self.validate_schemas(schemas, lines)
+            logger.info(
+                f"   📦 Cached schemas {self.broker}|{fingerprint}: {check['blocks']} blocks, "
+                f"keywords {check['keyword_rate']:.0%}, ISIN {check['isin_rate']:.0%}"
+            )
+            if not check['valid']:
+                continue
+            
+            self.schemas = schemas
+            transactions = self.extract_transactions(file_path)
+            if not transactions:
+                self.registry.record_error(self.broker, SCHEMA_DOC_TYPE, fingerprint, "No transactions extracted")
+                continue
+            
+            if fingerprint == layout:
+                self.registry.record_success(self.broker, SCHEMA_DOC_TYPE, fingerprint)
+            else:
+                # Same template, new skeleton (e.g. renamed header): cache under this layout too
+                self.registry.save_schemas(self.broker, layout, schemas)
+            return transactions
+        
+        logger.info("   ⚠️ Cached schemas do not fit this document, re-discovering...")
+        return None
+
     def parse(self, file_path: str) -> List[Dict]:
+        if self.registry is None or not self.broker:
+            self.discover_structure(file_path)
+            return self.extract_transactions(file_path)
+        
+        from ingestion.pipeline.parser_registry import compute_layout_fingerprint
+        layout = compute_layout_fingerprint(Path(file_path))
+        
+        transactions = self._parse_cached(file_path, layout)
+        if transactions is not None:
+            return transactions
+        
         self.discover_structure(file_path)
-        return self.extract_transactions(file_path)
+        transactions = self.extract_transactions(file_path)
+        if transactions:
+            self.registry.save_schemas(self.broker, layout, self.schemas)
+        return transactions
 
 if __name__ == "__main__":
     f = r"G:\Il mio Drive\WAR_ROOM_DATA\inbox\bgsaxo\Transactions_19807401_2024-11-26_2025-12-19.pdf"
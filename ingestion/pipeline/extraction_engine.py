@@ -25,6 +25,7 @@ from intelligence.llm_wrapper import LLMWrapper
 # Import local modules
 from ingestion.pipeline.parser_registry import ParserRegistry, compute_fingerprint
 from ingestion.pipeline.router import DocumentType
+from ingestion.pipeline.llm_slots import llm_slot
 from ingestion.prompts.code_generation import (
     PROMPT_CSV_HOLDINGS,
     PROMPT_CSV_TRANSACTIONS,
@@ -52,15 +53,9 @@ def get_extended_sample(file_path: Path, max_lines: int = 50) -> str:
     
     elif ext == '.pdf':
         try:
-            import pdfplumber
-            text_parts = []
-            with pdfplumber.open(file_path) as pdf:
-                # Get several pages to understand the format
-                for i, page in enumerate(pdf.pages[:5]):
-                    text = page.extract_text()
-                    if text:
-                        text_parts.append(f"--- Page {i+1} ---\n{text}")
-            return '\n'.join(text_parts)
+            from ingestion.pipeline.document_text import open_document
+            # Get several pages to understand the format
+            return open_document(file_path).text(max_pages=5, page_headers=True)
         except:
             return ""
     
@@ -191,7 +186,8 @@ class ExtractionEngine:
         # Try Google first if preferred and available
         if use_google and self.google_llm and self.prefer_google:
             try:
-                response = self.google_llm.chat(messages, json_mode=False)
+                with llm_slot():
+                    response = self.google_llm.chat(messages, json_mode=False)
                 # Only reject if response starts with "Error:" (actual error from LLM wrapper)
                 if response and not response.strip().startswith("Error:"):
                     self.stats['google_generations'] += 1
@@ -204,7 +200,8 @@ class ExtractionEngine:
         
         # Fallback to Ollama
         try:
-            response = self.ollama_llm.chat(messages, json_mode=False)
+            with llm_slot():
+                response = self.ollama_llm.chat(messages, json_mode=False)
             if response:
                 self.stats['ollama_generations'] += 1
                 logger.info("   🦙 Generated with Ollama")
@@ -238,9 +235,8 @@ class ExtractionEngine:
             try:
                 from ingestion.pipeline.dynamic_pdf_parser import DynamicPDFParser
                 logger.info("   🔍 Using Dynamic PDF Parser (Blind Analyst + Regex Miner)...")
-                parser = DynamicPDFParser()
-                # Initialize rules discovery only if not cached (can be optimized later)
-                # For now, re-discover per file to be safe and robust
+                # Schemas are reused per (broker, layout) and only re-discovered when they don't fit
+                parser = DynamicPDFParser(registry=self.registry, broker=broker)
                 result = parser.parse(str(file_path))
                 if result:
                     self.stats['extractions'] += 1
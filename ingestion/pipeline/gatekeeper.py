@@ -3,10 +3,13 @@ IDP Pipeline - Module A: Gatekeeper
 File validation and filtering with deterministic logic (no AI).
 """
 import os
+import threading
 from pathlib import Path
 from typing import Tuple, Optional
 import logging
 
+from ingestion.pipeline.document_registry import file_sha256
+
 logger = logging.getLogger(__name__)
 
 # Allowed extensions (from IDP document)
@@ -117,12 +120,25 @@ class Gatekeeper:
     The Gatekeeper class - validates and filters incoming files.
     """
     
-    def __init__(self, discard_folder: Optional[Path] = None):
+    def __init__(self, discard_folder: Optional[Path] = None, registry=None, force: bool = False):
+        """
+        Args:
+            discard_folder: where rejected files are moved (None = leave in place)
+            registry: DocumentRegistry; files whose content hash is known are rejected as DUPLICATE
+            force: reprocess known files anyway (the hash is still computed and logged)
+        """
         self.discard_folder = discard_folder
+        self.registry = registry
+        self.force = force
+        # Files are admitted from several pipeline threads: _lock guards hashes/stats only,
+        # validation and hashing run unlocked (registry.claim is thread-safe)
+        self._lock = threading.Lock()
+        self.hashes = {}  # file path -> sha256, read by the loader for import_log
         self.stats = {
             'processed': 0,
             'accepted': 0,
             'rejected': 0,
+            'duplicates': 0,
             'rejections_by_reason': {}
         }
     
@@ -133,20 +149,32 @@ class Gatekeeper:
         Returns:
             (accepted, reason, broker_name)
         """
-        self.stats['processed'] += 1
-        
         valid, reason = validate_file(file_path)
         
+        duplicate = False
+        if valid and self.registry is not None:
+            file_hash = file_sha256(file_path)
+            with self._lock:
+                self.hashes[str(file_path)] = file_hash
+            if not self.registry.claim(file_hash) and not self.force:
+                duplicate = True
+                valid, reason = False, f"DUPLICATE: already imported (sha256 {file_hash[:12]})"
+        
+        with self._lock:
+            self.stats['processed'] += 1
+            self.stats['duplicates'] += duplicate
+            if valid:
+                self.stats['accepted'] += 1
+            else:
+                self.stats['rejected'] += 1
+                self.stats['rejections_by_reason'][reason] = \
+                    self.stats['rejections_by_reason'].get(reason, 0) + 1
+        
         if valid:
-            self.stats['accepted'] += 1
             broker = get_broker_from_path(file_path)
             logger.info(f"✅ ACCEPTED: {file_path.name} -> Broker: {broker}")
             return True, reason, broker
         else:
-            self.stats['rejected'] += 1
-            self.stats['rejections_by_reason'][reason] = \
-                self.stats['rejections_by_reason'].get(reason, 0) + 1
-            
             logger.warning(f"❌ REJECTED: {file_path.name} -> {reason}")
             
             # Move to discard folder if configured
@@ -171,4 +199,5 @@ class Gatekeeper:
     
     def get_stats(self) -> dict:
         """Return processing statistics."""
-        return self.stats.copy()
+        with self._lock:
+            return {**self.stats, 'rejections_by_reason': dict(self.stats['rejections_by_reason'])}
@@ -10,6 +10,8 @@ from pathlib import Path
 from typing import List, Dict, Any
 import logging
 
+from ingestion.pipeline.llm_slots import llm_slot
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s | %(message)s', datefmt='%H:%M:%S')
 logger = logging.getLogger(__name__)
 
@@ -96,11 +98,12 @@ ROW_X: INVALID  (se è una riga di summary, totale, intestazione ripetuta, o vuo
 Rispondi SOLO con le classificazioni, una per riga:"""
 
         try:
-            response = requests.post(OLLAMA_URL, json={
-                "model": OLLAMA_MODEL,
-                "messages": [{"role": "user", "content": prompt}],
-                "stream": False
-            }, timeout=120)
+            with llm_slot():
+                response = requests.post(OLLAMA_URL, json={
+                    "model": OLLAMA_MODEL,
+                    "messages": [{"role": "user", "content": prompt}],
+                    "stream": False
+                }, timeout=120)
             
             if response.status_code == 200:
                 content = response.json().get('message', {}).get('content', '')
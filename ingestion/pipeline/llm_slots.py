@@ -0,0 +1,30 @@
+"""
+LLM Slots - concurrency gate for the pipeline's LLM calls.
+
+Parallel runs (run_pipeline --workers) install one semaphore shared by the
+classification threads and the extraction processes, so at most N requests
+hit Ollama / Gemini at once (a local Ollama serves one model at a time).
+Sequential runs install nothing and calls go straight through.
+"""
+from contextlib import contextmanager
+
+_slots = None
+
+
+def set_llm_slots(semaphore):
+    """Install a (process- or manager-shared) semaphore; None removes the bound."""
+    global _slots
+    _slots = semaphore
+
+
+@contextmanager
+def llm_slot():
+    """Hold one LLM slot for the duration of a request."""
+    if _slots is None:
+        yield
+        return
+    _slots.acquire()
+    try:
+        yield
+    finally:
+        _slots.release()
@@ -1,20 +1,28 @@
 """
 IDP Pipeline - Parser Registry
 Stores and retrieves LLM-generated parsers for reuse.
+Also caches DynamicPDFParser schemas per (broker, layout fingerprint).
 """
 import os
+import re
 import json
 import hashlib
 from pathlib import Path
 from datetime import datetime
-from typing import Optional
+from typing import Callable, List, Optional
 import logging
 
+from utils.file_lock import file_lock
+
 logger = logging.getLogger(__name__)
 
 # Default registry location
 REGISTRY_PATH = Path(__file__).parent.parent / "generated_parsers" / "registry.json"
 
+# doc_type slot of DynamicPDFParser schema entries
+SCHEMA_DOC_TYPE = "PDF_SCHEMA"
+LAYOUT_LINES = 12  # first-page lines that make up the layout skeleton
+
 
 def compute_fingerprint(file_path: Path, sample_size: int = 2000) -> str:
     """
@@ -34,14 +42,15 @@ def compute_fingerprint(file_path: Path, sample_size: int = 2000) -> str:
                 return hashlib.md5(header.encode()).hexdigest()[:12]
         
         elif ext == '.pdf':
-            import pdfplumber
-            with pdfplumber.open(file_path) as pdf:
-                text_sample = ""
-                for i, page in enumerate(pdf.pages[:2]):
-                    text = page.extract_text() or ""
-                    # Get structure markers (headers, table indicators)
-                    text_sample += text[:1000]
-                return hashlib.md5(text_sample.encode()).hexdigest()[:12]
+            from ingestion.pipeline.document_text import open_document
+            # Pinned to pdfplumber text: registry keys were computed from it, a
+            # faster backend would orphan every cached parser
+            doc = open_document(file_path, backend='pdfplumber')
+            text_sample = ""
+            for text in doc.pages(range(min(2, len(doc)))):
+                # Get structure markers (headers, table indicators)
+                text_sample += text[:1000]
+            return hashlib.md5(text_sample.encode()).hexdigest()[:12]
         
         else:
             # Fallback: hash first N bytes
@@ -53,6 +62,27 @@ def compute_fingerprint(file_path: Path, sample_size: int = 2000) -> str:
         return "unknown"
 
 
+def compute_layout_fingerprint(file_path: Path) -> str:
+    """
+    Layout fingerprint of a PDF that survives new data: the word skeleton of
+    the first page's opening lines (digits, punctuation and short tokens dropped),
+    so monthly statements of one broker template share it.
+    """
+    try:
+        from ingestion.pipeline.document_text import open_document
+        doc = open_document(file_path)
+        lines = [l for l in (doc.page(0).split('\n') if len(doc) else []) if l.strip()]
+        skeleton = []
+        for line in lines[:LAYOUT_LINES]:
+            words = [w for w in re.findall(r'[^\W\d_]+', line.lower()) if len(w) >= 3]
+            if words:
+                skeleton.append(' '.join(words))
+        return hashlib.md5('\n'.join(skeleton).encode()).hexdigest()[:12]
+    except Exception as e:
+        logger.error(f"Layout fingerprint failed: {e}")
+        return "unknown"
+
+
 class ParserRegistry:
     """
     Registry for storing and retrieving LLM-generated parsers.
@@ -62,7 +92,8 @@ class ParserRegistry:
     """
     
     def __init__(self, registry_path: Optional[Path] = None):
-        self.registry_path = registry_path or REGISTRY_PATH
+        self.registry_path = Path(registry_path or REGISTRY_PATH)
+        self.lock_path = self.registry_path.with_suffix(".lock")
         self.registry = self._load()
     
     def _load(self) -> dict:
@@ -75,12 +106,22 @@ class ParserRegistry:
                 logger.error(f"Failed to load registry: {e}")
         return {}
     
-    def _save(self):
-        """Persist registry to disk."""
+    def _update(self, mutate: Callable[[dict], None]):
+        """
+        Apply one change to the registry on disk: under an inter-process lock,
+        reload the file, mutate it and atomically replace it, so concurrent
+        workers never lose each other's entries, counters or deletions.
+        """
         self.registry_path.parent.mkdir(parents=True, exist_ok=True)
         try:
-            with open(self.registry_path, 'w', encoding='utf-8') as f:
-                json.dump(self.registry, f, indent=2)
+            with file_lock(str(self.lock_path)):
+                registry = self._load()
+                mutate(registry)
+                tmp = self.registry_path.with_suffix(f".{os.getpid()}.tmp")
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(registry, f, indent=2)
+                os.replace(tmp, self.registry_path)
+            self.registry = registry
         except Exception as e:
             logger.error(f"Failed to save registry: {e}")
     
@@ -109,43 +150,76 @@ class ParserRegistry:
         Save a new parser to the registry.
         """
         key = self._make_key(broker, doc_type, fingerprint)
-        
-        self.registry[key] = {
+        entry = {
             'code': code,
             'created_at': datetime.now().isoformat(),
             'success_count': 0,
             'last_error': None
         }
-        
-        self._save()
+        self._update(lambda registry: registry.__setitem__(key, entry))
         logger.info(f"💾 Saved new parser: {key}")
     
     def record_success(self, broker: str, doc_type: str, fingerprint: str):
         """Record a successful parse."""
         key = self._make_key(broker, doc_type, fingerprint)
-        if key in self.registry:
-            self.registry[key]['success_count'] = \
-                self.registry[key].get('success_count', 0) + 1
-            self._save()
+        
+        def increment(registry):
+            if key in registry:
+                registry[key]['success_count'] = registry[key].get('success_count', 0) + 1
+        self._update(increment)
     
     def record_error(self, broker: str, doc_type: str, fingerprint: str, error: str):
         """Record a parse error."""
         key = self._make_key(broker, doc_type, fingerprint)
-        if key in self.registry:
-            self.registry[key]['last_error'] = {
-                'message': error,
-                'timestamp': datetime.now().isoformat()
-            }
-            self._save()
+        last_error = {
+            'message': error,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        def set_error(registry):
+            if key in registry:
+                registry[key]['last_error'] = last_error
+        self._update(set_error)
     
     def invalidate(self, broker: str, doc_type: str, fingerprint: str):
         """Remove a parser from registry (e.g., if it keeps failing)."""
         key = self._make_key(broker, doc_type, fingerprint)
-        if key in self.registry:
-            del self.registry[key]
-            self._save()
+        if key in self._load():
+            self._update(lambda registry: registry.pop(key, None))
             logger.info(f"🗑️ Invalidated parser: {key}")
     
+    # ------------------------------------------------------------
+    # DynamicPDFParser schemas
+    # ------------------------------------------------------------
+    
+    def get_schemas(self, broker: str, fingerprint: str) -> List[tuple]:
+        """
+        Cached schema sets to try for a document, best first:
+        the exact (broker, layout) entry, then the broker's other layouts by success count.
+        Returns [(fingerprint, schemas)].
+        """
+        # Another worker may have discovered this layout since we loaded
+        self.registry = self._load()
+        prefix = f"{broker}|{SCHEMA_DOC_TYPE}|"
+        entries = [
+            (key[len(prefix):], entry) for key, entry in self.registry.items()
+            if key.startswith(prefix) and entry.get('schemas')
+        ]
+        entries.sort(key=lambda e: (e[0] != fingerprint, -e[1].get('success_count', 0)))
+        return [(fp, entry['schemas']) for fp, entry in entries]
+    
+    def save_schemas(self, broker: str, fingerprint: str, schemas: list):
+        """Save (or replace) the schemas discovered for a (broker, layout)."""
+        key = self._make_key(broker, SCHEMA_DOC_TYPE, fingerprint)
+        entry = {
+            'schemas': schemas,
+            'created_at': datetime.now().isoformat(),
+            'success_count': 0,
+            'last_error': None
+        }
+        self._update(lambda registry: registry.__setitem__(key, entry))
+        logger.info(f"💾 Saved PDF schemas: {key} ({len(schemas)} schemas)")
+    
     def list_parsers(self) -> list:
         """List all registered parsers with metadata."""
         result = []
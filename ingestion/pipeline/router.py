@@ -11,6 +11,8 @@ from dataclasses import dataclass
 from enum import Enum
 import logging
 
+from ingestion.pipeline.llm_slots import llm_slot
+
 logger = logging.getLogger(__name__)
 
 # Ollama configuration (WSL)
@@ -74,23 +76,14 @@ def extract_preview_csv(file_path: Path, max_rows: int = 30) -> str:
 
 
 def extract_preview_pdf(file_path: Path, max_pages: int = 2) -> str:
-    """Extract first N pages from PDF as preview text."""
+    """Extract first N pages from PDF as preview text (shared document text layer)."""
     try:
-        import pdfplumber
-        
-        text_parts = []
-        with pdfplumber.open(file_path) as pdf:
-            for i, page in enumerate(pdf.pages):
-                if i >= max_pages:
-                    break
-                text = page.extract_text()
-                if text:
-                    text_parts.append(f"--- Page {i+1} ---\n{text}")
+        from ingestion.pipeline.document_text import open_document
         
-        return '\n'.join(text_parts)
+        return open_document(file_path).text(max_pages=max_pages, page_headers=True)
         
     except ImportError:
-        logger.error("pdfplumber not installed")
+        logger.error("No PDF text backend installed (PyMuPDF or pdfplumber)")
         return ""
     except Exception as e:
         logger.error(f"PDF preview extraction failed: {e}")
@@ -127,17 +120,18 @@ def extract_preview_excel(file_path: Path, max_rows: int = 30) -> str:
 def call_ollama(prompt: str, timeout: int = 120) -> Optional[str]:
     """Call Ollama API for classification."""
     try:
-        response = requests.post(
-            f"{OLLAMA_URL}/api/generate",
-            json={
-                "model": OLLAMA_MODEL,
-                "prompt": prompt,
-                "format": "json",
-                "stream": False,
-                "options": {"temperature": 0.1}
-            },
-            timeout=timeout
-        )
+        with llm_slot():
+            response = requests.post(
+                f"{OLLAMA_URL}/api/generate",
+                json={
+                    "model": OLLAMA_MODEL,
+                    "prompt": prompt,
+                    "format": "json",
+                    "stream": False,
+                    "options": {"temperature": 0.1}
+                },
+                timeout=timeout
+            )
         
         if response.status_code == 200:
             return response.json().get('response', '')
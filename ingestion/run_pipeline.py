@@ -1,13 +1,26 @@
 """
 IDP Pipeline - Main Entry Point
 Orchestrates the complete ingestion workflow.
+
+Parallel mode (--workers N > 1):
+- Gatekeeper + Router run in stage threads; LLM requests are bounded by a
+  shared semaphore (--llm-workers) across threads and worker processes.
+- Extraction (pdfplumber + miner, CPU-bound) runs in a process pool.
+- DB loads run in one lane per broker, in file order, one load at a time:
+  holdings snapshots and transaction dedup see the same sequence as a
+  sequential run.
 """
 import os
 import sys
+import time
 import argparse
 import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
+from typing import Dict, List
 
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -16,6 +29,8 @@ from ingestion.pipeline.gatekeeper import Gatekeeper
 from ingestion.pipeline.router import DocumentRouter, DocumentType
 from ingestion.pipeline.extraction_engine import ExtractionEngine
 from ingestion.pipeline.data_loader import DataLoader
+from ingestion.pipeline.document_registry import DocumentRegistry
+from ingestion.pipeline.llm_slots import set_llm_slots
 
 # Configure logging
 logging.basicConfig(
@@ -29,6 +44,40 @@ logger = logging.getLogger(__name__)
 DEFAULT_INBOX = Path(os.getenv("INBOX_PATH", "G:/Il mio Drive/WAR_ROOM_DATA/inbox"))
 DEFAULT_PROCESSED = Path(os.getenv("PROCESSED_PATH", "G:/Il mio Drive/WAR_ROOM_DATA/processed"))
 DEFAULT_DISCARDED = Path(os.getenv("DISCARDED_PATH", "G:/Il mio Drive/WAR_ROOM_DATA/discarded"))
+DEFAULT_WORKERS = int(os.getenv("IDP_WORKERS", "1"))
+DEFAULT_LLM_WORKERS = int(os.getenv("IDP_LLM_WORKERS", "2"))
+
+
+# ============================================================
+# EXTRACTION WORKERS (process pool)
+# ============================================================
+
+_worker_engine = None
+
+
+def _init_worker(llm_slots):
+    """Process pool initializer: share the LLM bound, engine built on first use."""
+    set_llm_slots(llm_slots)
+
+
+def _extract_in_worker(file_path: Path, broker: str, doc_type: DocumentType) -> tuple:
+    """Run ExtractionEngine.extract in a worker process -> (records, stats delta)."""
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = ExtractionEngine()
+    before = _worker_engine.get_stats()
+    data = _worker_engine.extract(file_path, broker, doc_type)
+    after = _worker_engine.get_stats()
+    return data, {k: after[k] - before.get(k, 0) for k in after}
+
+
+def merge_stats(target: dict, delta: dict):
+    """Add numeric counters of `delta` into `target` (nested dicts included)."""
+    for key, value in delta.items():
+        if isinstance(value, dict):
+            merge_stats(target.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)):
+            target[key] = target.get(key, 0) + value
 
 
 class IDPPipeline:
@@ -42,15 +91,29 @@ class IDPPipeline:
         inbox_path: Path = DEFAULT_INBOX,
         processed_path: Path = DEFAULT_PROCESSED,
         discarded_path: Path = DEFAULT_DISCARDED,
-        dry_run: bool = False
+        dry_run: bool = False,
+        workers: int = DEFAULT_WORKERS,
+        llm_workers: int = DEFAULT_LLM_WORKERS,
+        force: bool = False
     ):
         self.inbox_path = inbox_path
         self.processed_path = processed_path
         self.discarded_path = discarded_path
         self.dry_run = dry_run
+        self.workers = max(1, workers)
+        self.llm_workers = max(1, llm_workers)
+        
+        # Parallel mode: results/stats updates and DB loads are serialized
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
         
         # Initialize modules
-        self.gatekeeper = Gatekeeper(discard_folder=discarded_path if not dry_run else None)
+        self.registry = DocumentRegistry()
+        self.gatekeeper = Gatekeeper(
+            discard_folder=discarded_path if not dry_run else None,
+            registry=self.registry,
+            force=force
+        )
         self.router = DocumentRouter()
         self.extraction_engine = ExtractionEngine()
         self.data_loader = DataLoader()
@@ -70,89 +133,117 @@ class IDPPipeline:
         Returns:
             Result dict with status and details
         """
-        result = {
-            'file': file_path.name,
-            'status': 'pending',
-            'broker': None,
-            'doc_type': None,
-            'records': 0,
-            'error': None
-        }
+        result = self._new_result(file_path)
         
         try:
-            # Module A: Gatekeeper
-            valid, reason, broker = self.gatekeeper.process_file(file_path)
-            
-            if not valid:
-                result['status'] = 'rejected'
-                result['error'] = reason
-                self.results['skipped'] += 1
+            admitted = self._admit(file_path, result, self.router)
+            if admitted is None:
                 return result
-            
-            result['broker'] = broker
-            
-            # Module B: Router (Classification)
-            classification = self.router.classify(file_path)
-            
-            if classification.category == DocumentType.TRASH:
-                result['status'] = 'trash'
-                result['error'] = classification.reasoning
-                self.results['skipped'] += 1
-                return result
-            
-            if not classification.is_valid():
-                result['status'] = 'low_confidence'
-                result['error'] = f"Confidence {classification.confidence:.2f} below threshold"
-                self.results['skipped'] += 1
-                return result
-            
-            result['doc_type'] = classification.category.value
+            broker, classification = admitted
             
             # Module C: Extraction Engine
             logger.info(f"📥 Extracting data from {file_path.name}...")
             data = self.extraction_engine.extract(file_path, broker, classification.category)
             
-            if not data:
-                result['status'] = 'extraction_failed'
-                result['error'] = 'No data extracted'
-                self.results['failed'] += 1
+            if not self._load(file_path, broker, classification, data, result):
                 return result
             
-            result['records'] = len(data)
-            
-            # Module D: Data Loader (skip in dry run)
-            if not self.dry_run:
-                if classification.category == DocumentType.HOLDINGS:
-                    count = self.data_loader.load_holdings(broker, data, file_path.name)
-                else:
-                    count = self.data_loader.load_transactions(broker, data, file_path.name)
-                
-                # Log import
-                self.data_loader.log_import(
-                    broker=broker,
-                    filename=file_path.name,
-                    file_path=str(file_path),
-                    holdings_count=count if classification.category == DocumentType.HOLDINGS else 0,
-                    transactions_count=count if classification.category == DocumentType.TRANSACTIONS else 0,
-                )
-                
-                # Move to processed
-                self._move_to_processed(file_path, broker)
-            
-            result['status'] = 'success'
-            self.results['success'] += 1
-            
         except Exception as e:
-            result['status'] = 'error'
-            result['error'] = str(e)
-            self.results['failed'] += 1
-            logger.exception(f"Error processing {file_path.name}")
-        
-        self.results['processed'] += 1
-        self.results['details'].append(result)
+            self._error(file_path, result, e)
         
+        self._record(result)
         return result
     
+    def _new_result(self, file_path: Path) -> dict:
+        return {
+            'file': file_path.name,
+            'status': 'pending',
+            'broker': None,
+            'doc_type': None,
+            'records': 0,
+            'error': None
+        }
+    
+    def _count(self, key: str):
+        with self._lock:
+            self.results[key] += 1
+    
+    def _record(self, result: dict):
+        with self._lock:
+            self.results['processed'] += 1
+            self.results['details'].append(result)
+    
+    def _error(self, file_path: Path, result: dict, error: Exception):
+        result['status'] = 'error'
+        result['error'] = str(error)
+        self._count('failed')
+        logger.exception(f"Error processing {file_path.name}")
+    
+    def _admit(self, file_path: Path, result: dict, router: DocumentRouter):
+        """Modules A + B. Returns (broker, classification) or None when the file is skipped."""
+        # Module A: Gatekeeper (thread-safe; hashing runs outside the pipeline lock)
+        valid, reason, broker = self.gatekeeper.process_file(file_path)
+        
+        if not valid:
+            result['status'] = 'rejected'
+            result['error'] = reason
+            self._count('skipped')
+            return None
+        
+        result['broker'] = broker
+        
+        # Module B: Router (Classification)
+        classification = router.classify(file_path)
+        
+        if classification.category == DocumentType.TRASH:
+            result['status'] = 'trash'
+            result['error'] = classification.reasoning
+            self._count('skipped')
+            return None
+        
+        if not classification.is_valid():
+            result['status'] = 'low_confidence'
+            result['error'] = f"Confidence {classification.confidence:.2f} below threshold"
+            self._count('skipped')
+            return None
+        
+        result['doc_type'] = classification.category.value
+        return broker, classification
+    
+    def _load(self, file_path: Path, broker: str, classification, data: list, result: dict) -> bool:
+        """Module D. Returns False when there was nothing to load."""
+        if not data:
+            result['status'] = 'extraction_failed'
+            result['error'] = 'No data extracted'
+            self._count('failed')
+            return False
+        
+        result['records'] = len(data)
+        
+        # Module D: Data Loader (skip in dry run)
+        if not self.dry_run:
+            if classification.category == DocumentType.HOLDINGS:
+                count = self.data_loader.load_holdings(broker, data, file_path.name)
+            else:
+                count = self.data_loader.load_transactions(broker, data, file_path.name)
+            
+            # Log import
+            self.data_loader.log_import(
+                broker=broker,
+                filename=file_path.name,
+                file_path=str(file_path),
+                holdings_count=count if classification.category == DocumentType.HOLDINGS else 0,
+                transactions_count=count if classification.category == DocumentType.TRANSACTIONS else 0,
+                file_hash=self.gatekeeper.hashes.get(str(file_path)),
+            )
+            
+            # Move to processed
+            self._move_to_processed(file_path, broker)
+        
+        result['status'] = 'success'
+        self._count('success')
+        return True
+    
     def process_broker(self, broker: str) -> list:
         """
         Process all files for a specific broker.
@@ -169,22 +260,31 @@ class IDPPipeline:
             logger.error(f"Broker folder not found: {broker_folder}")
             return []
         
-        files = list(broker_folder.glob("*"))
+        files = self._broker_files(broker_folder)
         logger.info(f"\n{'='*60}")
         logger.info(f"🏦 Processing broker: {broker.upper()}")
         logger.info(f"   Found {len(files)} files in inbox")
         logger.info(f"{'='*60}\n")
         
-        results = []
-        for file_path in files:
-            if file_path.is_file():
+        started = time.perf_counter()
+        if self.workers > 1:
+            results = self._run_parallel({broker: files})[broker]
+        else:
+            results = []
+            for file_path in files:
                 logger.info(f"\n📄 File: {file_path.name}")
                 result = self.process_file(file_path)
                 results.append(result)
                 self._print_result(result)
         
+        self._print_throughput(len(files), time.perf_counter() - started)
         return results
     
+    @staticmethod
+    def _broker_files(broker_folder: Path) -> List[Path]:
+        """Files of a broker folder in name order (statements sort by date): the load order."""
+        return sorted((f for f in broker_folder.glob("*") if f.is_file()), key=lambda f: f.name)
+    
     def process_all(self) -> dict:
         """
         Process all files from all brokers in inbox.
@@ -205,12 +305,93 @@ class IDPPipeline:
         # Find all broker folders
         brokers = [d for d in self.inbox_path.iterdir() if d.is_dir()]
         
-        for broker_folder in brokers:
-            self.process_broker(broker_folder.name)
+        started = time.perf_counter()
+        if self.workers > 1:
+            files = {d.name: self._broker_files(d) for d in brokers}
+            logger.info(f"   Parallel: {self.workers} workers, {self.llm_workers} LLM slots, "
+                        f"{sum(len(f) for f in files.values())} files in {len(files)} brokers")
+            self._run_parallel(files)
+            self._print_throughput(sum(len(f) for f in files.values()), time.perf_counter() - started)
+        else:
+            for broker_folder in brokers:
+                self.process_broker(broker_folder.name)
         
         self._print_summary()
         return self.results
     
+    # ============================================================
+    # PARALLEL MODE
+    # ============================================================
+    
+    def _run_parallel(self, broker_files: Dict[str, List[Path]]) -> Dict[str, list]:
+        """
+        Classify/extract every file concurrently, load each broker's files in order.
+        Returns broker -> results (in load order).
+        """
+        if not any(broker_files.values()):
+            return {broker: [] for broker in broker_files}
+        
+        manager = multiprocessing.Manager()
+        llm_slots = manager.BoundedSemaphore(self.llm_workers)
+        set_llm_slots(llm_slots)
+        try:
+            with ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(llm_slots,)) as parse_pool, \
+                 ThreadPoolExecutor(self.workers + self.llm_workers, thread_name_prefix="idp-stage") as stages, \
+                 ThreadPoolExecutor(len(broker_files), thread_name_prefix="idp-load") as lanes:
+                pending = {
+                    broker: [(f, stages.submit(self._prepare, f, parse_pool)) for f in files]
+                    for broker, files in broker_files.items()
+                }
+                loads = {broker: lanes.submit(self._load_lane, items) for broker, items in pending.items()}
+                return {broker: future.result() for broker, future in loads.items()}
+        finally:
+            set_llm_slots(None)
+            manager.shutdown()
+    
+    def _prepare(self, file_path: Path, parse_pool: ProcessPoolExecutor) -> tuple:
+        """Stage thread: Gatekeeper + Router here, extraction in the process pool -> (result, payload)."""
+        result = self._new_result(file_path)
+        router = DocumentRouter(min_confidence=self.router.min_confidence)
+        try:
+            admitted = self._admit(file_path, result, router)
+            if admitted is None:
+                return result, None
+            broker, classification = admitted
+            
+            logger.info(f"📥 Extracting data from {file_path.name}...")
+            data, stats = parse_pool.submit(_extract_in_worker, file_path, broker, classification.category).result()
+            with self._lock:
+                merge_stats(self.extraction_engine.stats, stats)
+            return result, (broker, classification, data)
+        except Exception as e:
+            self._error(file_path, result, e)
+            return result, None
+        finally:
+            with self._lock:
+                merge_stats(self.router.stats, router.stats)
+    
+    def _load_lane(self, items: list) -> list:
+        """One broker: wait for its files in order, load them one at a time."""
+        results = []
+        for file_path, future in items:
+            result, payload = future.result()
+            if payload is not None:
+                try:
+                    with self._load_lock:
+                        loaded = self._load(file_path, *payload, result)
+                    if loaded:
+                        self._record(result)
+                except Exception as e:
+                    self._error(file_path, result, e)
+                    self._record(result)
+            elif result['status'] == 'error':
+                self._record(result)
+            
+            logger.info(f"\n📄 File: {file_path.name}")
+            self._print_result(result)
+            results.append(result)
+        return results
+    
     def _move_to_processed(self, file_path: Path, broker: str):
         """Move file to processed folder."""
         import shutil
@@ -250,6 +431,12 @@ class IDPPipeline:
         
         logger.info(msg)
     
+    def _print_throughput(self, files: int, elapsed: float):
+        """Print files/min for a run."""
+        rate = files / elapsed * 60 if elapsed > 0 else 0.0
+        logger.info(f"⏱️ Throughput: {files} files in {elapsed:.1f}s -> {rate:.1f} files/min "
+                    f"({self.workers} worker{'s' if self.workers > 1 else ''})")
+    
     def _print_summary(self):
         """Print processing summary."""
         logger.info(f"\n{'='*60}")
@@ -293,6 +480,26 @@ def main():
         help='Path to inbox folder'
     )
     
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=DEFAULT_WORKERS,
+        help='Parallel extraction processes (1 = sequential)'
+    )
+    
+    parser.add_argument(
+        '--llm-workers',
+        type=int,
+        default=DEFAULT_LLM_WORKERS,
+        help='Max concurrent LLM requests in parallel mode'
+    )
+    
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Reprocess files already imported (same content hash)'
+    )
+    
     parser.add_argument(
         '--file', '-f',
         type=str,
@@ -304,7 +511,10 @@ def main():
     # Initialize pipeline
     pipeline = IDPPipeline(
         inbox_path=Path(args.inbox),
-        dry_run=args.dry_run
+        dry_run=args.dry_run,
+        workers=args.workers,
+        llm_workers=args.llm_workers,
+        force=args.force
     )
     
     # Run
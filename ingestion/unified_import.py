@@ -11,10 +11,8 @@ import logging
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from db.database import SessionLocal
-from db.models import Transaction
 from ingestion.inbox_scanner import InboxScanner
-import uuid
+from services.holdings_snapshot import swap_holdings
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -241,43 +239,34 @@ class UnifiedImportService:
         return self._insert_positions('IBKR', records)
     
     def _insert_positions(self, platform: str, records: list) -> int:
-        """Insert position records into database."""
+        """Replace the platform's holdings with the parsed positions (atomic snapshot swap)."""
         if not records:
             return 0
         
-        session = SessionLocal()
-        count = 0
+        rows = [
+            {
+                'ticker': rec.get('ticker', 'UNKNOWN'),
+                'isin': rec.get('isin'),
+                'name': rec.get('name') or rec.get('ticker', 'UNKNOWN'),
+                'asset_type': rec.get('asset_type') or ('CRYPTO' if platform == 'BINANCE' else 'STOCK'),
+                'quantity': rec.get('quantity', Decimal('0')),
+                'current_price': rec.get('price', Decimal('0')),
+                'current_value': rec.get('value', Decimal('0')),
+                'currency': 'EUR',
+                'notes': f'Imported from inbox at {datetime.now().isoformat()}',
+            }
+            for rec in records
+        ]
         
         try:
-            for rec in records:
-                tx = Transaction(
-                    id=uuid.uuid4(),
-                    timestamp=datetime.now(),
-                    ticker_symbol=rec.get('ticker', 'UNKNOWN'),
-                    isin=rec.get('isin'),
-                    platform=platform,
-                    operation_type='BUY',  # Snapshot position
-                    quantity=rec.get('quantity', Decimal('0')),
-                    price_unit=rec.get('price', Decimal('0')),
-                    fiat_amount=rec.get('value', Decimal('0')),
-                    currency_original='EUR',
-                    status='VERIFIED',
-                    notes=f'Imported from inbox at {datetime.now().isoformat()}'
-                )
-                session.add(tx)
-                count += 1
-            
-            session.commit()
+            result = swap_holdings(platform, rows, source_document='inbox')
+            count = result.rows
             logger.info(f"Inserted {count} records for {platform}")
         
         except Exception as e:
-            session.rollback()
             logger.error(f"Database insert failed: {e}")
             count = 0
         
-        finally:
-            session.close()
-        
         return count
     
     def run_import(self, clear_existing: bool = True) -> dict:
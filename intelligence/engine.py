@@ -3,6 +3,7 @@ Intelligence Engine
 Orchestrates the analysis of news using the Dual Scoring System (Relevance + Magnitude).
 """
 import json
+import time
 import logging
 from datetime import datetime
 import os
@@ -11,10 +12,17 @@ import os
 from .llm_wrapper import LLMWrapper
 from .scrapers.rss_scraper import RSSScraper
 from .scrapers.youtube_scraper import YoutubeScraper
+from .scrapers.fetch_stage import (
+    SourceTask, iter_sources, load_feed_state, save_feed_state, RSS_TIMEOUT, YOUTUBE_TIMEOUT
+)
 from .memory.json_memory import JsonVectorMemory
+from .scoring_pipeline import ScoringPipeline
 
 logger = logging.getLogger(__name__)
 
+# Bump when the scoring prompts change: cached scores are keyed on it
+SCORING_PROMPT_VERSION = "2"
+
 class IntelligenceEngine:
     def __init__(self, portfolio_context):
         """
@@ -25,6 +33,7 @@ class IntelligenceEngine:
         self.memory = JsonVectorMemory()
         self.rss_scraper = RSSScraper()
         self.yt_scraper = YoutubeScraper()
+        self.last_scan = None  # Per-source timing report of the last run_cycle
 
     def _load_sources(self):
         """Load sources from JSON config or return defaults."""
@@ -84,82 +93,174 @@ class IntelligenceEngine:
         }}
         """
 
+    def _generate_batch_scoring_prompt(self, news_items):
+        """Same task as _generate_scoring_prompt, for several items in one structured JSON answer."""
+        items_text = "\n".join(
+            f"""
+        [ID {idx}]
+        Title: {item['title']}
+        Summary: {item['summary']}
+        Source: {item.get('source')}
+        Date: {item.get('published_at')}"""
+            for idx, item in enumerate(news_items)
+        )
+        return f"""
+        You are a Senior Financial Intelligence Analyst.
+        
+        USER PORTFOLIO CONTEXT:
+        {self.portfolio_context}
+        
+        NEWS ITEMS TO ANALYZE ({len(news_items)}):
+        {items_text}
+
+        TASK:
+        Analyze EACH news/video independently and assign two scores (0-10) + extract relevant tags.
+        CRITICAL: OUTPUT MUST BE IN ITALIAN LANGUAGE.
+        
+        1. RELEVANCE (Track A - Defense): 
+           - How much does this DIRECTLY impact the user's specific holdings?
+           - 0 = No relation. 10 = Critical impact on a held asset.
+           
+        2. MAGNITUDE (Track B - Discovery):
+           - How significant is this event globally or for the market?
+           - 0 = Noise. 10 = Historical Event / Global Disruption.
+
+        3. TAGS:
+           - Extract 2-4 keywords/hashtags (e.g. ["Crypto", "Regulation", "Bitcoin"]).
+           
+        4. SUMMARY:
+           - A concise 2-3 sentence summary in ITALIAN.
+
+        OUTPUT FORMAT (JSON ONLY, one entry per ID):
+        {{
+            "items": [
+                {{
+                    "id": <ID of the item>,
+                    "relevance_score": <int 0-10>,
+                    "relevance_reason": "<BREVE spiegazione in ITALIANO>",
+                    "magnitude_score": <int 0-10>,
+                    "magnitude_reason": "<BREVE spiegazione in ITALIANO>",
+                    "strategy": "<ALPHA|BETA|GAMMA|NOISE>",
+                    "tags": ["Tag1", "Tag2", "Tag3"],
+                    "summary": "<Concise summary in Italian>",
+                    "translated_title": "<Title translated to Italian>"
+                }}
+            ]
+        }}
+        """
+
+    def _new_scoring_pipeline(self):
+        return ScoringPipeline(
+            chat=lambda prompt: self.llm.chat([{"role": "user", "content": prompt}], json_mode=True),
+            single_prompt=self._generate_scoring_prompt,
+            batch_prompt=self._generate_batch_scoring_prompt,
+            prompt_version=SCORING_PROMPT_VERSION,
+            model=self.llm.model_id,
+        )
+
+    @staticmethod
+    def _apply_analysis(item, analysis):
+        """Attach scores/tags and the AI summary + title to a news item."""
+        item['analysis'] = analysis
+        item['relevance_score'] = analysis.get('relevance_score', 0)
+        item['magnitude_score'] = analysis.get('magnitude_score', 0)
+        item['tags'] = analysis.get('tags', [])
+        
+        # USE AI SUMMARY and TITLE if available
+        if analysis.get('translated_title'):
+            item['title'] = analysis.get('translated_title')
+            
+        if analysis.get('summary'):
+            item['summary'] = analysis.get('summary')
+        return item
+
+    def _store_scored(self, items, scores):
+        """
+        Apply scores and store every analyzed item in memory with one batched write.
+        (Feed-First approach: we still compute scores for filtering later, but capture everything now.)
+        """
+        analyzed_items = []
+        for item in items:
+            analysis = scores.get(item['link'])
+            if analysis is None:
+                print(f"Error analyzing {item['title'][:20]}: no valid answer")
+                continue
+            analyzed_items.append(self._apply_analysis(item, analysis))
+            print(f"   [SCORED] R:{item['relevance_score']} M:{item['magnitude_score']} | {item['title'][:40]}...")
+
+        if analyzed_items:
+            self.memory.add_news(analyzed_items)
+        return analyzed_items
+
     def analyze_news_batch(self, news_items):
         """
-        Analyzes a batch of news items using the LLM.
-        Skips items that are already in memory.
+        Analyzes a batch of news items using the LLM (batched prompts, concurrent requests,
+        cached scores). Skips items that are already in memory.
         Returns list of processed items with scores.
         """
-        analyzed_items = []
-        items_to_process = []
-        
-        # 1. Filter out known items
+        # 1. Filter out known items (don't re-analyze)
         print(f"🧠 Checking {len(news_items)} items against memory...")
-        for item in news_items:
-            # Check if we already have this specific link analyzed
-            if self.memory.exists(item['link']):
-                # Ideally, we retrieve it from memory to show it, but for now 
-                # persistence means we don't re-analyze. 
-                # If we want to DISPLAY it, we should fetch it from memory.
-                # However, the `run_cycle` normally returns fresh analysis.
-                # To support "persistence", we should really return everything from memory + new stuff.
-                # But let's stick to "don't re-analyze" for efficiency first.
-                pass 
-            else:
-                items_to_process.append(item)
-                
+        items_to_process = [item for item in news_items if not self.memory.exists(item['link'])]
         print(f"   Note: {len(news_items) - len(items_to_process)} items skipped (already analyzed).")
         
         if not items_to_process:
             return []
 
         print(f"🧠 Analyzing {len(items_to_process)} NEW news items...")
-        
-        for item in items_to_process:
-            prompt = self._generate_scoring_prompt(item)
-            
-            try:
-                # We expect JSON output
-                response = self.llm.chat([{"role": "user", "content": prompt}], json_mode=True)
-                
-                if response:
-                    analysis = json.loads(response)
-                    
-                    item['analysis'] = analysis
-                    item['relevance_score'] = analysis.get('relevance_score', 0)
-                    item['magnitude_score'] = analysis.get('magnitude_score', 0)
-                    item['tags'] = analysis.get('tags', [])
-                    
-                    # USE AI SUMMARY and TITLE if available
-                    if analysis.get('translated_title'):
-                        item['title'] = analysis.get('translated_title')
-                        
-                    if analysis.get('summary'):
-                        item['summary'] = analysis.get('summary')
-                    
-                    # ALWAYS Store analyzed items (Feed-First approach)
-                    # We still compute scores for filtering later, but we capture everything now.
-                    item['analysis'] = analysis # Ensure analysis is attached
-                    
-                    # Incremental Save
-                    self.memory.add_news([item])
-                    analyzed_items.append(item)
-                    print(f"   [SAVED] R:{item['relevance_score']} M:{item['magnitude_score']} | {item['title'][:40]}...")
-                
-            except Exception as e:
-                print(f"Error analyzing {item['title'][:20]}: {e}")
-                continue
-                
-        # Bulk Memory Store (redundant if incremental, but safe)
-        if analyzed_items:
-            # self.memory.add_news(analyzed_items) # Already saved incrementally
-            pass
-            
-        return analyzed_items
+        pipeline = self._new_scoring_pipeline()
+        pipeline.submit(items_to_process)
+        scores = pipeline.collect()
+
+        return self._store_scored(items_to_process, scores)
+
+    def _build_source_tasks(self, configured_rss, configured_channels, feed_state):
+        """One SourceTask per RSS feed / YouTube channel config (state copied from feed_state)."""
+        tasks = []
+
+        for url, name in configured_rss:
+            key = f"rss:{url}"
+            tasks.append(SourceTask(
+                key=key, name=name, kind="rss", url=url, timeout=RSS_TIMEOUT,
+                state=dict(feed_state.get(key, {})),
+                fetch=lambda state, url=url, name=name: self.rss_scraper.fetch(url, name, state=state),
+            ))
+
+        for ch_config in configured_channels:
+            # Handle both old string format (legacy safety) and new object format
+            if isinstance(ch_config, str):
+                handle = ch_config
+                keyword = None
+                display_name = None
+                strategy = "STRATEGY_HYBRID"
+            else:
+                handle = ch_config.get("handle")
+                keyword = ch_config.get("filter_keyword")
+                display_name = ch_config.get("name")
+                strategy = ch_config.get("strategy", "STRATEGY_HYBRID")
+
+            # Same channel can be configured twice with different filters: key on both
+            key = f"youtube:{handle}|{keyword or ''}"
+            tasks.append(SourceTask(
+                key=key, name=display_name or handle, kind="youtube",
+                url="https://www.youtube.com", timeout=YOUTUBE_TIMEOUT,
+                state=dict(feed_state.get(key, {})),
+                fetch=lambda state, h=handle, k=keyword, d=display_name, st=strategy:
+                    self.yt_scraper.fetch_channel_updates(
+                        h, limit=5, filter_keyword=k, display_name=d, strategy=st, state=state
+                    ),
+            ))
+
+        return tasks
 
     def run_cycle(self, sources=None, video_channels=None):
-        """Full cycle: Scrape (RSS + YouTube) -> Analyze -> Store"""
-        all_news = []
+        """
+        Full cycle: Scrape (RSS + YouTube, concurrently) -> Analyze -> Store.
+        Each source's new items are queued for scoring as soon as that source completes;
+        all analyzed items are stored in memory with one write at the end.
+        Per-source timings are kept in self.last_scan.
+        """
+        cycle_start = time.perf_counter()
+        started_at = datetime.now()
         
         # Load sources from config
         config = self._load_sources()
@@ -168,13 +269,6 @@ class IntelligenceEngine:
         configured_rss = config.get("rss_feeds", [])
         if sources: 
             configured_rss = sources # Override if provided
-            
-        for url, name in configured_rss:
-            try:
-                items = self.rss_scraper.fetch(url, name)
-                all_news.extend(items)
-            except Exception as e:
-                print(f"Error RSS {name}: {e}")
 
         # 2. YouTube Sources
         configured_channels = config.get("youtube_channels", [])
@@ -187,48 +281,62 @@ class IntelligenceEngine:
                 else:
                     normalized.append(item)
             configured_channels = normalized
-            
-        for ch_config in configured_channels:
-            # Handle both old string format (legacy safety) and new object format
-            if isinstance(ch_config, str):
-                handle = ch_config
-                keyword = None
-                display_name = None
-                strategy = "STRATEGY_HYBRID"
-            else:
-                handle = ch_config.get("handle")
-                keyword = ch_config.get("filter_keyword")
-                display_name = ch_config.get("name")
-                strategy = ch_config.get("strategy", "STRATEGY_HYBRID")
-                
-            try:
-                # Deduplication optimization check (optional)
-                
-                video_items = self.yt_scraper.fetch_channel_updates(
-                    handle, 
-                    limit=5, 
-                    filter_keyword=keyword, 
-                    display_name=display_name,
-                    strategy=strategy
-                )
-                
-                # Deduplication check
-                new_videos = []
-                for v in video_items:
-                    if not self.memory.exists(v['link']):
-                        new_videos.append(v)
-                    else:
-                        # print(f"   [Cache] Skipping already analyzed video: {v['title'][:30]}...")
-                        pass
-                        
-                all_news.extend(new_videos)
-            except Exception as e:
-                print(f"Error YouTube {handle}: {e}")
-        
-        # 3. Analyze new items and store them
-        new_items = self.analyze_news_batch(all_news)
+
+        feed_state = load_feed_state()
+        tasks = self._build_source_tasks(configured_rss, configured_channels, feed_state)
+
+        # 3. Fetch concurrently; each source's new items are queued for scoring as it arrives
+        pipeline = self._new_scoring_pipeline()
+        seen_links = set()
+        pending_items = []
+        source_items = []  # (task, report, items) for the feed-state check below
+        reports = []
+        for task, items, report in iter_sources(tasks):
+            fresh = []
+            for item in items:
+                if item['link'] in seen_links or self.memory.exists(item['link']):
+                    continue
+                seen_links.add(item['link'])
+                fresh.append(item)
+
+            if report['status'] == 'error':
+                print(f"Error {task.kind.upper()} {task.name}: {report.get('error')}")
+
+            pipeline.submit(fresh)
+            pending_items.extend(fresh)
+            source_items.append((task, report, fresh))
+            reports.append(report)
+
+        # 4. Wait for scoring, then store everything with one batched write
+        scoring_start = time.perf_counter()
+        print(f"🧠 Analyzing {len(pending_items)} NEW news items...")
+        new_items = self._store_scored(pending_items, pipeline.collect())
+        scoring_wait = time.perf_counter() - scoring_start
+
+        # Keep the new validators only if every item of the source is now in memory,
+        # otherwise a 304 next time would hide the items that failed analysis
+        for task, report, fresh in source_items:
+            if report['status'] in ('ok', 'not_modified') and all(self.memory.exists(i['link']) for i in fresh):
+                task.state.pop('not_modified', None)
+                feed_state[task.key] = task.state
+
+        save_feed_state(feed_state)
+
+        self.last_scan = {
+            "started_at": started_at.isoformat(),
+            "total_seconds": round(time.perf_counter() - cycle_start, 2),
+            "new_items": len(new_items),
+            "scoring": dict(pipeline.stats, wait_seconds=round(scoring_wait, 2)),
+            "sources": reports,
+        }
+        statuses = [r['status'] for r in reports]
+        print(
+            f"🛰️ Scan: {len(reports)} sources in {self.last_scan['total_seconds']}s "
+            f"(ok {statuses.count('ok')}, unchanged {statuses.count('not_modified')}, "
+            f"errors {statuses.count('error')}, timeouts {statuses.count('timeout')})"
+        )
         
-        # 4. Return EVERYTHING from memory (last 3 days/limit 100) to the dashboard
+        # 5. Return EVERYTHING from memory (last 3 days/limit 100) to the dashboard
         # This ensures we see persisted items + new items
         recent_memories = self.memory.get_recent(limit=100) 
         return [m['metadata'] for m in recent_memories] # Return formatted for dashboard
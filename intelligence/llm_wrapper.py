@@ -66,6 +66,30 @@ class OllamaProvider(BaseLLMProvider):
             logger.error(f"Ollama Connection Error: {e}")
             return None
 
+    async def achat(self, messages, json_mode=False):
+        """Non-blocking chat over the shared httpx AsyncClient."""
+        from services.async_runtime import get_http_client
+
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": False
+        }
+        if json_mode:
+            payload["format"] = "json"
+
+        try:
+            resp = await get_http_client().post(self.api_url, json=payload, timeout=120)
+            if resp.status_code == 200:
+                body = resp.json()
+                return body.get('message', {}).get('content', '')
+            else:
+                logger.error(f"Ollama Error: {resp.text}")
+                return None
+        except Exception as e:
+            logger.error(f"Ollama Connection Error: {e}")
+            return None
+
 class GoogleProvider(BaseLLMProvider):
     def __init__(self, api_key, model="gemini-1.5-flash"):
         if not genai:
@@ -192,6 +216,13 @@ class LLMWrapper:
         else:
             raise ValueError(f"Unknown provider: {provider}")
 
+    @property
+    def model_id(self) -> str:
+        """Provider + model name, e.g. 'ollama:mistral-nemo:latest' (used as a cache key)."""
+        model = getattr(self, 'model', None) or getattr(self.provider, 'model', None) \
+            or getattr(self.provider, 'model_name', None)
+        return f"{self.provider_name}:{model}"
+
     def chat(self, messages, json_mode=False):
         if self.is_openai_client:
             # Use OpenAI SDK directly for NHI Orchestrator
@@ -207,3 +238,14 @@ class LLMWrapper:
                 return None
         else:
             return self.provider.chat(messages, json_mode)
+
+    async def achat(self, messages, json_mode=False):
+        """
+        Async variant of chat() for callers on the event loop.
+        Native Ollama goes through httpx; SDK-based providers run in the bounded executor.
+        """
+        if isinstance(self.provider, OllamaProvider):
+            return await self.provider.achat(messages, json_mode)
+
+        from services.async_runtime import run_blocking
+        return await run_blocking(self.chat, messages, json_mode)
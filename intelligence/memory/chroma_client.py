@@ -8,6 +8,8 @@ import json
 import uuid
 import logging
 
+from services.embedding_service import embed_text, embed_texts
+
 logger = logging.getLogger(__name__)
 
 class VectorMemory:
@@ -42,22 +44,8 @@ class VectorMemory:
             return False
 
     def _get_embedding(self, text):
-        """Get embedding from Ollama"""
-        try:
-            url = f"{self.ollama_url}/api/embeddings"
-            payload = {
-                "model": self.embedding_model,
-                "prompt": text
-            }
-            resp = requests.post(url, json=payload)
-            if resp.status_code == 200:
-                return resp.json()['embedding']
-            else:
-                print(f"Ollama Error: {resp.text}")
-                return None
-        except Exception as e:
-            print(f"Embedding Error: {e}")
-            return None
+        """Get embedding from Ollama (shared batched + cached client)"""
+        return embed_text(text, self.embedding_model, self.ollama_url)
 
     def _get_or_create_collection(self):
         """Get collection ID"""
@@ -96,11 +84,11 @@ class VectorMemory:
 
         print(f"Embedding {len(news_items)} items with {self.embedding_model}...")
         
-        for item in news_items:
-            # Create rich text for embedding
-            text = f"{item['title']}. {item['summary']}"
-            vector = self._get_embedding(text)
-            
+        # Create rich text for embedding, embedded in one batched call
+        texts = [f"{item['title']}. {item['summary']}" for item in news_items]
+        vectors = embed_texts(texts, self.embedding_model, self.ollama_url)
+
+        for item, text, vector in zip(news_items, texts, vectors):
             if vector:
                 embeddings.append(vector)
                 documents.append(text)
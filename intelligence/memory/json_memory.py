@@ -1,83 +1,110 @@
 """
-Zero-Dependency Vector Memory (JSON + Pure Python Math).
-Implements semantic/spatial search without heavy libraries (numpy/chromadb).
-Perfect for datasets < 10,000 items.
+Lightweight Vector Memory (append-only segments + NumPy index).
+Documents are stored by segment_store.SegmentStore: metadata as JSON lines,
+embeddings as binary float32 rows. Adding news only appends; archiving writes
+tombstones and the store is compacted once enough records are dead.
+Searches run on the memory-mapped embeddings (see vector_index.py).
+No chromadb required.
 """
-import json
 import os
 import math
 import logging
-import requests
 import uuid
 from datetime import datetime
 
+import numpy as np
+
+from services.embedding_service import embed_text, embed_texts
+from .segment_store import SegmentStore, migrate_legacy_json
+from .vector_index import VectorIndex
+
 logger = logging.getLogger(__name__)
 
-DB_PATH = os.path.join("data", "warroom_memory.json")
+DB_PATH = os.path.join("data", "warroom_memory")
+ARCHIVE_PATH = os.path.join("data", "warroom_archive")
+# Pre-segment JSON files, migrated on first use (or via scripts/migrate_memory_store.py)
+LEGACY_DB_PATH = os.path.join("data", "warroom_memory.json")
+LEGACY_ARCHIVE_PATH = os.path.join("data", "warroom_archive.json")
+
+# Compact when at least this share of the records are tombstones
+COMPACTION_RATIO = 0.3
+
+
+def open_store(base_path, legacy_path=None):
+    """Open a SegmentStore, importing the legacy JSON file the first time."""
+    store = SegmentStore(base_path)
+    if not store.exists() and legacy_path and os.path.exists(legacy_path):
+        try:
+            count = migrate_legacy_json(legacy_path, store)
+            print(f"📦 Migrated {count} items from {legacy_path} to append-only store")
+        except Exception as e:
+            print(f"⚠️ Error migrating {legacy_path}: {e}")
+    return store
+
+
+def _parse_timestamp(value):
+    """datetime / ISO string -> epoch seconds (NaN if missing or unparsable)."""
+    if not value:
+        return math.nan
+    try:
+        if isinstance(value, datetime):
+            return value.timestamp()
+        if value.endswith('Z'):
+            value = value.replace('Z', '+00:00')
+        return datetime.fromisoformat(value).timestamp()
+    except Exception:
+        return math.nan
+
+
+def _relevance(metadata):
+    try:
+        return float(metadata.get('relevance_score') or 0)
+    except (TypeError, ValueError):
+        return 0.0
 
 class JsonVectorMemory:
     def __init__(self, embedding_model="mistral-nemo:latest"):
         self.embedding_model = embedding_model
         self.ollama_url = "http://localhost:11434"
         self.file_path = DB_PATH
-        self.data = self._load_data()
-        
+
         # Ensure data directory exists
         os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
 
-    def _load_data(self):
-        if os.path.exists(self.file_path):
-            try:
-                with open(self.file_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"⚠️ Error loading memory: {e}")
-                return []
-        return []
-
-    def _save_data(self):
-        with open(self.file_path, 'w', encoding='utf-8') as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        self.store = open_store(self.file_path, LEGACY_DB_PATH)
+        self.index = VectorIndex()
+        self.data = self._load_data()
+        self._build_index()
 
-    def exists(self, link):
-        """Check if a link (URL) is already present in memory."""
-        for item in self.data:
-            if item['metadata'].get('link') == link:
-                return True
-        return False
-    
-    def _get_embedding(self, text):
-        """Get embedding from Ollama API"""
+    def _load_data(self):
         try:
-            url = f"{self.ollama_url}/api/embeddings"
-            payload = {
-                "model": self.embedding_model,
-                "prompt": text
-            }
-            resp = requests.post(url, json=payload)
-            if resp.status_code == 200:
-                vector = resp.json().get('embedding')
-                return vector
-            else:
-                print(f"❌ Ollama Error ({resp.status_code}): {resp.text}")
-                return None
+            return self.store.load()
         except Exception as e:
-            print(f"❌ Connection Error: {e}")
-            return None
+            print(f"⚠️ Error loading memory: {e}")
+            return []
 
-    def _cosine_similarity(self, vec_a, vec_b):
+    def _build_index(self):
         """
-        Pure Python Cosine Similarity.
-        Formula: (A . B) / (||A|| * ||B||)
+        Map the embeddings segment into the vector index and build the per-document
+        arrays used by search filters plus the link -> position lookup used by exists().
         """
-        if not vec_a or not vec_b: return 0.0
-        if len(vec_a) != len(vec_b): return 0.0
-
-        dot_product = sum(a * b for a, b in zip(vec_a, vec_b))
-        norm_a = math.sqrt(sum(a * a for a in vec_a))
-        norm_b = math.sqrt(sum(b * b for b in vec_b))
+        self.index.set_matrix(self.store.vectors())
+        self._rows = np.array([doc['row'] for doc in self.data], dtype=np.int64)
+        self._links = {doc['metadata'].get('link'): pos for pos, doc in enumerate(self.data)}
+        self._sources = np.array([d['metadata'].get('source', 'Unknown') for d in self.data], dtype=object)
+        self._timestamps = np.array(
+            [_parse_timestamp(d['metadata'].get('published_at') or d.get('created_at')) for d in self.data],
+            dtype=np.float64
+        )
+        self._relevance = np.array([_relevance(d['metadata']) for d in self.data], dtype=np.float32)
 
-        return dot_product / (norm_a * norm_b) if norm_a > 0 and norm_b > 0 else 0.0
+    def exists(self, link):
+        """Check if a link (URL) is already present in memory."""
+        return link in self._links
+    
+    def _get_embedding(self, text):
+        """Get embedding from Ollama (shared batched + cached client)"""
+        return embed_text(text, self.embedding_model, self.ollama_url)
 
     def add_news(self, news_items):
         """
@@ -87,17 +114,21 @@ class JsonVectorMemory:
         added_count = 0
         print(f"🧠 Embedding {len(news_items)} items using {self.embedding_model}...")
 
-        # Create a set of existing links to avoid duplicates
-        existing_links = {item.get('link') for item in self.data}
-
+        # Drop duplicates (already stored or repeated in this batch)
+        pending = {}
         for news in news_items:
-            if news['link'] in existing_links:
-                continue
+            if news['link'] not in self._links and news['link'] not in pending:
+                pending[news['link']] = news
+        pending = list(pending.values())
 
-            # Rich text for embedding (Title + Summary)
-            text_to_embed = f"{news['title']}. {news['summary']}"
-            vector = self._get_embedding(text_to_embed)
+        # Rich text for embedding (Title + Summary), embedded in one batched call
+        vectors = embed_texts(
+            [f"{news['title']}. {news['summary']}" for news in pending],
+            self.embedding_model, self.ollama_url
+        )
 
+        new_docs, new_vectors = [], []
+        for news, vector in zip(pending, vectors):
             if vector:
                 # Store all fields in metadata to preserve analysis (scores, reasons, tags)
                 metadata = news.copy()
@@ -113,21 +144,47 @@ class JsonVectorMemory:
                 doc = {
                     "id": str(uuid.uuid4()),
                     "metadata": metadata,
-                    "embedding": vector,  # Store 1024-dim vector
                     "created_at": datetime.now().isoformat()
                 }
-                self.data.append(doc)
+                new_docs.append(doc)
+                new_vectors.append(vector)  # 1024-dim vector -> float32 segment row
                 added_count += 1
-                # print(f"   Embedded: {news['title'][:30]}...")
         
         if added_count > 0:
-            self._save_data()
-            print(f"✅ Saved {added_count} new vectors to {self.file_path}")
+            known = (self.store.generation, self.store.rows)
+            rows = self.store.append(new_docs, new_vectors)  # sets doc['row']
+            if known == (self.store.generation, rows[0]):
+                self._append_docs(new_docs)
+            else:
+                # Another instance appended or compacted since we loaded: resync from disk
+                self.data = self._load_data()
+                self._build_index()
+            print(f"✅ Saved {added_count} new vectors to {self.store.records_path}")
         else:
             print("Types: No new items to add (or duplicates).")
             
         return added_count
 
+    def _append_docs(self, docs):
+        """Keep in-memory views in sync after an append to the store."""
+        first = len(self.data)
+        self.data.extend(docs)
+        self.index.extend(self.store.vectors())
+        self._rows = np.concatenate([self._rows, np.array([d['row'] for d in docs], dtype=np.int64)])
+        self._links.update({d['metadata'].get('link'): first + i for i, d in enumerate(docs)})
+        self._sources = np.concatenate([
+            self._sources,
+            np.array([d['metadata'].get('source', 'Unknown') for d in docs], dtype=object)
+        ])
+        self._timestamps = np.concatenate([
+            self._timestamps,
+            np.array([_parse_timestamp(d['metadata'].get('published_at') or d['created_at']) for d in docs])
+        ])
+        self._relevance = np.concatenate([
+            self._relevance,
+            np.array([_relevance(d['metadata']) for d in docs], dtype=np.float32)
+        ])
+
     def get_recent(self, limit=50):
         """Return the most recent N items."""
         # Sort by created_at desc (or published_at if available and consistent)
@@ -135,9 +192,30 @@ class JsonVectorMemory:
         sorted_data = sorted(self.data, key=lambda x: x.get('created_at', ''), reverse=True)
         return [{"score": 1.0, "metadata": doc['metadata']} for doc in sorted_data[:limit]]
 
-    def search(self, query, n_results=5):
+    def _filter_mask(self, source=None, since=None, until=None, min_relevance=None):
+        """Boolean mask over self.data for the metadata filters (None = no filtering)."""
+        if source is None and since is None and until is None and min_relevance is None:
+            return None
+
+        mask = np.ones(len(self.data), dtype=bool)
+        if source is not None:
+            sources = [source] if isinstance(source, str) else list(source)
+            mask &= np.isin(self._sources, sources)
+        if since is not None:
+            mask &= self._timestamps >= _parse_timestamp(since)  # NaN dates never match
+        if until is not None:
+            mask &= self._timestamps <= _parse_timestamp(until)
+        if min_relevance is not None:
+            mask &= self._relevance >= min_relevance
+        return mask
+
+    def search(self, query, n_results=5, source=None, since=None, until=None, min_relevance=None):
         """
         Semantic Search using Cosine Similarity.
+        Optional filters (applied before scoring):
+          source: source name or list of names
+          since / until: datetime or ISO date on published_at (fallback created_at)
+          min_relevance: minimum metadata relevance_score
         Returns top N matches.
         """
         query_vector = self._get_embedding(query)
@@ -145,83 +223,66 @@ class JsonVectorMemory:
             return []
 
         print(f"🔍 Scanning {len(self.data)} memories for space: '{query}'...")
-        
-        scored_results = []
-        for doc in self.data:
-            score = self._cosine_similarity(query_vector, doc['embedding'])
-            scored_results.append((score, doc))
-
-        # Sort by score descending
-        scored_results.sort(key=lambda x: x[0], reverse=True)
-
-        # Format output
-        results = []
-        for score, doc in scored_results[:n_results]:
-            results.append({
-                "score": round(score, 4),
-                "metadata": doc['metadata']
-            })
-            
-        return results
+
+        mask = self._filter_mask(source, since, until, min_relevance)
+        candidates = self._rows if mask is None else self._rows[mask]
+        hits = self.index.search(query_vector, n_results, candidates)
+
+        # Format output (segment rows are increasing in self.data order)
+        return [
+            {"score": round(score, 4), "metadata": self.data[int(np.searchsorted(self._rows, row))]['metadata']}
+            for row, score in hits
+        ]
 
     def archive_old_items(self, days=30):
         """
-        Moves items older than 'days' to warroom_archive.json.
-        Keeps the active memory lean.
+        Moves items older than 'days' to the archive store (data/warroom_archive.*).
+        Keeps the active memory lean: archived items are appended to the archive,
+        tombstoned here, and the active store is compacted when enough are dead.
         """
-        archive_path = os.path.join("data", "warroom_archive.json")
         cutoff_date = datetime.now().timestamp() - (days * 86400)
         
-        active_items = []
-        archive_items = []
+        active_pos = []
+        archive_pos = []
         
         print(f"🧹 Checking for items older than {days} days...")
         
-        for doc in self.data:
-            try:
-                # Support both created_at (ISO) and published_at (ISO)
-                date_str = doc.get('created_at') or doc['metadata'].get('published_at')
-                if not date_str:
-                    active_items.append(doc)
-                    continue
-                    
-                # Robust date parsing
-                if 'Z' in date_str:
-                    item_date = datetime.fromisoformat(date_str.replace('Z', '+00:00')).timestamp()
-                elif '+' in date_str:
-                     item_date = datetime.fromisoformat(date_str).timestamp()
-                else:
-                    item_date = datetime.fromisoformat(date_str).timestamp()
-                
-                if item_date < cutoff_date:
-                    archive_items.append(doc)
-                else:
-                    active_items.append(doc)
-            except Exception as e:
-                # Keep item if date parsing fails to avoid data loss
-                active_items.append(doc)
-                
-        if archive_items:
-            print(f"📦 Archiving {len(archive_items)} old items to {archive_path}...")
-            
-            # Load existing archive to append
-            existing_archive = []
-            if os.path.exists(archive_path):
-                try:
-                    with open(archive_path, 'r', encoding='utf-8') as f:
-                        existing_archive = json.load(f)
-                except Exception:
-                    existing_archive = []
-            
-            existing_archive.extend(archive_items)
-            
-            # Save Archive
-            with open(archive_path, 'w', encoding='utf-8') as f:
-                json.dump(existing_archive, f, ensure_ascii=False, indent=2)
+        for pos, doc in enumerate(self.data):
+            # Support both created_at (ISO) and published_at (ISO)
+            item_date = _parse_timestamp(doc.get('created_at') or doc['metadata'].get('published_at'))
+            # Keep item if date is missing or parsing fails to avoid data loss
+            if not math.isnan(item_date) and item_date < cutoff_date:
+                archive_pos.append(pos)
+            else:
+                active_pos.append(pos)
                 
-            # Update Active Memory
-            self.data = active_items
-            self._save_data()
+        if archive_pos:
+            archive = open_store(ARCHIVE_PATH, LEGACY_ARCHIVE_PATH)
+            archive.load()
+            print(f"📦 Archiving {len(archive_pos)} old items to {archive.records_path}...")
+
+            archived = [self.data[p] for p in archive_pos]
+            archive.append(
+                [{"id": d['id'], "metadata": d['metadata'], "created_at": d.get('created_at')} for d in archived],
+                [self.index.vector(d['row']) for d in archived]
+            )
+            if self.store.delete([d['id'] for d in archived]):
+                # Another instance compacted meanwhile: our rows point into the old generation
+                self.data = self._load_data()
+            else:
+                # Update Active Memory
+                self.data = [self.data[p] for p in active_pos]
+            if self.store.needs_compaction(len(self.data), COMPACTION_RATIO):
+                self.compact()
+            else:
+                self._build_index()
             print(f"✅ Active memory reduced to {len(self.data)} items.")
         else:
             print("✨ No items to archive.")
+
+    def compact(self):
+        """Rewrite the active store with live documents only (drops tombstones and orphan rows)."""
+        # Drop the mapping so the old generation can be deleted (Windows)
+        self.index.set_matrix(np.zeros((0, self.store.dim), dtype=np.float32))
+        self.data = self.store.compact()
+        self._build_index()
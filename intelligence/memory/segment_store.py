@@ -0,0 +1,274 @@
+"""
+Append-only storage engine for the Intelligence memory.
+
+Layout for a base path such as data/warroom_memory:
+    warroom_memory.meta      {"version": 1, "dim": 1024, "generation": 3}
+    warroom_memory.3.jsonl   one JSON record per line
+                             {"op": "add", "id", "row", "metadata", "created_at"}
+                             {"op": "del", "id"}   (tombstone, e.g. after archiving)
+    warroom_memory.3.f32     embeddings as raw float32, one fixed-width row per "add"
+
+Writes only ever append. Vectors are written and fsync'd before the metadata
+lines that reference them, so a crash leaves at most a truncated last line
+(ignored on load) or unreferenced trailing rows (dropped at compaction).
+compact() writes the live records as the next generation and commits it by
+atomically replacing the .meta file; the old generation is then deleted.
+
+Several SegmentStore instances (in one or more processes) may share a store:
+load/append/delete/compact hold an exclusive lock on <base>.lock and re-read
+the generation and row count from disk instead of trusting cached counters.
+"""
+import os
+import json
+import logging
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from utils.file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+
+
+def _fsync(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+class SegmentStore:
+    def __init__(self, base_path: str):
+        self.base_path = base_path
+        self.meta_path = f"{base_path}.meta"
+        self.lock_path = f"{base_path}.lock"
+        self.dim = 0
+        self.generation = 0
+        self.rows = 0          # rows in the vectors file
+        self.dead = 0          # tombstoned records since last compaction
+
+    def _paths(self, generation: int) -> Tuple[str, str]:
+        return f"{self.base_path}.{generation}.jsonl", f"{self.base_path}.{generation}.f32"
+
+    @property
+    def records_path(self) -> str:
+        return self._paths(self.generation)[0]
+
+    @property
+    def vectors_path(self) -> str:
+        return self._paths(self.generation)[1]
+
+    def exists(self) -> bool:
+        return os.path.exists(self.meta_path)
+
+    # ------------------------------------------------------------
+    # READ
+    # ------------------------------------------------------------
+
+    def _read_meta(self):
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            self.dim = int(meta.get('dim') or 0)
+            self.generation = int(meta.get('generation') or 0)
+
+    def _refresh(self):
+        """Committed state as other instances may have left it (call under the lock)."""
+        self._read_meta()
+        self.rows = 0
+        if self.dim and os.path.exists(self.vectors_path):
+            self.rows = os.path.getsize(self.vectors_path) // (self.dim * 4)
+
+    def _write_meta(self):
+        tmp = f"{self.meta_path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"version": STORE_VERSION, "dim": self.dim, "generation": self.generation}, f)
+            _fsync(f)
+        os.replace(tmp, self.meta_path)
+
+    def vectors(self) -> np.ndarray:
+        """Memory-map the embeddings file as a (rows, dim) float32 matrix."""
+        if not self.rows or not self.dim:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(self.rows, self.dim))
+
+    def load(self) -> List[dict]:
+        """
+        Replay the log. Returns live documents in insertion order:
+        [{"id", "row", "metadata", "created_at"}].
+        """
+        with file_lock(self.lock_path):
+            return self._replay()
+
+    def _replay(self) -> List[dict]:
+        self._refresh()
+        docs: Dict[str, dict] = {}
+        self.dead = 0
+        if not os.path.exists(self.records_path):
+            return []
+
+        torn_at = None
+        with open(self.records_path, 'rb') as f:
+            offset = 0
+            for line in f:
+                start, offset = offset, offset + len(line)
+                if not line.strip():
+                    continue
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("missing newline")
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn write at the tail (crash mid-append; writers hold the lock, so
+                    # this is never an append in progress): drop it and everything after
+                    torn_at = start
+                    break
+
+                if record.get('op') == 'del':
+                    if docs.pop(record['id'], None) is not None:
+                        self.dead += 1
+                elif record.get('row', self.rows) < self.rows:
+                    record.pop('op', None)
+                    docs[record['id']] = record
+
+        if torn_at is not None:
+            logger.warning(f"[MEMORY] {self.records_path}: truncating torn tail at byte {torn_at}")
+            with open(self.records_path, 'r+b') as f:
+                f.truncate(torn_at)
+
+        return list(docs.values())
+
+    # ------------------------------------------------------------
+    # WRITE
+    # ------------------------------------------------------------
+
+    def append(self, docs: List[dict], vectors: List[list]) -> List[int]:
+        """
+        Append documents with their embeddings. Sets and returns each doc's "row".
+        Vectors whose length differs from the store dimension are stored as zeros.
+        Rows are allocated at the end of the current file, so they may not follow
+        on from this instance's last load if another instance appended meanwhile.
+        """
+        if not docs:
+            return []
+        with file_lock(self.lock_path):
+            self._refresh()
+            if not self.dim:
+                self.dim = next((len(v) for v in vectors if v), 0)
+                self._write_meta()
+
+            block = np.zeros((len(docs), self.dim), dtype=np.float32)
+            for i, v in enumerate(vectors):
+                if v is not None and len(v) == self.dim:
+                    block[i] = v
+
+            row_bytes = self.dim * 4
+            with open(self.vectors_path, 'ab') as f:
+                partial = f.tell() % row_bytes
+                if partial:
+                    # A crashed writer left a partial row: pad it to an (unreferenced)
+                    # full row instead of truncating, so no written bytes are lost
+                    f.write(b"\0" * (row_bytes - partial))
+                first_row = f.tell() // row_bytes
+                f.write(block.tobytes())
+                _fsync(f)
+
+            rows = list(range(first_row, first_row + len(docs)))
+            with open(self.records_path, 'a', encoding='utf-8') as f:
+                for doc, row in zip(docs, rows):
+                    doc['row'] = row
+                    f.write(json.dumps({"op": "add", **doc}, ensure_ascii=False) + "\n")
+                _fsync(f)
+
+            self.rows = first_row + len(docs)
+        return rows
+
+    def delete(self, ids: List[str]) -> bool:
+        """
+        Append tombstones for the given document ids (in the current generation).
+        Returns True if another instance compacted since this one loaded: the
+        caller's rows then belong to the old generation and must be reloaded.
+        """
+        if not ids:
+            return False
+        with file_lock(self.lock_path):
+            known = self.generation
+            self._refresh()
+            with open(self.records_path, 'a', encoding='utf-8') as f:
+                for doc_id in ids:
+                    f.write(json.dumps({"op": "del", "id": doc_id}) + "\n")
+                _fsync(f)
+        self.dead += len(ids)
+        return self.generation != known
+
+    def needs_compaction(self, live: int, ratio: float = 0.3) -> bool:
+        return self.dead > 0 and self.dead >= ratio * max(live + self.dead, 1)
+
+    def compact(self) -> List[dict]:
+        """
+        Rewrite the store with only its live records (rows re-numbered 0..n-1)
+        as a new generation. The live set is replayed from disk under the lock,
+        so records appended by other instances are kept. Callers should drop
+        their memmap of the old vectors file first (see vectors()).
+        Returns the live docs with their new rows.
+        """
+        with file_lock(self.lock_path):
+            docs = self._replay()
+            old_records, old_vectors = self.records_path, self.vectors_path
+            vectors = np.zeros((0, self.dim), dtype=np.float32)
+            if self.rows:
+                vectors = np.fromfile(old_vectors, dtype=np.float32, count=self.rows * self.dim).reshape(self.rows, self.dim)
+
+            new_generation = self.generation + 1
+            new_records, new_vectors = self._paths(new_generation)
+
+            compacted = []
+            with open(new_vectors, 'wb') as fv, open(new_records, 'w', encoding='utf-8') as fr:
+                for new_row, doc in enumerate(docs):
+                    fv.write(vectors[doc['row']].tobytes())
+                    doc = dict(doc, row=new_row)
+                    fr.write(json.dumps({"op": "add", **doc}, ensure_ascii=False) + "\n")
+                    compacted.append(doc)
+                _fsync(fv)
+                _fsync(fr)
+
+            # Commit point: the .meta file now names the new generation.
+            # Other instances switch to it on their next locked operation.
+            self.generation = new_generation
+            self._write_meta()
+            for path in (old_records, old_vectors):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    # e.g. still memory-mapped on Windows; harmless leftover
+                    logger.debug(f"[MEMORY] Could not remove {path}: {e}")
+
+            self.rows = len(compacted)
+            self.dead = 0
+        logger.info(f"[MEMORY] Compacted {self.base_path}: {len(compacted)} live records")
+        return compacted
+
+
+def migrate_legacy_json(json_path: str, store: SegmentStore) -> int:
+    """
+    Import a legacy JSON memory file ([{"id", "metadata", "embedding", "created_at"}])
+    into an empty SegmentStore. Returns the number of migrated documents.
+    """
+    with open(json_path, 'r', encoding='utf-8') as f:
+        legacy = json.load(f)
+
+    docs, vectors = [], []
+    for item in legacy:
+        docs.append({
+            "id": item.get('id'),
+            "metadata": item.get('metadata', {}),
+            "created_at": item.get('created_at'),
+        })
+        vectors.append(item.get('embedding'))
+
+    # Keep memory bounded for large files
+    for i in range(0, len(docs), 1000):
+        store.append(docs[i:i + 1000], vectors[i:i + 1000])
+
+    logger.info(f"[MEMORY] Migrated {len(docs)} documents from {json_path} to {store.records_path}")
+    return len(docs)
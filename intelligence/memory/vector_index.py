@@ -0,0 +1,84 @@
+"""
+In-memory semantic index for the Intelligence memory.
+Embeddings are one contiguous float32 matrix (rows = documents, typically the
+memory-mapped segment file of segment_store.py) with precomputed L2 norms.
+A query is scored with a single matrix-vector product and the top-k are
+selected with argpartition (no full sort).
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+class VectorIndex:
+    def __init__(self):
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.norms = np.zeros(0, dtype=np.float32)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+    def set_matrix(self, matrix: np.ndarray):
+        """Attach a (rows, dim) float32 matrix (ndarray or memmap) and compute its norms."""
+        self.matrix = matrix
+        self.norms = np.linalg.norm(matrix, axis=1).astype(np.float32) if len(matrix) else np.zeros(0, dtype=np.float32)
+
+    def extend(self, matrix: np.ndarray):
+        """
+        Attach a grown matrix whose first len(self) rows are unchanged
+        (e.g. the segment file re-mapped after an append); only new norms are computed.
+        """
+        known = len(self)
+        if known == 0 or matrix.shape[1] != self.dim:
+            self.set_matrix(matrix)
+            return
+        new_norms = np.linalg.norm(matrix[known:], axis=1).astype(np.float32)
+        self.matrix = matrix
+        self.norms = np.concatenate([self.norms, new_norms])
+
+    def vector(self, row: int) -> list:
+        return self.matrix[row].tolist()
+
+    @staticmethod
+    def _scores(matrix: np.ndarray, norms: np.ndarray, q: np.ndarray, q_norm: float) -> np.ndarray:
+        dots = matrix @ q
+        denom = norms * q_norm
+        return np.divide(dots, denom, out=np.zeros_like(dots), where=denom > 0)
+
+    def search(self, query: list, k: int, rows: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Cosine top-k. `rows` (int array) restricts the candidates before scoring,
+        e.g. live documents matching the metadata filters.
+        Returns [(row, score)] sorted by score desc.
+        """
+        if len(self) == 0 or not query or len(query) != self.dim or k <= 0:
+            return []
+
+        q = np.asarray(query, dtype=np.float32)
+        q_norm = float(np.linalg.norm(q))
+        if q_norm == 0:
+            return []
+
+        if rows is not None and rows.size == 0:
+            return []
+
+        if rows is not None and rows.size < len(self) // 2:
+            # Selective filter: gather the candidate rows, score only those
+            scores = self._scores(self.matrix[rows], self.norms[rows], q, q_norm)
+        else:
+            # Score everything in one pass (no copy of the matrix), then restrict
+            scores = self._scores(self.matrix, self.norms, q, q_norm)
+            if rows is not None:
+                scores = scores[rows]
+
+        k = min(k, scores.size)
+        top = np.argpartition(-scores, k - 1)[:k] if k < scores.size else np.arange(scores.size)
+        top = top[np.argsort(-scores[top], kind='stable')]
+
+        if rows is not None:
+            return [(int(rows[i]), float(scores[i])) for i in top]
+        return [(int(i), float(scores[i])) for i in top]
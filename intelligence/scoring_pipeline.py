@@ -0,0 +1,200 @@
+"""
+Scoring Pipeline
+Concurrent, batched LLM scoring of news items for the Intelligence Engine.
+
+- Several items are packed into one structured JSON prompt (SCORE_BATCH_SIZE);
+  items missing or malformed in a batch answer are retried alone, the rest are kept.
+- A bounded pool (SCORE_CONCURRENCY) keeps a few requests in flight against
+  Ollama / the NHI orchestrator.
+- Results are cached in SQLite (data/llm_scores.db) keyed by
+  (link, prompt version, model), so re-scanning the same items is free.
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SCORE_CACHE_DB = os.path.join("data", "llm_scores.db")
+
+SCORE_BATCH_SIZE = int(os.getenv("SCORE_BATCH_SIZE", "4"))     # items per prompt (1 = no batching)
+SCORE_CONCURRENCY = int(os.getenv("SCORE_CONCURRENCY", "2"))   # in-flight LLM requests
+SCORE_RETRIES = int(os.getenv("SCORE_RETRIES", "2"))           # single-item retries for failed items
+
+REQUIRED_FIELDS = ("relevance_score", "magnitude_score")
+
+
+def _connect():
+    os.makedirs(os.path.dirname(SCORE_CACHE_DB), exist_ok=True)
+    conn = sqlite3.connect(SCORE_CACHE_DB, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS scores ("
+        " link TEXT NOT NULL,"
+        " prompt_version TEXT NOT NULL,"
+        " model TEXT NOT NULL,"
+        " analysis TEXT NOT NULL,"
+        " created_at REAL NOT NULL,"
+        " PRIMARY KEY (link, prompt_version, model))"
+    )
+    return conn
+
+
+def load_cached_scores(links: List[str], prompt_version: str, model: str) -> Dict[str, dict]:
+    if not links:
+        return {}
+    found = {}
+    try:
+        conn = _connect()
+        try:
+            for i in range(0, len(links), 500):
+                chunk = links[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    "SELECT link, analysis FROM scores "
+                    f"WHERE prompt_version = ? AND model = ? AND link IN ({placeholders})",
+                    [prompt_version, model, *chunk]
+                ).fetchall()
+                for link, analysis in rows:
+                    found[link] = json.loads(analysis)
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning(f"[SCORING] Failed to read score cache: {e}")
+    return found
+
+
+def save_cached_scores(scores: Dict[str, dict], prompt_version: str, model: str):
+    if not scores:
+        return
+    now = time.time()
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO scores (link, prompt_version, model, analysis, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(link, prompt_version, model, json.dumps(a, ensure_ascii=False), now) for link, a in scores.items()]
+                )
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning(f"[SCORING] Failed to write score cache: {e}")
+
+
+def _valid(analysis) -> bool:
+    return isinstance(analysis, dict) and all(analysis.get(f) is not None for f in REQUIRED_FIELDS)
+
+
+class ScoringPipeline:
+    """
+    submit() items as they arrive (e.g. one call per scraped source), then collect()
+    once: returns {link: analysis} for every item that was scored (or cached).
+    Single use: the worker pool is shut down by collect().
+    """
+    def __init__(self, chat: Callable[[str], Optional[str]],
+                 single_prompt: Callable[[dict], str],
+                 batch_prompt: Callable[[List[dict]], str],
+                 prompt_version: str, model: str,
+                 batch_size: int = None, concurrency: int = None):
+        """
+        chat: prompt -> raw JSON string (or None on failure)
+        single_prompt / batch_prompt: build the prompt for one item / several items
+        """
+        self.chat = chat
+        self.single_prompt = single_prompt
+        self.batch_prompt = batch_prompt
+        self.prompt_version = prompt_version
+        self.model = model
+        self.batch_size = max(1, batch_size or SCORE_BATCH_SIZE)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency or SCORE_CONCURRENCY, thread_name_prefix="score")
+        self.futures = []
+        self.results: Dict[str, dict] = {}
+        self.fresh: Dict[str, dict] = {}
+        self.stats = {"cached": 0, "scored": 0, "failed": 0, "requests": 0}
+        self._stats_lock = threading.Lock()
+
+    # ------------------------------------------------------------
+    # WORKERS
+    # ------------------------------------------------------------
+
+    def _ask(self, prompt: str):
+        with self._stats_lock:
+            self.stats["requests"] += 1
+        response = self.chat(prompt)
+        return json.loads(response) if response else None
+
+    def _score_one(self, item: dict) -> Optional[dict]:
+        for attempt in range(1, SCORE_RETRIES + 1):
+            try:
+                analysis = self._ask(self.single_prompt(item))
+                if _valid(analysis):
+                    return analysis
+            except Exception as e:
+                logger.debug(f"[SCORING] Attempt {attempt} failed for {item['title'][:30]}: {e}")
+        return None
+
+    def _score_batch(self, items: List[dict]) -> Dict[str, Optional[dict]]:
+        """Score a batch in one prompt; retry alone only the items the answer is missing."""
+        by_id: Dict[str, dict] = {}
+        if len(items) > 1:
+            try:
+                answer = self._ask(self.batch_prompt(items)) or {}
+                for entry in answer.get('items', []) if isinstance(answer, dict) else []:
+                    if isinstance(entry, dict) and 'id' in entry:
+                        by_id[str(entry['id'])] = entry
+            except Exception as e:
+                logger.debug(f"[SCORING] Batch of {len(items)} failed, retrying items alone: {e}")
+
+        results = {}
+        for idx, item in enumerate(items):
+            analysis = by_id.get(str(idx))
+            if _valid(analysis):
+                analysis.pop('id', None)
+                results[item['link']] = analysis
+            else:
+                results[item['link']] = self._score_one(item)
+        return results
+
+    # ------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------
+
+    def submit(self, items: List[dict]):
+        """Queue items for scoring (cached links resolve immediately)."""
+        items = [i for i in items if i['link'] not in self.results]
+        if not items:
+            return
+
+        cached = load_cached_scores([i['link'] for i in items], self.prompt_version, self.model)
+        self.results.update(cached)
+        self.stats["cached"] += len(cached)
+
+        pending = [i for i in items if i['link'] not in cached]
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            self.futures.append(self.executor.submit(self._score_batch, batch))
+
+    def collect(self) -> Dict[str, dict]:
+        """Wait for every queued batch, store new scores in the cache, return {link: analysis}."""
+        try:
+            for future in self.futures:
+                for link, analysis in future.result().items():
+                    if analysis is None:
+                        self.stats["failed"] += 1
+                        continue
+                    self.results[link] = analysis
+                    self.fresh[link] = analysis
+                    self.stats["scored"] += 1
+        finally:
+            self.futures = []
+            self.executor.shutdown(wait=False)
+
+        save_cached_scores(self.fresh, self.prompt_version, self.model)
+        return self.results
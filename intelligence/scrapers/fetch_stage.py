@@ -0,0 +1,170 @@
+"""
+Concurrent Fetch Stage
+Runs the scrape of every configured source (RSS feeds, YouTube channels) in parallel:
+
+- Bounded worker pool plus a per-host limit (YouTube channels all hit youtube.com).
+- Per-source timeout: a slow source is reported as "timeout" and its late result dropped.
+- Conditional GET: ETag / Last-Modified are stored per source in data/feed_state.json,
+  so an unchanged feed costs a 304 instead of a download + parse.
+- Results are yielded as each source completes, so analysis can start immediately.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+FEED_STATE_PATH = os.path.join("data", "feed_state.json")
+
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", "8"))
+SCRAPE_PER_HOST = int(os.getenv("SCRAPE_PER_HOST", "2"))
+RSS_TIMEOUT = int(os.getenv("SCRAPE_RSS_TIMEOUT", "20"))          # seconds per feed
+YOUTUBE_TIMEOUT = int(os.getenv("SCRAPE_YOUTUBE_TIMEOUT", "120"))  # seconds per channel (transcripts)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Pooled session shared by the scrapers (keep-alive across feeds on the same host)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max(SCRAPE_PER_HOST, 4))
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+    return _session
+
+
+def conditional_get(url: str, state: Optional[dict] = None, timeout: int = RSS_TIMEOUT, **kwargs):
+    """
+    GET with If-None-Match / If-Modified-Since taken from `state`.
+    Updates `state` in place ('etag', 'last_modified', 'not_modified').
+    Returns the response, or None when the server answered 304 Not Modified.
+    """
+    headers = dict(kwargs.pop('headers', None) or {})
+    if state is not None:
+        if state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
+
+    resp = get_session().get(url, headers=headers, timeout=timeout, **kwargs)
+
+    if state is not None:
+        state['not_modified'] = resp.status_code == 304
+        if resp.status_code == 200:
+            state['etag'] = resp.headers.get('ETag')
+            state['last_modified'] = resp.headers.get('Last-Modified')
+
+    return None if resp.status_code == 304 else resp
+
+
+def load_feed_state() -> Dict[str, dict]:
+    if os.path.exists(FEED_STATE_PATH):
+        try:
+            with open(FEED_STATE_PATH, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Failed to read feed state: {e}")
+    return {}
+
+
+def save_feed_state(state: Dict[str, dict]):
+    """Atomic write (temp file + rename)."""
+    try:
+        os.makedirs(os.path.dirname(FEED_STATE_PATH), exist_ok=True)
+        tmp = f"{FEED_STATE_PATH}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp, FEED_STATE_PATH)
+    except Exception as e:
+        logger.warning(f"Failed to save feed state: {e}")
+
+
+@dataclass
+class SourceTask:
+    """
+    One source to scrape. `fetch(state)` returns the list of news items; `state` is the
+    source's persisted dict (validators etc.), mutated in place by the scraper.
+    """
+    key: str
+    name: str
+    kind: str
+    url: str
+    fetch: Callable[[dict], list]
+    timeout: int = RSS_TIMEOUT
+    state: dict = field(default_factory=dict)
+
+    @property
+    def host(self) -> str:
+        return urlparse(self.url).netloc or self.url
+
+
+def iter_sources(tasks: list, workers: int = None, per_host: int = None) -> Iterator[tuple]:
+    """
+    Run all tasks concurrently and yield (task, items, report) as each one finishes.
+    report: {"source", "kind", "status": ok|not_modified|error|timeout, "items", "seconds", "error"?}
+    Timed-out sources are yielded with items=[] once their deadline passes.
+    """
+    if not tasks:
+        return
+
+    workers = workers or SCRAPE_WORKERS
+    per_host = per_host or SCRAPE_PER_HOST
+    host_slots = {t.host: threading.BoundedSemaphore(per_host) for t in tasks}
+    started: Dict[int, float] = {}
+
+    def run(idx: int, task: SourceTask):
+        with host_slots[task.host]:
+            started[idx] = time.perf_counter()
+            items = task.fetch(task.state)
+            return items, time.perf_counter() - started[idx]
+
+    executor = ThreadPoolExecutor(max_workers=min(workers, len(tasks)), thread_name_prefix="scrape")
+    try:
+        pending = {executor.submit(run, i, t): (i, t) for i, t in enumerate(tasks)}
+
+        while pending:
+            # Wake up at the earliest per-source deadline among running tasks (max 1s)
+            now = time.perf_counter()
+            deadlines = [started[i] + t.timeout for i, t in pending.values() if i in started]
+            wait_for = max(0.05, min([d - now for d in deadlines] + [1.0]))
+            done, _ = wait(list(pending), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                idx, task = pending.pop(future)
+                report = {"source": task.name, "kind": task.kind}
+                try:
+                    items, seconds = future.result()
+                    status = "not_modified" if task.state.get('not_modified') else "ok"
+                    report.update(status=status, items=len(items), seconds=round(seconds, 2))
+                except Exception as e:
+                    items = []
+                    seconds = time.perf_counter() - started.get(idx, time.perf_counter())
+                    report.update(status="error", items=0, seconds=round(seconds, 2), error=str(e))
+                yield task, items, report
+
+            now = time.perf_counter()
+            for future, (idx, task) in list(pending.items()):
+                if idx in started and now - started[idx] > task.timeout:
+                    # The thread cannot be killed; stop waiting and ignore its result
+                    pending.pop(future)
+                    report = {
+                        "source": task.name, "kind": task.kind, "status": "timeout",
+                        "items": 0, "seconds": round(now - started[idx], 2),
+                    }
+                    yield task, [], report
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -7,19 +7,27 @@ from datetime import datetime
 from email.utils import parsedate_to_datetime
 import time
 
+from .fetch_stage import conditional_get, RSS_TIMEOUT
+
 class RSSScraper:
     def __init__(self):
         self.user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 
-    def fetch(self, url: str, source_name: str) -> list:
+    def fetch(self, url: str, source_name: str, state: dict = None, timeout: int = RSS_TIMEOUT) -> list:
         """
         Fetch RSS feed and return list of normalized news items.
+        state: optional per-feed dict with 'etag' / 'last_modified' (conditional GET),
+               updated in place. An unchanged feed (304) returns [].
         """
         print(f"Fetching {source_name} from {url}...")
         
-        # feedparser handles downloads, but sometimes we might need custom headers if blocked
-        # For now, standard feedparser usage
-        feed = feedparser.parse(url, agent=self.user_agent)
+        # Download ourselves (timeout + conditional GET), feedparser only parses
+        resp = conditional_get(url, state, timeout=timeout, headers={'User-Agent': self.user_agent})
+        if resp is None:
+            print(f"Not modified: {source_name}")
+            return []
+        resp.raise_for_status()
+        feed = feedparser.parse(resp.content)
         
         if feed.bozo:
             print(f"Warning: Feed {source_name} has parsing errors: {feed.bozo_exception}")
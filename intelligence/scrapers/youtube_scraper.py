@@ -8,6 +8,8 @@ import logging
 from youtube_transcript_api import YouTubeTranscriptApi
 from youtube_transcript_api.formatters import TextFormatter
 
+from .fetch_stage import conditional_get
+
 logger = logging.getLogger(__name__)
 
 class YoutubeScraper:
@@ -105,15 +107,19 @@ class YoutubeScraper:
             
         return None, None
 
-    def get_latest_videos(self, channel_id, limit=3):
+    def get_latest_videos(self, channel_id, limit=3, state=None):
         """
         Fetches latest videos from the RSS feed.
+        state: optional per-feed dict for conditional GET (see fetch_stage.conditional_get);
+               returns [] when the feed is unchanged.
         """
         rss_url = f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"
         
         # Use requests to fetch with headers (avoid 403 Forbidden)
         try:
-            resp = requests.get(rss_url, headers=self.headers, timeout=10)
+            resp = conditional_get(rss_url, state, timeout=10, headers=self.headers)
+            if resp is None:
+                return []
             if resp.status_code != 200:
                 logger.error(f"Failed to fetch RSS {rss_url}: {resp.status_code}")
                 return []
@@ -151,7 +157,7 @@ class YoutubeScraper:
             logger.warning(f"No transcript for {video_id}: {e}")
             return None
 
-    def fetch_channel_updates(self, handle, limit=5, filter_keyword=None, display_name=None, strategy="STRATEGY_HYBRID"):
+    def fetch_channel_updates(self, handle, limit=5, filter_keyword=None, display_name=None, strategy="STRATEGY_HYBRID", state=None):
         """
         HIGH-LEVEL METHOD: Fetch latest videos, filter by keyword, get transcript.
         
@@ -161,22 +167,29 @@ class YoutubeScraper:
             filter_keyword: If set, only keep videos containing this string in title (case-insensitive).
             display_name: Optional override for source name.
             strategy: Extraction strategy ("STRATEGY_FULL_TRANSCRIPT", "STRATEGY_METADATA_ONLY", "STRATEGY_HYBRID")
+            state: Optional persisted per-source dict: caches the resolved channel ID and the
+                   feed's ETag/Last-Modified (unchanged feed -> []). Updated in place.
         Returns:
             List of news-item style dicts.
         """
         logger.info(f"📺 Scanning Channel: {handle} (Limit: {limit}, Filter: {filter_keyword}, Strategy: {strategy})")
         
-        # 1. Resolve ID
-        channel_id = self.get_channel_id(handle)
+        # 1. Resolve ID (cached in state across scans)
+        channel_id = (state or {}).get('channel_id') or self.get_channel_id(handle)
         if not channel_id:
             logger.error(f"   ❌ Could not resolve ID for {handle}")
             return []
+        if state is not None:
+            state['channel_id'] = channel_id
             
         # 2. Get Videos (RSS is better for lists than scraping /videos HTML which is complex)
         # Note: HTML scraping /videos usually only gives the absolute latest easily.
         # RSS gives last 15.
-        videos = self.get_latest_videos(channel_id, limit=15) # Fetch more to allow for filtering
+        videos = self.get_latest_videos(channel_id, limit=15, state=state) # Fetch more to allow for filtering
         
+        if state and state.get('not_modified'):
+            logger.info(f"   ⏭️ Feed unchanged for {handle}")
+            return []
         if not videos:
             logger.warning(f"   ❌ No videos found for {handle}")
             return []
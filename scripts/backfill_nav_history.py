@@ -0,0 +1,44 @@
+"""
+Backfill NAV History
+Rebuilds daily portfolio values from the transactions table and historical
+closes/FX (services/nav_engine.py) and writes them into portfolio_snapshots.
+Days that already have a snapshot are kept unless --overwrite.
+
+Usage:
+    python scripts/backfill_nav_history.py [--since 2020-01-01] [--overwrite]
+"""
+import sys
+import argparse
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.nav_engine import nav_engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill portfolio_snapshots from transactions")
+    parser.add_argument("--since", type=date.fromisoformat, default=None, help="First day to write (YYYY-MM-DD)")
+    parser.add_argument("--overwrite", action="store_true", help="Replace existing snapshots too")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("📈 NAV HISTORY BACKFILL")
+    print("=" * 60)
+
+    series = nav_engine.update()
+    if series.empty:
+        print("❌ No BUY/SELL transactions found.")
+        sys.exit(1)
+
+    first, last = series.index[0].date(), series.index[-1].date()
+    print(f"Reconstructed {len(series)} days ({first} → {last}), {len(nav_engine.instruments)} instruments")
+
+    written = nav_engine.backfill_snapshots(start=args.since, overwrite=args.overwrite)
+    print(f"✅ {written} snapshot day(s) written")
+    print(f"   Last day: value €{series['value'].iloc[-1]:,.2f}  cost €{series['cost'].iloc[-1]:,.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: Quote Engine vs Sequential Pricing
+Compares cold (empty cache) and warm (cached) refresh wall-clock of
+get_live_values_for_holdings against the old one-holding-at-a-time get_price loop.
+
+Usage:
+    python scripts/benchmark_quote_engine.py [--workers 8]
+"""
+import sys
+import time
+import argparse
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.portfolio_service import get_all_holdings
+from services.price_service_v5 import (
+    get_live_values_for_holdings, get_coingecko_prices, get_price, clear_cache
+)
+
+
+def sequential_refresh(holdings: list):
+    """The pre-quote-engine path: one get_price call per holding."""
+    crypto_tickers = [h['ticker'] for h in holdings if h.get('asset_type') == 'CRYPTO']
+    crypto_data = get_coingecko_prices(crypto_tickers) if crypto_tickers else {}
+    for h in holdings:
+        if h.get('asset_type') == 'CASH':
+            continue
+        if h.get('asset_type') == 'CRYPTO' and h.get('ticker') in crypto_data:
+            continue
+        purchase_price = Decimal(str(h.get('purchase_price') or h.get('current_price') or 0))
+        get_price(h.get('ticker', ''), h.get('isin'), h.get('asset_type', ''), purchase_price)
+
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {elapsed:8.2f}s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark price refresh paths")
+    parser.add_argument("--workers", type=int, default=None, help="Quote engine worker count")
+    args = parser.parse_args()
+
+    holdings = get_all_holdings()
+    distinct = {(h.get('asset_type'), (h.get('isin') or h.get('ticker') or '').upper()) for h in holdings}
+
+    print("=" * 60)
+    print("⏱️  QUOTE ENGINE BENCHMARK")
+    print("=" * 60)
+    print(f"Holdings: {len(holdings)} | Distinct symbols: {len(distinct)}")
+
+    results = {}
+
+    print("\n[1] Sequential (legacy path)")
+    clear_cache()
+    results['seq_cold'] = timed("cold", lambda: sequential_refresh(holdings))
+    results['seq_warm'] = timed("warm", lambda: sequential_refresh(holdings))
+
+    print("\n[2] Quote engine")
+    clear_cache()
+    results['qe_cold'] = timed("cold", lambda: get_live_values_for_holdings(holdings, max_workers=args.workers))
+    results['qe_warm'] = timed("warm", lambda: get_live_values_for_holdings(holdings, max_workers=args.workers))
+
+    print("\n[3] Speed-up")
+    for phase in ('cold', 'warm'):
+        seq, qe = results[f'seq_{phase}'], results[f'qe_{phase}']
+        ratio = seq / qe if qe > 0 else float('inf')
+        print(f"  {phase:<28} {ratio:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Benchmark: Bulk Transaction Loader vs Per-Row Duplicate Probe
+Loads a synthetic statement (default 10k rows) twice:
+  1. legacy path - one SELECT probe + session.add per row
+  2. DataLoader.load_transactions - fingerprints + multi-row INSERT ... ON CONFLICT DO NOTHING
+The second load of each path measures re-importing the same statement (all duplicates).
+
+Runs against a throwaway SQLite file by default; pass --database-url to use
+a scratch Postgres database (the transactions table is created if missing).
+
+Usage:
+    python scripts/benchmark_transaction_loader.py [--rows 10000] [--database-url URL]
+"""
+import sys
+import time
+import uuid
+import random
+import argparse
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from db.models import Transaction
+from ingestion.pipeline.data_loader import (
+    DataLoader, parse_date, parse_european_number, normalize_operation, validate_isin
+)
+
+BROKER = "BENCH"
+
+
+def synthetic_statement(rows: int, seed: int = 42) -> list:
+    """Parser-shaped rows (European number format, like a BG Saxo / Scalable export)."""
+    rng = random.Random(seed)
+    start = date(2015, 1, 1)
+    tickers = [(f"TCK{i:03d}", f"US{i:010d}") for i in range(200)]
+    items = []
+    for i in range(rows):
+        ticker, isin = rng.choice(tickers)
+        qty = rng.randint(1, 500)
+        price = rng.uniform(5, 900)
+        items.append({
+            'date': (start + timedelta(days=rng.randint(0, 3650))).strftime('%d/%m/%Y'),
+            'ticker': ticker,
+            'isin': isin,
+            'operation': rng.choice(['Acquista', 'Vendi', 'Dividendo']),
+            'quantity': str(qty),
+            'price': f"{price:.2f}".replace('.', ','),
+            'total_amount': f"{qty * price:.2f}".replace('.', ','),
+            'currency': 'EUR',
+            'source_page': i // 40 + 1,
+        })
+    return items
+
+
+def legacy_load(session_factory, items: list, source_file: str) -> tuple:
+    """The pre-bulk path: duplicate probe + add, one row at a time."""
+    session = session_factory()
+    inserted = skipped = 0
+    try:
+        for item in items:
+            tx_date = parse_date(item.get('date'))
+            ticker = item.get('ticker', 'UNKNOWN')
+            operation = normalize_operation(item.get('operation', 'OTHER'))
+            total = parse_european_number(item.get('total_amount', 0)) or Decimal('0')
+            if tx_date:
+                existing = session.query(Transaction).filter(
+                    Transaction.broker == BROKER,
+                    Transaction.ticker == ticker,
+                    Transaction.operation == operation,
+                    Transaction.total_amount == total
+                ).first()
+                if existing:
+                    skipped += 1
+                    continue
+            session.add(Transaction(
+                id=uuid.uuid4(),
+                broker=BROKER,
+                ticker=ticker,
+                isin=validate_isin(item.get('isin', '')),
+                operation=operation,
+                status='COMPLETED',
+                quantity=parse_european_number(item.get('quantity', 0)) or Decimal('0'),
+                price=parse_european_number(item.get('price', 0)) or Decimal('0'),
+                total_amount=total,
+                currency=item.get('currency', 'EUR'),
+                fees=Decimal('0'),
+                timestamp=datetime.combine(tx_date, datetime.min.time()),
+                source_document=source_file,
+            ))
+            inserted += 1
+        session.commit()
+    finally:
+        session.close()
+    return inserted, skipped
+
+
+def clear(session_factory):
+    session = session_factory()
+    try:
+        session.query(Transaction).filter(Transaction.broker == BROKER).delete()
+        session.commit()
+    finally:
+        session.close()
+
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    inserted, skipped = fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<16} {elapsed:8.2f}s   inserted={inserted:<6} skipped={skipped}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark transaction loading paths")
+    parser.add_argument("--rows", type=int, default=10000, help="Synthetic statement size")
+    parser.add_argument("--database-url", default=None, help="Scratch DB (default: temporary SQLite file)")
+    args = parser.parse_args()
+
+    tmp_dir = None
+    url = args.database_url
+    if not url:
+        tmp_dir = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{Path(tmp_dir.name) / 'bench.db'}"
+
+    engine = create_engine(url)
+    Transaction.__table__.create(engine, checkfirst=True)
+    session_factory = sessionmaker(bind=engine, autoflush=True)
+
+    items = synthetic_statement(args.rows)
+
+    print("=" * 60)
+    print("⏱️  TRANSACTION LOADER BENCHMARK")
+    print("=" * 60)
+    print(f"Rows: {len(items)} | DB: {engine.dialect.name}")
+
+    results = {}
+    clear(session_factory)
+
+    print("\n[1] Legacy (per-row probe)")
+    results['legacy_first'] = timed("first load", lambda: legacy_load(session_factory, items, "bench.pdf"))
+    results['legacy_reload'] = timed("re-import", lambda: legacy_load(session_factory, items, "bench.pdf"))
+    clear(session_factory)
+
+    print("\n[2] Bulk (fingerprint + ON CONFLICT DO NOTHING)")
+
+    def bulk():
+        loader = DataLoader(session_factory=session_factory)
+        loader.load_transactions(BROKER, items, "bench.pdf")
+        stats = loader.get_stats()
+        return stats['transactions_created'], stats['transactions_skipped']
+
+    results['bulk_first'] = timed("first load", bulk)
+    results['bulk_reload'] = timed("re-import", bulk)
+    clear(session_factory)
+
+    print("\n[3] Speed-up")
+    for phase in ('first', 'reload'):
+        legacy, fast = results[f'legacy_{phase}'], results[f'bulk_{phase}']
+        ratio = legacy / fast if fast > 0 else float('inf')
+        print(f"  {phase:<16} {ratio:8.1f}x")
+
+    engine.dispose()
+    if tmp_dir:
+        tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Load Test: /api/portfolio latency while an Intelligence scan runs
+Measures p50/p95/p99 of GET /api/portfolio at idle, then again while
+POST /api/scheduler/run-now is in flight. With the scan offloaded from the
+event loop the two distributions should be close.
+
+Usage:
+    python scripts/loadtest_portfolio_during_scan.py [--base http://localhost:8201] [--concurrency 10]
+"""
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+import httpx
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[idx]
+
+
+async def hammer(client: httpx.AsyncClient, url: str, stop: asyncio.Event, latencies: list, errors: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            resp = await client.get(url)
+            if resp.status_code != 200:
+                errors.append(resp.status_code)
+        except Exception as e:
+            errors.append(type(e).__name__)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run_phase(client, base: str, concurrency: int, stop: asyncio.Event):
+    latencies, errors = [], []
+    workers = [
+        asyncio.create_task(hammer(client, f"{base}/api/portfolio", stop, latencies, errors))
+        for _ in range(concurrency)
+    ]
+    await stop.wait()
+    await asyncio.gather(*workers)
+    return latencies, errors
+
+
+def report(label: str, latencies: list, errors: list):
+    if not latencies:
+        print(f"  {label:<12} no samples")
+        return
+    print(
+        f"  {label:<12} n={len(latencies):<6} "
+        f"p50={percentile(latencies, 50):7.1f}ms  "
+        f"p95={percentile(latencies, 95):7.1f}ms  "
+        f"p99={percentile(latencies, 99):7.1f}ms  "
+        f"mean={statistics.mean(latencies):7.1f}ms  errors={len(errors)}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Portfolio latency under a running scan")
+    parser.add_argument("--base", default="http://localhost:8201")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--baseline-seconds", type=float, default=15)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("📈 LOAD TEST: /api/portfolio during Intelligence scan")
+    print("=" * 60)
+
+    async with httpx.AsyncClient(timeout=60) as client:
+        # Warm up (builds snapshot if missing)
+        await client.get(f"{args.base}/api/portfolio")
+
+        # Phase 1: idle
+        stop = asyncio.Event()
+        asyncio.get_running_loop().call_later(args.baseline_seconds, stop.set)
+        idle = await run_phase(client, args.base, args.concurrency, stop)
+
+        # Phase 2: during scan
+        stop = asyncio.Event()
+        scan_start = time.perf_counter()
+
+        async def trigger_scan():
+            try:
+                async with httpx.AsyncClient(timeout=None) as scan_client:
+                    resp = await scan_client.post(f"{args.base}/api/scheduler/run-now")
+                    print(f"  Scan finished: HTTP {resp.status_code} {resp.text[:80]}")
+            finally:
+                stop.set()
+
+        scan_task = asyncio.create_task(trigger_scan())
+        during = await run_phase(client, args.base, args.concurrency, stop)
+        await scan_task
+        scan_secs = time.perf_counter() - scan_start
+
+    print(f"\nScan duration: {scan_secs:.1f}s | Concurrency: {args.concurrency}")
+    report("idle", *idle)
+    report("during scan", *during)
+
+    idle_p99 = percentile(idle[0], 99)
+    during_p99 = percentile(during[0], 99)
+    if idle_p99 > 0:
+        print(f"\np99 ratio (during/idle): {during_p99 / idle_p99:.2f}x")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        sys.exit(1)
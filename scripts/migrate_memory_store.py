@@ -0,0 +1,83 @@
+"""
+Migration: JSON Intelligence memory -> append-only segment store
+Converts data/warroom_memory.json and data/warroom_archive.json into
+JSON-lines metadata + float32 embedding segments (intelligence/memory/segment_store.py).
+The legacy files are left untouched.
+
+JsonVectorMemory also migrates automatically on first use; this script lets you
+do it explicitly (and compact afterwards).
+
+Usage:
+    python scripts/migrate_memory_store.py [--force] [--compact]
+"""
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)  # memory paths are relative to the project root
+
+from intelligence.memory.segment_store import SegmentStore, migrate_legacy_json
+from intelligence.memory.json_memory import (
+    DB_PATH, ARCHIVE_PATH, LEGACY_DB_PATH, LEGACY_ARCHIVE_PATH, JsonVectorMemory
+)
+
+
+def remove_store(base_path: str):
+    """Delete every generation of a segment store (used by --force)."""
+    folder, prefix = os.path.split(base_path)
+    for name in os.listdir(folder or "."):
+        if name.startswith(prefix + ".") and not name.endswith(".json"):
+            os.remove(os.path.join(folder, name))
+
+
+def migrate(legacy_path: str, base_path: str, force: bool):
+    if not os.path.exists(legacy_path):
+        print(f"  {legacy_path}: not found, skipping")
+        return
+
+    store = SegmentStore(base_path)
+    if store.exists():
+        if not force:
+            print(f"  {base_path}: store already exists, skipping (use --force to rebuild)")
+            return
+        remove_store(base_path)
+        store = SegmentStore(base_path)
+
+    start = time.perf_counter()
+    count = migrate_legacy_json(legacy_path, store)
+    elapsed = time.perf_counter() - start
+
+    size_before = os.path.getsize(legacy_path)
+    size_after = os.path.getsize(store.records_path) + os.path.getsize(store.vectors_path)
+    print(
+        f"  {legacy_path} -> {store.records_path} + {store.vectors_path}: "
+        f"{count} items in {elapsed:.1f}s ({size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate Intelligence memory to append-only segments")
+    parser.add_argument("--force", action="store_true", help="Rebuild stores that already exist")
+    parser.add_argument("--compact", action="store_true", help="Compact the active store afterwards")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🧠 MEMORY MIGRATION: JSON -> append-only segments")
+    print("=" * 60)
+
+    migrate(LEGACY_DB_PATH, DB_PATH, args.force)
+    migrate(LEGACY_ARCHIVE_PATH, ARCHIVE_PATH, args.force)
+
+    memory = JsonVectorMemory()
+    print(f"\nActive memory: {len(memory.data)} items, {memory.store.dead} tombstones")
+    if args.compact:
+        memory.compact()
+        print(f"Compacted -> {memory.store.records_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,8 +9,10 @@ project_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(project_root))
 
 from db.database import SessionLocal, init_db
-from db.models import Holding, Transaction
+from db.models import Transaction
 from services.price_service_v5 import resolve_asset_info
+from services.symbology_service import resolve_isins
+from services.holdings_snapshot import swap_holdings
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s | %(levelname)s | %(message)s')
 logger = logging.getLogger("Holdings_Reconstructor")
@@ -65,13 +67,13 @@ def reconstruct_holdings(broker_name):
                 positions[asset_key]["qty"] -= qty
                 # Avg basis doesn't change on SELL 
 
-        # 3. Update holdings table
+        # 3. Build the new holdings set (network lookups happen before touching the table)
         logger.info("   📥 Updating 'holdings' table...")
         
-        # Clear existing holdings for this broker to prevent duplicates
-        session.query(Holding).filter(Holding.broker == broker_name).delete()
+        # Resolve every open position's ISIN in bulk (persisted, so re-runs are free)
+        resolve_isins([d["isin"] for d in positions.values() if d["isin"] and d["qty"] > 0])
         
-        count = 0
+        rows = []
         for key, data in positions.items():
             if data["qty"] <= 0:
                 continue # Skip closed positions
@@ -79,24 +81,24 @@ def reconstruct_holdings(broker_name):
             # Resolve real ticker and name from ISIN/Key
             info = resolve_asset_info(data["isin"], key)
             
-            h = Holding(
-                broker=broker_name,
-                ticker=info['ticker'],
-                isin=data["isin"],
-                name=info['name'],
-                quantity=data["qty"],
-                purchase_price=data["avg"],
-                current_price=Decimal(0),
-                current_value=Decimal(0),
-                asset_type="STOCK", # Default
-                notes="Reconstructed from transactions history."
-            )
-            session.add(h)
-            count += 1
+            rows.append({
+                "ticker": info['ticker'],
+                "isin": data["isin"],
+                "name": info['name'],
+                "quantity": data["qty"],
+                "purchase_price": data["avg"],
+                "current_price": Decimal(0),
+                "current_value": Decimal(0),
+                "asset_type": "STOCK", # Default
+                "notes": "Reconstructed from transactions history.",
+            })
             logger.info(f"      ✅ {info['ticker']} ({info['name']}): {data['qty']} units")
 
-        session.commit()
-        print(f"\n✅ RECONSTRUCTION COMPLETE: {count} active positions created.")
+        # 4. Swap the broker's holdings atomically (previous set kept for rollback)
+        session.close()
+        result = swap_holdings(broker_name, rows, source_document="reconstructed from transactions")
+        print(f"\n✅ RECONSTRUCTION COMPLETE: {result.rows} active positions created.")
+        print(f"   Changes vs previous holdings: {result.diff.summary()} (batch {result.batch_id})")
         
     except Exception as e:
         session.rollback()
@@ -0,0 +1,38 @@
+"""
+Rollback Holdings
+Swaps a broker's previous holdings batch back in (the current set becomes
+the previous one, so running it twice restores the latest import).
+
+Usage:
+    python scripts/rollback_holdings.py BG_SAXO
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.holdings_snapshot import rollback_holdings
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    broker = sys.argv[1]
+    print("=" * 60)
+    print(f"⏪ ROLLING BACK HOLDINGS: {broker}")
+    print("=" * 60)
+
+    try:
+        result = rollback_holdings(broker)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(f"✅ Batch {result.batch_id} active again ({result.rows} holdings)")
+    print(f"   Changes: {result.diff.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -126,8 +126,11 @@ def fingerprint_file(filepath: Path) -> str:
         return hashlib.md5(filepath.name.encode()).hexdigest()[:12]
 
 
-def scan_broker_folder(folder: Path, registry: dict) -> list:
-    """Scan a single broker's folder and return list of files to process."""
+def scan_broker_folder(folder: Path, registry: dict, imported=None) -> list:
+    """
+    Scan a single broker's folder and return list of files to process.
+    `imported` (DocumentRegistry): files whose exact content was already imported are skipped.
+    """
     broker = extract_broker(folder / "dummy.txt")  # Extract broker from path
     logger.info(f"\n📂 Scanning broker: {broker}")
     
@@ -151,6 +154,12 @@ def scan_broker_folder(folder: Path, registry: dict) -> list:
     fingerprint_groups = {}
     
     for filepath in all_files:
+        if imported is not None:
+            from ingestion.pipeline.document_registry import file_sha256
+            if file_sha256(filepath) in imported:
+                logger.info(f"   ⏭️ Already imported (content hash): {filepath.name}")
+                continue
+        
         logger.info(f"   🔑 Fingerprinting: {filepath.name}")
         fp = fingerprint_file(filepath)
         
@@ -197,13 +206,21 @@ def scan_inbox(inbox_root: Path) -> list:
     registry = load_registry()
     all_files_to_process = []
     
+    # Content hashes of imported documents (import_log), shared with the IDP Gatekeeper
+    try:
+        from ingestion.pipeline.document_registry import DocumentRegistry
+        imported = DocumentRegistry()
+    except Exception as e:
+        logger.warning(f"Document registry unavailable: {e}")
+        imported = None
+    
     logger.info(f"🔍 Scanning inbox: {inbox_root}")
     
     # Check if inbox_root itself has files (Single Broker Mode)
     root_has_files = any(inbox_root.glob("*.xlsx")) or any(inbox_root.glob("*.csv")) or any(inbox_root.glob("*.pdf"))
     if root_has_files:
         logger.info(f"   📂 Detected Single Broker Mode (files in root)")
-        files = scan_broker_folder(inbox_root, registry)
+        files = scan_broker_folder(inbox_root, registry, imported)
         all_files_to_process.extend(files)
     
     # Scan each broker subfolder
@@ -221,14 +238,14 @@ def scan_inbox(inbox_root: Path) -> list:
             
             # Standard mode: scan subfolders as brokers
             if not root_has_files: 
-                files = scan_broker_folder(subfolder, registry)
+                files = scan_broker_folder(subfolder, registry, imported)
                 all_files_to_process.extend(files)
             elif subfolder.name.upper() == "PDF": # Special handling for PDF subfolder in single mode
                 # Treat as same broker?
                 # scan_broker_folder will deduce broker from path.
                 # if path is .../revolut/PDF, extract_broker might identify as PDF?
                 # Let's trust scan_broker_folder logic but we need to ensure broker name matches.
-                files = scan_broker_folder(subfolder, registry)
+                files = scan_broker_folder(subfolder, registry, imported)
                 all_files_to_process.extend(files)
     
     # Save updated registry
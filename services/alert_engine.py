@@ -1,18 +1,150 @@
 """
 WAR ROOM - Alert Engine Service
 Monitors prices and triggers alerts when thresholds are crossed.
+
+A sweep is:
+- one batched quote pass (price_service_v5.fetch_quotes) over the distinct alert tickers,
+- per ticker, a bisect into sorted "above" / "below" thresholds (AlertBook),
+- one bulk UPDATE for every triggered alert, Telegram notifications sent concurrently.
+The AlertBook is rebuilt from the DB only when alerts change (or every ALERT_BOOK_TTL).
+
+Live triggering: price_service_v5 publishes every fresh quote on the event bus
+(background refresher, dashboard refresh, crypto poller). Ticks are coalesced per
+ticker for ALERT_DEBOUNCE_SECONDS, then checked with an ALERT_HYSTERESIS_PCT band
+so a price hovering on the threshold doesn't fire on noise. The cron sweep stays
+as an exact safety net for tickers nobody quoted.
 """
+import os
+import asyncio
 import logging
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass
 from datetime import datetime
 from decimal import Decimal
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+from sqlalchemy import case, select, update
 
-from db.database import SessionLocal
+from db.database import SessionLocal, AsyncSessionLocal
 from db.models import PriceAlert
-from services.price_service_v5 import get_live_price_for_ticker
+from services.price_service_v5 import fetch_quotes, CRYPTO_IDS
+from services.async_runtime import run_blocking, bind_loop, submit
+from services.event_bus import bus, PRICE_TOPIC
 
 logger = logging.getLogger(__name__)
 
+ALERT_BOOK_TTL = 600  # seconds: reload even without local changes (alerts edited elsewhere)
+ALERT_ASSET_TYPE = "STOCK"  # alerts don't store an asset type; quoted like get_live_price_for_ticker
+ALERT_DEBOUNCE_SECONDS = float(os.getenv("ALERT_DEBOUNCE_SECONDS", "2"))
+ALERT_HYSTERESIS_PCT = float(os.getenv("ALERT_HYSTERESIS_PCT", "0.05"))  # % past the target for live ticks
+
+
+# ============================================================
+# THRESHOLD INDEX
+# ============================================================
+
+@dataclass(frozen=True)
+class AlertEntry:
+    id: str
+    ticker: str
+    target: float
+    direction: str
+    notify_telegram: bool
+
+
+class TickerThresholds:
+    """Sorted thresholds of one ticker: a price check is two bisects."""
+
+    def __init__(self):
+        self.above: List[tuple] = []   # (target, id) ascending: trigger when price >= target
+        self.below: List[tuple] = []   # (target, id) ascending: trigger when price <= target
+
+    def add(self, entry: AlertEntry):
+        insort(self.above if entry.direction == "above" else self.below, (entry.target, entry.id))
+
+    def crossed(self, price: float, band: float = 0.0) -> List[str]:
+        """
+        Ids of alerts crossed at `price`: a prefix of `above`, a suffix of `below`.
+        With a band, price must clear target·(1 ± band): the price is scaled instead of every target.
+        """
+        up, down = price / (1 + band), price / (1 - band)
+        hit = [i for _, i in self.above[:bisect_right(self.above, (up, "\uffff"))]]
+        hit += [i for _, i in self.below[bisect_left(self.below, (down, "")):]]
+        return hit
+
+
+class AlertBook:
+    """Active alerts grouped by ticker, rebuilt lazily when marked dirty."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dirty = True
+        self._loaded_at = 0.0
+        self.entries: Dict[str, AlertEntry] = {}
+        self.by_ticker: Dict[str, TickerThresholds] = {}
+
+    def mark_dirty(self):
+        self._dirty = True
+
+    def watches(self, ticker: str) -> bool:
+        """Cheap pre-filter for price ticks (True while a reload is pending)."""
+        return self._dirty or ticker in self.by_ticker
+
+    def _rebuild(self, alerts):
+        entries, by_ticker = {}, {}
+        for a in alerts:
+            entry = AlertEntry(str(a.id), a.ticker, float(a.target_price), a.direction, bool(a.notify_telegram))
+            entries[entry.id] = entry
+            by_ticker.setdefault(entry.ticker, TickerThresholds()).add(entry)
+        self.entries, self.by_ticker = entries, by_ticker
+        self._dirty = False
+        self._loaded_at = time.monotonic()
+
+    async def ensure_loaded(self):
+        if not self._dirty and time.monotonic() - self._loaded_at < ALERT_BOOK_TTL:
+            return
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(PriceAlert.id, PriceAlert.ticker, PriceAlert.target_price,
+                       PriceAlert.direction, PriceAlert.notify_telegram)
+                .where(PriceAlert.is_active == True)
+            )
+            rows = result.all()
+        with self._lock:
+            self._rebuild(rows)
+        logger.info(f"[ALERTS] Alert book: {len(self.entries)} active alerts on {len(self.by_ticker)} tickers")
+
+    def take(self, prices: Dict[str, float], band: float = 0.0) -> List[tuple]:
+        """
+        (entry, price) for every alert crossed by `prices` (ticker -> price), removed from
+        the book in the same critical section: a live tick and the sweep can't both fire it.
+        """
+        hits = []
+        with self._lock:
+            for ticker, price in prices.items():
+                thresholds = self.by_ticker.get(ticker)
+                if thresholds is None or not price or price <= 0:
+                    continue
+                hits += [(self.entries[i], price) for i in thresholds.crossed(price, band)]
+            self._remove([e.id for e, _ in hits])
+        return hits
+
+    def _remove(self, ids):
+        for i in ids:
+            entry = self.entries.pop(i, None)
+            if entry is None:
+                continue
+            thresholds = self.by_ticker[entry.ticker]
+            side = thresholds.above if entry.direction == "above" else thresholds.below
+            side.remove((entry.target, entry.id))
+            if not thresholds.above and not thresholds.below:
+                del self.by_ticker[entry.ticker]
+
+
+alert_book = AlertBook()
+
 
 def get_active_alerts() -> List[Dict]:
     """Returns all active (non-triggered) alerts."""
@@ -51,6 +183,7 @@ def create_alert(ticker: str, target_price: float, direction: str, name: str = N
         db.commit()
         db.refresh(alert)
         
+        alert_book.mark_dirty()
         logger.info(f"Created alert for {ticker} @ ${target_price} ({direction})")
         
         return {
@@ -73,6 +206,7 @@ def delete_alert(alert_id: str) -> bool:
         if alert:
             db.delete(alert)
             db.commit()
+            alert_book.mark_dirty()
             logger.info(f"Deleted alert {alert_id}")
             return True
         return False
@@ -80,69 +214,156 @@ def delete_alert(alert_id: str) -> bool:
         db.close()
 
 
+def _alert_asset_type(ticker: str) -> str:
+    return "CRYPTO" if ticker.upper() in CRYPTO_IDS else ALERT_ASSET_TYPE
+
+
+def crypto_alert_tickers() -> List[str]:
+    """Alert tickers quoted on CoinGecko (polled by the scheduler)."""
+    return [t for t in alert_book.by_ticker if _alert_asset_type(t) == "CRYPTO"]
+
+
+def _quote_alert_tickers(tickers: List[str]) -> Dict[str, float]:
+    """One batched quote pass for the distinct alert tickers -> ticker: price (crypto in one CoinGecko call)."""
+    quotes = fetch_quotes([{"ticker": t, "asset_type": _alert_asset_type(t)} for t in tickers])
+    prices = {}
+    for t in tickers:
+        quote = quotes.get((_alert_asset_type(t), t.upper()))
+        if quote and quote[0] and quote[0] > 0:
+            prices[t] = float(quote[0])
+    return prices
+
+
+async def _notify(hits: List[tuple]):
+    from services.telegram_notifier import send_price_alert
+
+    results = await asyncio.gather(
+        *(send_price_alert(ticker=e.ticker, current_price=price, target_price=e.target, direction=e.direction)
+          for e, price in hits if e.notify_telegram),
+        return_exceptions=True
+    )
+    for r in results:
+        if isinstance(r, Exception):
+            logger.error(f"[ALERTS] Telegram notification failed: {r}")
+
+
 async def check_alerts() -> List[Dict]:
     """
     Checks all active alerts against current prices.
     Triggers notifications for any crossed thresholds.
     Returns list of triggered alerts.
     """
-    triggered = []
-    db = SessionLocal()
-    
+    await alert_book.ensure_loaded()
+    tickers = list(alert_book.by_ticker)
+    if not tickers:
+        return []
+
+    # Quote lookups are blocking (yfinance/requests): one batched pass in the bounded executor
     try:
-        alerts = db.query(PriceAlert).filter(PriceAlert.is_active == True).all()
-        
-        for alert in alerts:
-            try:
-                # Get current price (using existing price service)
-                price_data = get_live_price_for_ticker(alert.ticker)
-                if not price_data:
-                    continue
-                
-                current_price = price_data.get("price", 0)
-                if current_price <= 0:
-                    continue
-                
-                target = float(alert.target_price)
-                should_trigger = False
-                
-                if alert.direction == "above" and current_price >= target:
-                    should_trigger = True
-                elif alert.direction == "below" and current_price <= target:
-                    should_trigger = True
-                
-                if should_trigger:
-                    # Mark as triggered
-                    alert.is_active = False
-                    alert.triggered_at = datetime.utcnow()
-                    alert.triggered_price = Decimal(str(current_price))
-                    
-                    # Send notification
-                    if alert.notify_telegram:
-                        from services.telegram_notifier import send_price_alert
-                        await send_price_alert(
-                            ticker=alert.ticker,
-                            current_price=current_price,
-                            target_price=target,
-                            direction=alert.direction
-                        )
-                    
-                    triggered.append({
-                        "ticker": alert.ticker,
-                        "target": target,
-                        "current": current_price,
-                        "direction": alert.direction
-                    })
-                    
-                    logger.info(f"Alert triggered: {alert.ticker} @ {current_price} (target: {target})")
-                    
-            except Exception as e:
-                logger.error(f"Error checking alert for {alert.ticker}: {e}")
-                continue
-        
-        db.commit()
-        
-    finally:
-        db.close()
-    
-    return triggered
+        prices = await run_blocking(_quote_alert_tickers, tickers)
+    except Exception as e:
+        logger.error(f"[ALERTS] Quote pass failed: {e}")
+        return []
+
+    return await _trigger(alert_book.take(prices))
+
+
+async def _trigger(hits: List[tuple]) -> List[Dict]:
+    """Persist and notify alerts already taken from the book."""
+    if not hits:
+        return []
+
+    # One guarded bulk UPDATE ... RETURNING: only rows this call actually deactivates
+    # are notified. The book may have been reloaded from the DB between take() and
+    # this commit, so another tick can take the same alert again.
+    now = datetime.utcnow()
+    prices = {_uuid(e.id): Decimal(str(price)) for e, price in hits}
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            update(PriceAlert)
+            .where(PriceAlert.id.in_(list(prices)), PriceAlert.is_active == True)
+            .values(
+                is_active=False,
+                triggered_at=now,
+                triggered_price=case(prices, value=PriceAlert.id),
+            )
+            .returning(PriceAlert.id)
+            .execution_options(synchronize_session=False)
+        )
+        deactivated = {str(alert_id) for alert_id in result.scalars()}
+        await db.commit()
+    claimed = [(e, price) for e, price in hits if str(_uuid(e.id)) in deactivated]
+
+    if len(claimed) < len(hits):
+        logger.info(f"[ALERTS] {len(hits) - len(claimed)} alert(s) already triggered elsewhere, skipped")
+    hits = claimed
+    if not hits:
+        return []
+
+    for e, price in hits:
+        logger.info(f"Alert triggered: {e.ticker} @ {price} (target: {e.target})")
+    await _notify(hits)
+
+    return [
+        {"ticker": e.ticker, "target": e.target, "current": price, "direction": e.direction}
+        for e, price in hits
+    ]
+
+
+def _uuid(value: str):
+    from uuid import UUID
+    return UUID(value)
+
+
+
+# ============================================================
+# LIVE TICKS (event bus)
+# ============================================================
+
+_pending: Dict[str, float] = {}   # ticker -> latest price waiting for its debounce window
+_pending_lock = threading.Lock()
+_unsubscribe = None
+
+
+def _on_price(event):
+    """Bus subscriber (publisher thread): coalesce ticks, one flush per ticker and window."""
+    for key in {event.ticker, (event.isin or "").upper()}:
+        if not key or not alert_book.watches(key):
+            continue
+        with _pending_lock:
+            first = key not in _pending
+            _pending[key] = event.price
+        if first:
+            submit(_flush_after(key))
+
+
+async def _flush_after(ticker: str):
+    await asyncio.sleep(ALERT_DEBOUNCE_SECONDS)
+    with _pending_lock:
+        price = _pending.pop(ticker, None)
+    if price is None:
+        return
+    try:
+        await alert_book.ensure_loaded()
+        triggered = await _trigger(alert_book.take({ticker: price}, ALERT_HYSTERESIS_PCT / 100))
+        if triggered:
+            logger.info(f"[ALERTS] Live tick {ticker} @ {price}: {len(triggered)} alert(s) triggered")
+    except Exception as e:
+        logger.error(f"[ALERTS] Live check failed for {ticker}: {e}")
+
+
+async def start_live_alerts():
+    """Subscribe the alert book to price ticks. Call once from the app loop at startup."""
+    global _unsubscribe
+    bind_loop(asyncio.get_running_loop())
+    await alert_book.ensure_loaded()
+    if _unsubscribe is None:
+        _unsubscribe = bus.subscribe(PRICE_TOPIC, _on_price)
+    logger.info(f"[ALERTS] Live alerts on: debounce {ALERT_DEBOUNCE_SECONDS}s, hysteresis {ALERT_HYSTERESIS_PCT}%")
+
+
+def stop_live_alerts():
+    global _unsubscribe
+    if _unsubscribe is not None:
+        _unsubscribe()
+        _unsubscribe = None
@@ -3,14 +3,14 @@ WAR ROOM - Analytics Service
 Handles portfolio snapshots, performance tracking, and risk metrics.
 """
 import logging
+import threading
 from datetime import date, datetime, timedelta
 from decimal import Decimal
 from typing import Dict, List, Optional
 import pandas as pd
-import yfinance as yf
 import numpy as np
 
-from sqlalchemy import select, desc
+from sqlalchemy import select, desc, func, case
 from sqlalchemy.orm import Session
 
 from db.database import SessionLocal
@@ -142,72 +142,34 @@ def get_benchmark_history(days: int = 30) -> Dict[str, List[Dict]]:
     """
     Get benchmark performance for comparison.
     Returns normalized returns (percentage change from start).
+    Closes come from the local price history store (only missing days are downloaded).
     """
+    from services.price_history import get_history
+
     result = {}
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
-    
+    start_date = date.today() - timedelta(days=days)
+    closes_by_symbol = get_history(BENCHMARKS.values(), start_date)
+
     for name, ticker in BENCHMARKS.items():
-        try:
-            data = yf.download(
-                ticker,
-                start=start_date,
-                end=end_date,
-                progress=False,
-                auto_adjust=True,
-                threads=False,
-                timeout=10
-            )
-            
-            if data.empty:
-                logger.warning(f"[ANALYTICS] No data for benchmark {name}")
-                continue
-            
-            # Get closing prices
-            closes = data["Close"]
-            
-            # Handle DataFrame vs Series (yfinance update fix)
-            if isinstance(closes, pd.DataFrame):
-                closes = closes.iloc[:, 0]
-                
-            closes = closes.dropna()
-            if len(closes) == 0:
-                continue
-                
-            # Normalize to percentage change from first value
-            # Handle potential scale/series issues
-            first_val = closes.iloc[0]
-            if hasattr(first_val, 'item'):
-                first_value = float(first_val.item())
-            else:
-                first_value = float(first_val)
-                
-            result[name] = []
-            
-            for idx, price in closes.items():
-                # Safe extraction of value
-                if hasattr(price, 'item'):
-                    price_val = float(price.item())
-                else:
-                    price_val = float(price)
-                
-                # Normalize date
-                # idx is likely a Timestamp, so .date() is valid
-                # If idx is wrong type, we catch it
-                if hasattr(idx, 'date'):
-                    date_str = str(idx.date())
-                else:
-                    date_str = str(idx).split(" ")[0]
-                
-                result[name].append({
-                    "date": date_str,
-                    "value": price_val,
-                    "pct_change": ((price_val / first_value) - 1) * 100
-                })
-            
-        except Exception as e:
-            logger.error(f"[ANALYTICS] Error fetching {name}: {e}")
-    
+        if ticker not in closes_by_symbol.columns:
+            logger.warning(f"[ANALYTICS] No data for benchmark {name}")
+            continue
+
+        closes = closes_by_symbol[ticker].dropna()
+        if len(closes) == 0:
+            continue
+
+        # Normalize to percentage change from first value
+        first_value = float(closes.iloc[0])
+        result[name] = [
+            {
+                "date": str(idx.date()),
+                "value": float(price),
+                "pct_change": ((float(price) / first_value) - 1) * 100
+            }
+            for idx, price in closes.items()
+        ]
+
     return result
 
 
@@ -218,9 +180,11 @@ def normalize_ticker(ticker: str, asset_type: str) -> Optional[str]:
         
     ticker = ticker.strip().upper()
     
-    # Skip ISINs (12 chars, 2 letters start)
+    # ISINs (12 chars, 2 letters start): resolve via the shared symbology store
     if len(ticker) == 12 and ticker[:2].isalpha() and ticker[2].isdigit():
-        return None
+        from services.symbology_service import resolve_isin
+        record = resolve_isin(ticker)
+        return record['yahoo_symbol'] if record and record.get('yahoo_symbol') else None
         
     # Crypto
     if asset_type == 'CRYPTO':
@@ -238,18 +202,32 @@ def normalize_ticker(ticker: str, asset_type: str) -> Optional[str]:
     return ticker
 
 
-def calculate_correlation_matrix(top_n: int = 15) -> Dict:
+def calculate_correlation_matrix(top_n: Optional[int] = 15, window: int = 365, method: str = "pearson") -> Dict:
     """
-    Calculate correlation matrix for the top N holdings.
+    Calculate correlation matrix for the top N holdings (top_n=None: all holdings).
+    window: rolling window in calendar days (30/90/365), method: "pearson" or "ewma".
     Returns ticker list and correlation matrix values.
     """
+    from services.covariance_engine import covariance_engine, METHODS
+
+    if method not in METHODS:
+        raise ValueError(f"Unknown correlation method: {method}")
+    if window < 2:
+        raise ValueError("Correlation window must be at least 2 days")
+
     try:
         from services.portfolio_service import get_all_holdings
-        import yfinance as yf
         
         # 1. Get Top Holdings
         holdings = get_all_holdings()
         
+        # Bulk-resolve ISIN-shaped tickers in one pass (cached in the symbology store)
+        from services.symbology_service import resolve_isins
+        resolve_isins([
+            h['ticker'].strip().upper() for h in holdings
+            if h.get('ticker') and len(h['ticker'].strip()) == 12 and h['ticker'].strip()[:2].isalpha()
+        ])
+        
         # Filter and Normalize
         valid_holdings = []
         for h in holdings:
@@ -264,7 +242,7 @@ def calculate_correlation_matrix(top_n: int = 15) -> Dict:
         
         # Sort desc by value
         valid_holdings.sort(key=lambda x: float(x.get('current_value', 0)), reverse=True)
-        top_holdings = valid_holdings[:top_n]
+        top_holdings = valid_holdings[:top_n] if top_n else valid_holdings
         
         if not top_holdings:
             return {"tickers": [], "matrix": []}
@@ -279,139 +257,27 @@ def calculate_correlation_matrix(top_n: int = 15) -> Dict:
                 yf_tickers.append(yf_t)
                 tickers_map[yf_t] = h.get('ticker')
         
-        # 2. Fetch History (last 1 year)
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=365)
-        
-        # Use valid tickers only
-        data = yf.download(
-            yf_tickers, 
-            start=start_date, 
-            end=end_date, 
-            progress=False,
-            auto_adjust=True,
-            threads=False, # Critical for backend stability
-            timeout=10
-        )["Close"]
-        
-        if data.empty:
-             return {"tickers": [], "matrix": []}
-             
-        # Handle single ticker case (returns Series)
-        if isinstance(data, pd.Series):
-             return {
-                 "tickers": [tickers_map[yf_tickers[0]]],
-                 "matrix": [[1.0]]
-             }
-             
-        # 3. Compute Returns & Correlation
-        returns = data.pct_change().dropna()
-        # Keep only columns that have enough data?
-        # Determine valid columns
-        valid_cols = [c for c in returns.columns if not returns[c].isna().all()]
-        returns = returns[valid_cols]
-        
-        if returns.empty:
-             return {"tickers": [], "matrix": []}
+        # 2. Incremental engine over the local price history (cached per holding set/window/as-of)
+        result = covariance_engine.matrix(yf_tickers, window=window, method=method)
 
-        corr_matrix = returns.corr(method='pearson')
-        
-        # 4. Format for Frontend
-        cols = corr_matrix.columns.tolist()
-        matrix_values = []
-        display_labels = []
-        
-        for r in cols:
-            display_labels.append(tickers_map.get(r, r))
-            row_vals = []
-            for c in cols:
-                val = corr_matrix.loc[r, c]
-                if pd.isna(val): val = 0
-                row_vals.append(round(float(val), 2))
-            matrix_values.append(row_vals)
-            
         return {
-            "tickers": display_labels,
-            "matrix": matrix_values
+            "tickers": [tickers_map.get(s, s) for s in result["symbols"]],
+            **result
         }
 
     except Exception as e:
         logger.error(f"Correlation Matrix Error: {e}")
         return {"error": str(e), "tickers": [], "matrix": []}
 
-def calculate_risk_metrics() -> Dict:
+def calculate_risk_metrics(days: int = 365) -> Dict:
     """
     Calculate risk metrics based on portfolio history.
-    Returns Sharpe ratio, volatility, and max drawdown.
+    Returns Sharpe ratio, volatility and max drawdown plus Sortino, rolling windows,
+    drawdown durations, VaR/CVaR, benchmark betas and broker/asset contributions
+    (see services/risk_metrics.py, cached per as-of date).
     """
-    db = SessionLocal()
-    try:
-        # Get last 365 days of snapshots
-        cutoff = date.today() - timedelta(days=365)
-        
-        snapshots = db.execute(
-            select(PortfolioSnapshot)
-            .where(PortfolioSnapshot.snapshot_date >= cutoff)
-            .order_by(PortfolioSnapshot.snapshot_date)
-        ).scalars().all()
-        
-        if len(snapshots) < 2:
-            return {
-                "sharpe_ratio": None,
-                "volatility": None,
-                "max_drawdown": None,
-                "message": "Insufficient data (need at least 2 snapshots)"
-            }
-        
-        # Extract values
-        values = [float(s.total_value) for s in snapshots]
-        
-        # Calculate daily returns
-        returns = []
-        for i in range(1, len(values)):
-            if values[i-1] > 0:
-                daily_return = (values[i] - values[i-1]) / values[i-1]
-                returns.append(daily_return)
-        
-        if len(returns) < 2:
-            return {
-                "sharpe_ratio": None,
-                "volatility": None,
-                "max_drawdown": None,
-                "message": "Insufficient return data"
-            }
-        
-        returns_array = np.array(returns)
-        
-        # Volatility (annualized)
-        daily_vol = np.std(returns_array)
-        annual_vol = daily_vol * np.sqrt(252)
-        
-        # Sharpe Ratio (assuming risk-free rate of 4%)
-        risk_free_rate = 0.04
-        mean_return = np.mean(returns_array) * 252  # Annualized
-        sharpe = (mean_return - risk_free_rate) / annual_vol if annual_vol > 0 else 0
-        
-        # Max Drawdown
-        peak = values[0]
-        max_dd = 0
-        for v in values:
-            if v > peak:
-                peak = v
-            drawdown = (peak - v) / peak if peak > 0 else 0
-            if drawdown > max_dd:
-                max_dd = drawdown
-        
-        return {
-            "sharpe_ratio": round(sharpe, 2),
-            "volatility": round(annual_vol * 100, 2),  # As percentage
-            "max_drawdown": round(max_dd * 100, 2),    # As percentage
-            "data_points": len(snapshots),
-            "period_days": (snapshots[-1].snapshot_date - snapshots[0].snapshot_date).days
-        }
-        
-    finally:
-        db.close()
+    from services.risk_metrics import risk_metrics_service
+    return risk_metrics_service.get(days=days)
 
 
 def get_latest_snapshot() -> Optional[Dict]:
@@ -438,47 +304,137 @@ def get_latest_snapshot() -> Optional[Dict]:
     finally:
         db.close()
 
-def get_invested_capital_history() -> List[Dict]:
+
+# ============================================================
+# INVESTED CAPITAL (SQL window, EUR, cached per transaction watermark)
+# ============================================================
+
+_invested_lock = threading.Lock()
+_invested_cache: Dict[bool, tuple] = {}   # by_broker -> (key, history)
+
+
+def _eur_rate(currency_col, day_col):
+    """
+    SQL expression: EUR per unit of `currency_col` on `day_col`, from the FX closes in
+    price_history (last close on or before the day, else the first one after, else FALLBACK_RATES).
+    """
+    from db.models import PriceHistory
+    from services.forex_service import FALLBACK_RATES
+
+    pair = "EUR" + case((currency_col == "GBp", "GBP"), else_=func.upper(currency_col)) + "=X"
+    on_or_before = (
+        select(PriceHistory.close)
+        .where(PriceHistory.symbol == pair, PriceHistory.date <= day_col)
+        .order_by(PriceHistory.date.desc()).limit(1)
+        .scalar_subquery()
+    )
+    after = (
+        select(PriceHistory.close)
+        .where(PriceHistory.symbol == pair, PriceHistory.date > day_col)
+        .order_by(PriceHistory.date.asc()).limit(1)
+        .scalar_subquery()
+    )
+    quoted = 1.0 / func.nullif(func.coalesce(on_or_before, after), 0)
+    quoted = case((currency_col == "GBp", quoted / 100), else_=quoted)
+    fallback = case({c: float(r) for c, r in FALLBACK_RATES.items()}, value=currency_col, else_=1.0)
+    return case(
+        (func.coalesce(currency_col, "EUR") == "EUR", 1.0),
+        else_=func.coalesce(quoted, fallback),
+    )
+
+
+def _ensure_invested_fx(db: Session, trades) -> None:
+    """Make sure price_history holds the FX closes the query joins (downloads only gaps)."""
+    from db.models import Transaction
+    from services.nav_engine import fx_symbol
+    from services.price_history import ensure_history
+
+    rows = db.execute(
+        select(Transaction.currency, func.min(Transaction.timestamp)).where(trades).group_by(Transaction.currency)
+    ).all()
+    pairs = {fx_symbol(c) for c, _ in rows if fx_symbol(c)}
+    if not pairs:
+        return
+    first = min(ts for _, ts in rows).date()
+    try:
+        ensure_history(pairs, first)
+    except Exception as e:
+        logger.error(f"[ANALYTICS] FX history top-up failed, using stored/fallback rates: {e}")
+
+
+def get_invested_capital_history(by_broker: bool = False) -> List[Dict]:
     """
     Calculate Cumulative Net Invested Capital over time based on Transactions.
-    Model: "Market Exposure" -> Buy (Add) / Sell (Subtract).
-    Returns list of {date, invested} sorted by date.
+    Model: "Market Exposure" -> Buy (Add) / Sell (Subtract), in EUR at the day's FX rate.
+    Returns list of {date, invested} sorted by date (plus {brokers: {broker: invested}} if by_broker).
+
+    Daily sums and the running total are computed by the database
+    (SUM(...) OVER (ORDER BY day)); rows are streamed and the result is cached
+    until a BUY/SELL is added or removed (or the day changes: FX closes move).
     """
+    from db.models import Transaction
+
     db = SessionLocal()
     try:
-        from db.models import Transaction
-        
-        # Fetch all BUY/SELL transactions sorted by time
-        txs = db.execute(
-            select(Transaction)
-            .where(Transaction.operation.in_(["BUY", "SELL"]))
-            .order_by(Transaction.timestamp.asc())
-        ).scalars().all()
-        
+        trades = Transaction.operation.in_(["BUY", "SELL"]) & (Transaction.status != "CANCELLED")
+        watermark = tuple(db.execute(
+            select(func.max(Transaction.created_at), func.count()).where(trades)
+        ).one())
+        key = (watermark, date.today())
+        with _invested_lock:
+            cached = _invested_cache.get(by_broker)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+
+        _ensure_invested_fx(db, trades)
+
+        # Net flow per (day, currency[, broker]) first: the FX lookup then runs once per currency-day
+        day = func.date(Transaction.timestamp)
+        signed = case((Transaction.operation == "SELL", -Transaction.total_amount), else_=Transaction.total_amount)
+        keys = [day.label("day"), Transaction.currency.label("currency")]
+        if by_broker:
+            keys.append(Transaction.broker.label("broker"))
+        flows = (
+            select(*keys, func.sum(signed).label("net"))
+            .where(trades)
+            .group_by(*(k.element for k in keys))
+            .subquery()
+        )
+        columns = [flows.c.day] + ([flows.c.broker] if by_broker else [])
+        daily = (
+            select(*columns, func.sum(flows.c.net * _eur_rate(flows.c.currency, flows.c.day)).label("net"))
+            .group_by(*columns)
+            .subquery()
+        )
+        running = func.sum(daily.c.net).over(
+            partition_by=daily.c.broker if by_broker else None,
+            order_by=daily.c.day,
+        )
+        stmt = (
+            select(daily.c.day, *([daily.c.broker] if by_broker else []), running.label("invested"))
+            .order_by(daily.c.day)
+            .execution_options(yield_per=1000)
+        )
+
         history = []
-        cumulative_invested = Decimal("0")
-        
-        # Group by Date to reduce points? No, let's do daily resolution
-        daily_invested = {} # date -> cumulative amount
-        
-        for t in txs:
-            amt = t.total_amount # absolute value
-            
-            if t.operation == "BUY":
-                cumulative_invested += amt
-            elif t.operation == "SELL":
-                cumulative_invested -= amt
-            
-            # Store end-of-day state
-            d_str = str(t.timestamp.date())
-            daily_invested[d_str] = float(cumulative_invested)
-            
-        # Convert to list
-        for d, val in daily_invested.items():
-            history.append({"date": d, "invested": val})
-            
+        latest: Dict[str, float] = {}   # by_broker: running total of each broker so far
+        for row in db.execute(stmt):
+            d_str = str(row.day)
+            if not by_broker:
+                history.append({"date": d_str, "invested": round(float(row.invested), 2)})
+                continue
+            latest[row.broker] = round(float(row.invested), 2)
+            point = {"date": d_str, "invested": round(sum(latest.values()), 2), "brokers": dict(latest)}
+            if history and history[-1]["date"] == d_str:
+                history[-1] = point   # several brokers traded that day
+            else:
+                history.append(point)
+
+        with _invested_lock:
+            _invested_cache[by_broker] = (key, history)
+        logger.info(f"[ANALYTICS] Invested capital: {len(history)} days from {watermark[1]} trades")
         return history
-        
+
     except Exception as e:
         logger.error(f"Error calculating invested history: {e}")
         return []
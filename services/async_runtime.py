@@ -0,0 +1,76 @@
+"""
+WAR ROOM - Async Runtime
+Shared primitives for code running on the FastAPI / APScheduler event loop:
+
+- run_blocking(): offloads SDK- or CPU-bound work (yfinance, pdfplumber, sync DB
+  helpers, the Intelligence scan) to a bounded thread pool so the loop keeps serving requests.
+- get_http_client(): one pooled httpx.AsyncClient for Ollama and CoinGecko.
+- bind_loop() / submit(): schedule coroutines on the app loop from worker threads
+  (event bus subscribers).
+"""
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+BLOCKING_WORKERS = int(os.getenv("BLOCKING_WORKERS", "8"))
+
+_executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="blocking")
+_http_client = None
+_loop = None
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking callable in the bounded executor and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(func, *args, **kwargs))
+
+
+def bind_loop(loop: asyncio.AbstractEventLoop = None):
+    """Remember the app event loop (call once at startup, from the loop)."""
+    global _loop
+    _loop = loop or asyncio.get_event_loop()
+
+
+def submit(coro):
+    """
+    Schedule `coro` on the app loop from any thread (a Task if already on the loop,
+    else a concurrent Future). Dropped with a warning when no loop is bound.
+    """
+    if _loop is None or _loop.is_closed():
+        coro.close()
+        logger.warning("[ASYNC] No event loop bound: coroutine dropped")
+        return None
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is _loop:
+        return _loop.create_task(coro)
+    return asyncio.run_coroutine_threadsafe(coro, _loop)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared AsyncClient (connection pooling + keep-alive). Created on first use."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _http_client
+
+
+async def shutdown():
+    """Close the HTTP client and the executor. Call from FastAPI shutdown."""
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
+    _executor.shutdown(wait=False, cancel_futures=True)
+    logger.info("[ASYNC] Runtime shut down.")
@@ -5,13 +5,15 @@ import logging
 import json
 from datetime import datetime
 import requests
-from sqlalchemy import func, cast, Date
+from sqlalchemy import func, cast, Date, select
+from sqlalchemy.orm.attributes import flag_modified
 from dotenv import load_dotenv
 
 from intelligence.llm_wrapper import LLMWrapper
 from intelligence.engine import IntelligenceEngine
 from services.portfolio_service import get_anonymous_portfolio_context
-from db.database import SessionLocal
+from services.async_runtime import run_blocking, get_http_client
+from db.database import AsyncSessionLocal
 from db.models import CouncilSession
 
 
@@ -136,9 +138,8 @@ class TheCouncil:
             {"role": "user", "content": f"CONTESTO DI MERCATO:\n{context}\n\nFornisci la tua analisi in formato JSON con i campi: 'verdict' (Bullish/Bearish/Neutral), 'confidence' (0-100), 'reasoning' (testo in italiano), 'actionable_advice' (bullet point)."}
         ]
         
-        loop = asyncio.get_event_loop()
         try:
-            response_text = await loop.run_in_executor(None, advisor.chat, messages, True)
+            response_text = await advisor.achat(messages, True)
             logger.info(f"[{role_id}] Raw Response: {response_text[:100]}...") # Log summary
             
             if not response_text:
@@ -182,46 +183,45 @@ class TheCouncil:
             logger.error(f"[{role_id}] Critical Error: {e}")
             return {"role": role_id, "error": str(e)}
 
-    def get_todays_session(self, model: str = None):
+    async def get_todays_session(self, model: str = None):
         """Checks if a session already exists for today. Optionally filters by model."""
-        return self.get_session_by_date(datetime.now().date(), model)
+        return await self.get_session_by_date(datetime.now().date(), model)
 
-    def get_session_by_date(self, target_date, model: str = None):
+    async def get_session_by_date(self, target_date, model: str = None):
         """Retrieves a Council Session for a specific date and optional model."""
         try:
-            db = SessionLocal()
-            query = db.query(CouncilSession).filter(
-                cast(CouncilSession.timestamp, Date) == target_date
-            )
-            
-            # If model is specified, filter by it.
-            # If not specified (old behavior), just get the latest regardless.
-            if model:
-                query = query.filter(CouncilSession.consensus_model == model)
-            
-            session = query.order_by(CouncilSession.timestamp.desc()).first()
-            db.close()
-            return session
+            async with AsyncSessionLocal() as db:
+                query = select(CouncilSession).where(
+                    cast(CouncilSession.timestamp, Date) == target_date
+                )
+                
+                # If model is specified, filter by it.
+                # If not specified (old behavior), just get the latest regardless.
+                if model:
+                    query = query.where(CouncilSession.consensus_model == model)
+                
+                result = await db.execute(query.order_by(CouncilSession.timestamp.desc()).limit(1))
+                return result.scalars().first()
         except Exception as e:
             logger.error(f"DB Retrieval Failed for {target_date}: {e}")
             return None
 
-    def get_session_history(self):
+    async def get_session_history(self):
         """Returns a list of dates containing Council Sessions."""
         try:
-            db = SessionLocal()
-            # Select distinct dates
-            dates = db.query(cast(CouncilSession.timestamp, Date)).distinct().order_by(
-                cast(CouncilSession.timestamp, Date).desc()
-            ).all()
-            db.close()
-            # Unpack tuples keys
-            return [d[0].isoformat() for d in dates]
+            async with AsyncSessionLocal() as db:
+                # Select distinct dates
+                session_date = cast(CouncilSession.timestamp, Date)
+                result = await db.execute(
+                    select(session_date).distinct().order_by(session_date.desc())
+                )
+                # Unpack tuples keys
+                return [d[0].isoformat() for d in result.all()]
         except Exception as e:
             logger.error(f"History Retrieval Failed: {e}")
             return []
 
-    def generate_consensus(self, results_dict, model: str = "mistral-nemo:latest"):
+    async def generate_consensus(self, results_dict, model: str = "mistral-nemo:latest"):
         """
         Uses Local Ollama to generate a unified consensus and score the models.
         Returns: tuple(consensus_json, model_name) or (None, model_name) on failure.
@@ -259,7 +259,7 @@ class TheCouncil:
             
             # Use Ollama Helper with configurable model
             ollama_model = LLMWrapper(provider="ollama", model=model)
-            response = ollama_model.chat([{"role": "user", "content": prompt}], json_mode=True)
+            response = await ollama_model.achat([{"role": "user", "content": prompt}], json_mode=True)
             return response, model
             
         except Exception as e:
@@ -270,22 +270,20 @@ class TheCouncil:
         """
         Refreshes a specific item (Consensus or specific Model Persona) for the current daily session.
         """
-        session = self.get_todays_session()
+        session = await self.get_todays_session()
         if not session:
             raise ValueError("No active session found for today. Please convene the council first.")
         
         # 1. Handle Consensus Refresh
         if item_id == "consensus":
             logger.info("Refreshing Consensus...")
-            new_consensus = await asyncio.to_thread(self.generate_consensus, session.responses)
+            new_consensus = await self.generate_consensus(session.responses)
             if new_consensus:
                 try:
-                    db = SessionLocal()
-                    s = db.query(CouncilSession).filter(CouncilSession.id == session.id).first()
-                    s.consensus = new_consensus
-                    db.commit()
-                    db.refresh(s)
-                    db.close()
+                    async with AsyncSessionLocal() as db:
+                        s = await db.get(CouncilSession, session.id)
+                        s.consensus = new_consensus
+                        await db.commit()
                     return {"type": "consensus", "data": new_consensus}
                 except Exception as e:
                     logger.error(f"DB Update Failed: {e}")
@@ -309,21 +307,19 @@ class TheCouncil:
             
             # Update the responses dict
             try:
-                db = SessionLocal()
-                s = db.query(CouncilSession).filter(CouncilSession.id == session.id).first()
-                
-                # SQLAlchemy JSON mutation often requires re-assigning the whole dict or using flag_modified
-                # simpler to copy, update, assign
-                current_responses = dict(s.responses)
-                current_responses[item_id] = new_response
-                s.responses = current_responses
-                
-                # Flag modified just in case (for JSONB/JSON)
-                from sqlalchemy.orm.attributes import flag_modified
-                flag_modified(s, "responses")
-                
-                db.commit()
-                db.close()
+                async with AsyncSessionLocal() as db:
+                    s = await db.get(CouncilSession, session.id)
+                    
+                    # SQLAlchemy JSON mutation often requires re-assigning the whole dict or using flag_modified
+                    # simpler to copy, update, assign
+                    current_responses = dict(s.responses)
+                    current_responses[item_id] = new_response
+                    s.responses = current_responses
+                    
+                    # Flag modified just in case (for JSONB/JSON)
+                    flag_modified(s, "responses")
+                    
+                    await db.commit()
                 return {"type": "advisor", "id": item_id, "data": new_response}
             except Exception as e:
                 logger.error(f"DB Update Failed: {e}")
@@ -335,7 +331,7 @@ class TheCouncil:
         Smart Refresh: If data exists but has missing/errored items, repair them instead of re-running everything.
         """
         # 0. Check Cache (Daily)
-        cached = self.get_todays_session(model)
+        cached = await self.get_todays_session(model)
         
         if cached and not force_refresh:
             logger.info(f"Found existing Council Session for model {model}. Checking for missing data...")
@@ -363,21 +359,18 @@ class TheCouncil:
                 
                 # Update DB
                 try:
-                    db = SessionLocal()
-                    s = db.query(CouncilSession).filter(CouncilSession.id == cached.id).first()
-                    s.responses = responses
-                    
                     # Re-generate consensus if opinions were repaired
                     logger.info("Regenerating consensus with repaired opinions...")
-                    consensus_json, consensus_model = await asyncio.to_thread(self.generate_consensus, responses, model)
-                    s.consensus = consensus_json
-                    
-                    from sqlalchemy.orm.attributes import flag_modified
-                    flag_modified(s, "responses")
+                    consensus_json, consensus_model = await self.generate_consensus(responses, model)
                     
-                    db.commit()
-                    db.refresh(s)
-                    db.close()
+                    async with AsyncSessionLocal() as db:
+                        s = await db.get(CouncilSession, cached.id)
+                        s.responses = responses
+                        s.consensus = consensus_json
+                        flag_modified(s, "responses")
+                        
+                        await db.commit()
+                        await db.refresh(s)
                     
                     # Return the updated version
                     return {
@@ -405,11 +398,12 @@ class TheCouncil:
 
         # 1. Gather Data (The Dossier) - ONLY if no session or force_refresh
         logger.info("Gathering Council Dossier for a fresh session...")
-        portfolio = get_anonymous_portfolio_context()
+        portfolio = await run_blocking(get_anonymous_portfolio_context)
         
-        # News Context (Mistral)
-        intel_engine = IntelligenceEngine(portfolio_context=str(portfolio)) 
-        market_brief = intel_engine.generate_daily_briefing()
+        # News Context (Mistral) - memory load + LLM call off the event loop
+        market_brief = await run_blocking(
+            lambda: IntelligenceEngine(portfolio_context=str(portfolio)).generate_daily_briefing()
+        )
         
         # Build Context String
         dossier = {
@@ -434,20 +428,19 @@ class TheCouncil:
         results_dict = {r['role']: r for r in results_list}
         
         # 3. Generate Consensus
-        consensus_json, consensus_model = await asyncio.to_thread(self.generate_consensus, results_dict, model)
+        consensus_json, consensus_model = await self.generate_consensus(results_dict, model)
         
         # 4. Persist Session
         try:
-            db = SessionLocal()
-            session_record = CouncilSession(
-                context_snapshot=dossier,
-                responses=results_dict,
-                consensus=consensus_json,
-                consensus_model=consensus_model
-            )
-            db.add(session_record)
-            db.commit()
-            db.close()
+            async with AsyncSessionLocal() as db:
+                session_record = CouncilSession(
+                    context_snapshot=dossier,
+                    responses=results_dict,
+                    consensus=consensus_json,
+                    consensus_model=consensus_model
+                )
+                db.add(session_record)
+                await db.commit()
             logger.info(f"Council Session saved to DB with {len(results_dict)} opinions. Model: {consensus_model}")
         except Exception as e:
             logger.error(f"Failed to save session: {e}")
@@ -462,7 +455,7 @@ class TheCouncil:
             "context": dossier
         }
 
-    def get_available_ollama_models(self):
+    async def get_available_ollama_models(self):
         """
         Queries Ollama API to get list of available models.
         """
@@ -473,7 +466,7 @@ class TheCouncil:
             if not ollama_host.startswith("http"):
                 ollama_host = f"http://{ollama_host}"
                 
-            res = requests.get(f"{ollama_host}/api/tags", timeout=2)
+            res = await get_http_client().get(f"{ollama_host}/api/tags", timeout=2)
             if res.status_code == 200:
                 data = res.json()
                 # Extract model names
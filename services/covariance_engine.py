@@ -0,0 +1,298 @@
+"""
+WAR ROOM - Covariance Engine
+Incremental correlation / covariance of daily returns.
+
+- Rolling window (calendar days, e.g. 30/90/365): running sums and
+  cross-products of returns per symbol pair. A new daily close adds one
+  row and expires the rows that left the window: O(n²) per day instead of
+  recomputing O(n²·T) from scratch.
+- Moments are pairwise-complete: a pair only uses the days where both
+  symbols traded (crypto trades on weekends, stocks don't), so every
+  holding can be included without dropping days for all the others.
+- EWMA variant (RiskMetrics, zero-mean): cov = λ·cov + (1-λ)·r·rᵀ.
+- Closes come from the price history store; states are kept per
+  (symbols, window, method) and payloads cached per as-of date.
+"""
+import os
+import logging
+import threading
+from collections import OrderedDict, deque
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+WINDOWS = (30, 90, 365)
+METHODS = ("pearson", "ewma")
+EWMA_LAMBDA = float(os.getenv("COV_EWMA_LAMBDA", "0.94"))
+MIN_OBSERVATIONS = 5          # fewer common days -> correlation reported as 0
+RESYNC_EVERY = 250            # rolling: recompute sums from the window to shed float drift
+MAX_STATES = int(os.getenv("COV_MAX_STATES", "16"))
+MAX_PAYLOADS = 64
+TRADING_DAYS = 252
+
+
+# ============================================================
+# STATES
+# ============================================================
+
+class RollingMoments:
+    """Pairwise-complete sums over the last `window` calendar days."""
+
+    def __init__(self, n: int, window: int):
+        self.window = window
+        self.rows = deque()   # (date, returns with 0 for missing, observed mask)
+        self.last_date: Optional[date] = None   # last day with a return
+        self.as_of: Optional[date] = None       # window end
+        self._expired = 0
+        self._reset(n)
+
+    def _reset(self, n: int):
+        self.count = np.zeros((n, n))   # days both i and j observed
+        self.sum_x = np.zeros((n, n))   # Σ r_i over those days
+        self.sum_xx = np.zeros((n, n))  # Σ r_i² over those days
+        self.sum_xy = np.zeros((n, n))  # Σ r_i·r_j
+
+    def _apply(self, z: np.ndarray, m: np.ndarray, sign: float):
+        self.count += sign * np.outer(m, m)
+        self.sum_x += sign * np.outer(z, m)
+        self.sum_xx += sign * np.outer(z * z, m)
+        self.sum_xy += sign * np.outer(z, z)
+
+    def add(self, day: date, returns: np.ndarray):
+        m = ~np.isnan(returns)
+        z = np.where(m, returns, 0.0)
+        m = m.astype(float)
+        self.rows.append((day, z, m))
+        self._apply(z, m, 1.0)
+        self.last_date = day
+
+    def roll_to(self, as_of: date):
+        """Expire the rows that left the window ending at `as_of`."""
+        self.as_of = as_of
+        cutoff = as_of - timedelta(days=self.window)
+        while self.rows and self.rows[0][0] <= cutoff:
+            _, old_z, old_m = self.rows.popleft()
+            self._apply(old_z, old_m, -1.0)
+            self._expired += 1
+
+        if self._expired >= RESYNC_EVERY:
+            self._reset(len(self.count))
+            for _, row_z, row_m in self.rows:
+                self._apply(row_z, row_m, 1.0)
+            self._expired = 0
+
+    def covariance(self) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            n = self.count
+            cov = (self.sum_xy - self.sum_x * self.sum_x.T / n) / (n - 1)
+        return np.where(n >= MIN_OBSERVATIONS, cov, np.nan)
+
+    def correlation(self) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            n = self.count
+            var = (self.sum_xx - self.sum_x ** 2 / n) / (n - 1)   # var of i over the days shared with j
+            corr = self.covariance() / np.sqrt(var * var.T)
+        return np.clip(corr, -1.0, 1.0)
+
+    def observed(self) -> np.ndarray:
+        return np.diag(self.count)
+
+
+class EwmaMoments:
+    """Exponentially weighted (zero-mean) covariance; the window only bounds the warm-up history."""
+
+    def __init__(self, n: int, window: int, lam: float = EWMA_LAMBDA):
+        self.window = window
+        self.lam = lam
+        self.last_date: Optional[date] = None
+        self.as_of: Optional[date] = None
+        self.cov = np.zeros((n, n))
+        self.count = np.zeros((n, n))
+
+    def add(self, day: date, returns: np.ndarray):
+        m = ~np.isnan(returns)
+        z = np.where(m, returns, 0.0)
+        self.cov = self.lam * self.cov + (1 - self.lam) * np.outer(z, z)
+        self.count += np.outer(m, m)
+        self.last_date = day
+
+    def roll_to(self, as_of: date):
+        self.as_of = as_of
+
+    def covariance(self) -> np.ndarray:
+        return np.where(self.count >= MIN_OBSERVATIONS, self.cov, np.nan)
+
+    def correlation(self) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sd = np.sqrt(np.diag(self.cov))
+            corr = self.covariance() / np.outer(sd, sd)
+        return np.clip(corr, -1.0, 1.0)
+
+    def observed(self) -> np.ndarray:
+        return np.diag(self.count)
+
+
+# ============================================================
+# ENGINE
+# ============================================================
+
+def daily_returns(closes: pd.DataFrame) -> pd.DataFrame:
+    """Per-symbol simple returns on each symbol's own trading days (NaN where it didn't trade)."""
+    return pd.DataFrame({c: closes[c].dropna().pct_change() for c in closes.columns}).reindex(closes.index)
+
+
+class CovarianceEngine:
+    """Keeps one incremental state per (symbols, window, method)."""
+
+    def __init__(self, history_loader=None):
+        # _lock guards the caches and live-state updates only; history loads (which may
+        # download) run outside it, single-flighted per state key by _key_locks
+        self._lock = threading.RLock()
+        self._states: "OrderedDict[tuple, object]" = OrderedDict()
+        self._payloads: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._key_locks: Dict[tuple, threading.Lock] = {}
+        self._history_loader = history_loader
+
+    def _load_closes(self, symbols: Sequence[str], start: date, end: date) -> pd.DataFrame:
+        if self._history_loader is not None:
+            return self._history_loader(symbols, start, end)
+        from services.price_history import get_history
+        return get_history(symbols, start, end)
+
+    def _key_lock(self, key: tuple) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _advance(self, key: tuple, as_of: date):
+        """Create or roll forward the state of `key` up to `as_of` (closed days only)."""
+        symbols, window, method = key
+        with self._key_lock(key):
+            with self._lock:
+                state = self._states.get(key)
+                if state is not None and state.as_of == as_of:
+                    self._states.move_to_end(key)
+                    return state
+                historical = state is not None and state.as_of > as_of
+                if historical:
+                    state = None   # past as-of date: one-off state, the live one stays
+                if state is None:
+                    cls = EwmaMoments if method == "ewma" else RollingMoments
+                    state = cls(len(symbols), window)
+                    # one extra close before the window to get its first return
+                    start = as_of - timedelta(days=window + 7)
+                else:
+                    start = (state.last_date or state.as_of) - timedelta(days=7)
+
+            # May download: no engine-wide lock held, other holding sets keep being served
+            closes = self._load_closes(symbols, start, as_of)
+            closes = closes.reindex(columns=list(symbols))
+            returns = daily_returns(closes)
+
+            with self._lock:
+                new_rows = 0
+                for ts, row in returns.iterrows():
+                    day = ts.date()
+                    if (state.last_date is not None and day <= state.last_date) or day > as_of:
+                        continue
+                    if row.isna().all():
+                        continue
+                    state.add(day, row.to_numpy(dtype=float))
+                    new_rows += 1
+                state.roll_to(as_of)
+                if historical:
+                    return state
+
+                self._states[key] = state
+                self._states.move_to_end(key)
+                while len(self._states) > MAX_STATES:
+                    evicted, _ = self._states.popitem(last=False)
+                    self._key_locks.pop(evicted, None)
+        logger.info(f"[COVARIANCE] {len(symbols)} symbols {window}d/{method}: +{new_rows} days -> {as_of}")
+        return state
+
+    def matrix(self, symbols: Sequence[str], window: int = 365, method: str = "pearson",
+               kind: str = "correlation", as_of: Optional[date] = None) -> Dict:
+        """
+        Correlation (or annualized covariance) matrix of `symbols` as of the close of `as_of`
+        (default: yesterday, the last closed day). Symbols without enough data are left out.
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown method {method!r} (expected one of {METHODS})")
+        if kind not in ("correlation", "covariance"):
+            raise ValueError(f"Unknown kind {kind!r}")
+        if window < 2:
+            raise ValueError("window must be at least 2 days")
+
+        order = tuple(dict.fromkeys(symbols))
+        # States and payloads are keyed on the holding set, not on its (value-ranked) order
+        symbols = tuple(sorted(order))
+        as_of = as_of or date.today() - timedelta(days=1)
+        cache_key = (symbols, window, method, kind, as_of)
+        with self._lock:
+            cached = self._payloads.get(cache_key)
+            if cached is not None:
+                return self._in_order(cached, order)
+
+        while True:
+            state = self._advance((symbols, window, method), as_of)
+            with self._lock:
+                # A concurrent advance_all may have rolled the live state on meanwhile
+                if state.as_of == as_of:
+                    return self._in_order(self._build_payload(cache_key, state), order)
+
+    def _build_payload(self, cache_key: tuple, state) -> Dict:
+        """Payload of an advanced state, cached under `cache_key` (caller holds _lock)."""
+        symbols, window, method, kind, as_of = cache_key
+        keep = np.flatnonzero(state.observed() >= MIN_OBSERVATIONS)
+        values = state.correlation() if kind == "correlation" else state.covariance() * TRADING_DAYS
+        values = np.nan_to_num(values[np.ix_(keep, keep)])
+        if kind == "correlation":
+            np.fill_diagonal(values, 1.0)
+
+        payload = {
+            "symbols": [symbols[i] for i in keep],
+            "matrix": np.round(values, 2 if kind == "correlation" else 6).tolist(),
+            "window": window,
+            "method": method,
+            "kind": kind,
+            "as_of": str(as_of),
+            "observations": int(state.observed().max()) if len(symbols) else 0,
+        }
+        self._payloads[cache_key] = payload
+        while len(self._payloads) > MAX_PAYLOADS:
+            self._payloads.popitem(last=False)
+        return payload
+
+    @staticmethod
+    def _in_order(payload: Dict, order: tuple) -> Dict:
+        """Payload with its symbols (and matrix rows/columns) permuted to the caller's order."""
+        index = {s: i for i, s in enumerate(payload["symbols"])}
+        perm = [index[s] for s in order if s in index]
+        matrix = payload["matrix"]
+        return {
+            **payload,
+            "symbols": [payload["symbols"][i] for i in perm],
+            "matrix": [[matrix[i][j] for j in perm] for i in perm],
+        }
+
+    def advance_all(self, as_of: Optional[date] = None) -> int:
+        """Roll every live state forward (nightly, after the price history top-up)."""
+        as_of = as_of or date.today() - timedelta(days=1)
+        with self._lock:
+            keys = list(self._states)
+        for key in keys:
+            self._advance(key, as_of)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+            self._payloads.clear()
+
+
+# Singleton
+covariance_engine = CovarianceEngine()
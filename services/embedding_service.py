@@ -0,0 +1,239 @@
+"""
+WAR ROOM - Embedding Service
+Shared, batched and cached text embeddings from Ollama.
+
+- One pooled HTTP session (keep-alive) for every caller.
+- Ollama's batch endpoint /api/embed with a list input (falls back to the legacy
+  one-text-per-call /api/embeddings on older Ollama builds).
+- Identical texts in a request are embedded once.
+- Vectors are cached persistently in SQLite (data/embeddings_cache.db) keyed by
+  (model, sha256(text)), stored as float32 blobs.
+- A global semaphore bounds the number of in-flight requests to Ollama.
+
+Used by JsonVectorMemory and chroma_client.VectorMemory. Throughput stats are
+exposed through get_stats() (see /api/status).
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+EMBED_CACHE_DB = os.path.join(str(Path(__file__).parent.parent), "data", "embeddings_cache.db")
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+DEFAULT_EMBED_MODEL = "mistral-nemo:latest"
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))       # texts per /api/embed call
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "2"))      # in-flight calls to Ollama
+EMBED_TIMEOUT = int(os.getenv("EMBED_TIMEOUT", "120"))
+
+_lock = threading.Lock()
+_in_flight = threading.BoundedSemaphore(EMBED_CONCURRENCY)
+_executor = ThreadPoolExecutor(max_workers=EMBED_CONCURRENCY, thread_name_prefix="embed")
+_session = None
+_legacy_endpoint = set()  # base URLs without /api/embed
+
+_stats = {
+    "texts_requested": 0,
+    "cache_hits": 0,
+    "texts_embedded": 0,
+    "embed_seconds": 0.0,
+    "requests": 0,
+    "errors": 0,
+}
+
+
+def _get_session() -> requests.Session:
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(EMBED_CONCURRENCY, 2))
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+    return _session
+
+
+def _connect():
+    os.makedirs(os.path.dirname(EMBED_CACHE_DB), exist_ok=True)
+    conn = sqlite3.connect(EMBED_CACHE_DB, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS embeddings ("
+        " model TEXT NOT NULL,"
+        " text_hash TEXT NOT NULL,"
+        " vector BLOB NOT NULL,"
+        " created_at REAL NOT NULL,"
+        " PRIMARY KEY (model, text_hash))"
+    )
+    return conn
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+# ============================================================
+# PERSISTENT CACHE
+# ============================================================
+
+def _load_cached(model: str, hashes: List[str]) -> Dict[str, list]:
+    if not hashes:
+        return {}
+    found = {}
+    try:
+        conn = _connect()
+        try:
+            for i in range(0, len(hashes), 500):
+                chunk = hashes[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *chunk]
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32).tolist()
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning(f"[EMBED] Failed to read cache: {e}")
+    return found
+
+
+def _save_cached(model: str, vectors: Dict[str, list]):
+    if not vectors:
+        return
+    now = time.time()
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, created_at) VALUES (?, ?, ?, ?)",
+                    [(model, h, np.asarray(v, dtype=np.float32).tobytes(), now) for h, v in vectors.items()]
+                )
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning(f"[EMBED] Failed to write cache: {e}")
+
+
+# ============================================================
+# OLLAMA CALLS
+# ============================================================
+
+def _post(url: str, payload: dict) -> requests.Response:
+    with _in_flight:
+        return _get_session().post(url, json=payload, timeout=EMBED_TIMEOUT)
+
+
+def _embed_batch_legacy(texts: List[str], model: str, base_url: str) -> List[Optional[list]]:
+    """Older Ollama: one /api/embeddings call per text."""
+    vectors = []
+    for text in texts:
+        resp = _post(f"{base_url}/api/embeddings", {"model": model, "prompt": text})
+        vectors.append(resp.json().get('embedding') if resp.status_code == 200 else None)
+    return vectors
+
+
+def _embed_batch(texts: List[str], model: str, base_url: str) -> List[Optional[list]]:
+    """Embed one batch; returns vectors aligned with `texts` (None on failure)."""
+    start = time.perf_counter()
+    try:
+        if base_url in _legacy_endpoint:
+            vectors = _embed_batch_legacy(texts, model, base_url)
+        else:
+            resp = _post(f"{base_url}/api/embed", {"model": model, "input": texts})
+            if resp.status_code == 404 and "model" not in resp.text.lower():
+                logger.info(f"[EMBED] {base_url} has no /api/embed, using /api/embeddings")
+                _legacy_endpoint.add(base_url)
+                vectors = _embed_batch_legacy(texts, model, base_url)
+            elif resp.status_code == 200:
+                vectors = resp.json().get('embeddings') or []
+                if len(vectors) != len(texts):
+                    raise ValueError(f"expected {len(texts)} embeddings, got {len(vectors)}")
+            else:
+                logger.warning(f"[EMBED] Ollama HTTP {resp.status_code}: {resp.text[:200]}")
+                vectors = [None] * len(texts)
+    except Exception as e:
+        logger.warning(f"[EMBED] Ollama error: {e}")
+        vectors = [None] * len(texts)
+
+    elapsed = time.perf_counter() - start
+    with _lock:
+        _stats["requests"] += 1
+        _stats["embed_seconds"] += elapsed
+        _stats["texts_embedded"] += sum(1 for v in vectors if v)
+        _stats["errors"] += sum(1 for v in vectors if not v)
+    return vectors
+
+
+# ============================================================
+# PUBLIC API
+# ============================================================
+
+def embed_texts(texts: List[str], model: str = DEFAULT_EMBED_MODEL,
+                base_url: str = DEFAULT_OLLAMA_URL) -> List[Optional[list]]:
+    """
+    Embed many texts. Returns vectors aligned with `texts` (None where Ollama failed).
+    Cached texts are not sent; duplicates are embedded once.
+    """
+    if not texts:
+        return []
+    base_url = base_url.rstrip('/')
+
+    hashes = [text_hash(t) for t in texts]
+    unique = dict(zip(hashes, texts))  # hash -> text (dedup, order kept)
+
+    vectors = _load_cached(model, list(unique))
+    missing = [h for h in unique if h not in vectors]
+
+    with _lock:
+        _stats["texts_requested"] += len(texts)
+        _stats["cache_hits"] += sum(1 for h in hashes if h in vectors)
+
+    if missing:
+        batches = [missing[i:i + EMBED_BATCH_SIZE] for i in range(0, len(missing), EMBED_BATCH_SIZE)]
+        futures = [
+            (batch, _executor.submit(_embed_batch, [unique[h] for h in batch], model, base_url))
+            for batch in batches
+        ]
+        fresh = {}
+        for batch, future in futures:
+            for h, vector in zip(batch, future.result()):
+                if vector:
+                    fresh[h] = vector
+        _save_cached(model, fresh)
+        vectors.update(fresh)
+
+    return [vectors.get(h) for h in hashes]
+
+
+def embed_text(text: str, model: str = DEFAULT_EMBED_MODEL,
+               base_url: str = DEFAULT_OLLAMA_URL) -> Optional[list]:
+    """Embed a single text (see embed_texts)."""
+    return embed_texts([text], model, base_url)[0]
+
+
+def get_stats() -> dict:
+    """Throughput counters since process start."""
+    with _lock:
+        stats = dict(_stats)
+    requested = stats["texts_requested"]
+    stats["cache_hit_ratio"] = round(stats["cache_hits"] / requested, 3) if requested else 0.0
+    stats["texts_per_sec"] = (
+        round(stats["texts_embedded"] / stats["embed_seconds"], 2) if stats["embed_seconds"] else 0.0
+    )
+    stats["embed_seconds"] = round(stats["embed_seconds"], 2)
+    return stats
@@ -0,0 +1,66 @@
+"""
+WAR ROOM - Event Bus
+In-process publish/subscribe.
+
+- Publishers (quote workers, the background refresher, the crypto poller)
+  call publish() from any thread; subscribers run synchronously in that
+  thread, so they must be cheap and hand real work to the event loop
+  (async_runtime.submit).
+- A failing subscriber is logged and never breaks the publisher.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PRICE_TOPIC = "price"
+
+
+@dataclass(frozen=True)
+class PriceEvent:
+    """A fresh quote (price in EUR, like price_service_v5.get_price)."""
+    ticker: str
+    price: float
+    source: str
+    asset_type: Optional[str] = None
+    isin: Optional[str] = None
+    change_pct: float = 0.0
+    ts: float = field(default_factory=time.time)
+
+
+class EventBus:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, List[Callable]] = defaultdict(list)
+
+    def subscribe(self, topic: str, callback: Callable) -> Callable[[], None]:
+        """Register `callback(event)`; returns an unsubscribe function. Idempotent per callback."""
+        with self._lock:
+            if callback not in self._subscribers[topic]:
+                self._subscribers[topic].append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers[topic]:
+                    self._subscribers[topic].remove(callback)
+        return unsubscribe
+
+    def has_subscribers(self, topic: str) -> bool:
+        return bool(self._subscribers.get(topic))
+
+    def publish(self, topic: str, event) -> None:
+        with self._lock:
+            callbacks = list(self._subscribers.get(topic, ()))
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"[BUS] Subscriber {getattr(callback, '__name__', callback)} failed on {topic}: {e}")
+
+
+# Singleton
+bus = EventBus()
@@ -0,0 +1,297 @@
+"""
+WAR ROOM - Holdings Snapshot Service
+Atomic, bulk replacement of a broker's holdings.
+
+- The new holdings set is written with multi-row INSERTs (one statement per
+  1000 rows), tagged with an import batch id (holdings.import_batch_id).
+- Delete + insert + batch bookkeeping run in ONE transaction: readers
+  (/api/portfolio, the background refresher) see either the old or the new
+  set, never an empty or half-loaded broker.
+- The replaced set is kept as the broker's PREVIOUS batch:
+  rollback_holdings(broker) swaps it back.
+- Old and new positions are diffed by natural key (ISIN/ticker + currency).
+  Matching positions keep their holding id, and only real changes invalidate
+  downstream caches (price cache entries, portfolio model/snapshot).
+"""
+import uuid
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, date
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Date, DateTime, Numeric, delete, select, text
+from sqlalchemy.dialects.postgresql import UUID
+
+from db.database import SessionLocal
+from db.models import Holding, HoldingBatch
+
+logger = logging.getLogger(__name__)
+
+HOLDINGS = Holding.__table__
+
+ACTIVE = "ACTIVE"
+PREVIOUS = "PREVIOUS"
+
+# Position fields: a difference means the holding really changed
+POSITION_COLUMNS = (
+    "ticker", "isin", "name", "asset_type", "quantity", "purchase_price", "purchase_date",
+    "currency", "share_class", "adr_ratio", "nominal_value", "market",
+)
+# Statement valuation: refreshed on every import, live prices supersede it
+VALUATION_COLUMNS = ("current_price", "current_value", "native_current_value", "exchange_rate_used")
+# Changes here make the cached quote of the position stale
+PRICING_COLUMNS = ("asset_type", "currency", "share_class", "adr_ratio", "market")
+
+
+@dataclass
+class HoldingsDiff:
+    added: List[dict] = field(default_factory=list)
+    removed: List[dict] = field(default_factory=list)
+    changed: List[Tuple[dict, dict]] = field(default_factory=list)  # (old, new)
+    revalued: int = 0   # only statement prices/values differ
+    unchanged: int = 0
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def summary(self) -> dict:
+        return {
+            "added": len(self.added),
+            "removed": len(self.removed),
+            "changed": len(self.changed),
+            "revalued": self.revalued,
+            "unchanged": self.unchanged,
+        }
+
+
+@dataclass
+class SnapshotResult:
+    broker: str
+    batch_id: uuid.UUID
+    rows: int
+    diff: HoldingsDiff
+
+
+# ============================================================
+# DIFF
+# ============================================================
+
+def position_key(row: dict) -> tuple:
+    return (
+        (row.get("isin") or row.get("ticker") or "").upper(),
+        (row.get("currency") or "EUR").upper(),
+    )
+
+
+def _canonical(column: str, value):
+    """Compare values the way the DB stores them (numerics at the column's scale)."""
+    if value is None:
+        return None
+    col_type = HOLDINGS.c[column].type
+    if isinstance(col_type, Numeric) and col_type.scale is not None:
+        return Decimal(str(value)).quantize(Decimal(1).scaleb(-col_type.scale))
+    return value
+
+
+def _differs(old: dict, new: dict, columns) -> bool:
+    return any(_canonical(c, old.get(c)) != _canonical(c, new.get(c)) for c in columns)
+
+
+def diff_positions(old_rows: List[dict], new_rows: List[dict]) -> HoldingsDiff:
+    """
+    Match new rows to old ones by position key (repeated keys matched in order).
+    Matched new rows without an id inherit the old holding id.
+    """
+    old_by_key: Dict[tuple, List[dict]] = {}
+    for row in old_rows:
+        old_by_key.setdefault(position_key(row), []).append(row)
+
+    diff = HoldingsDiff()
+    for row in new_rows:
+        candidates = old_by_key.get(position_key(row))
+        if not candidates:
+            diff.added.append(row)
+            continue
+        old = candidates.pop(0)
+        row.setdefault("id", old["id"])
+        if _differs(old, row, POSITION_COLUMNS):
+            diff.changed.append((old, row))
+        elif _differs(old, row, VALUATION_COLUMNS):
+            diff.revalued += 1
+        else:
+            diff.unchanged += 1
+
+    diff.removed = [row for rows in old_by_key.values() for row in rows]
+    return diff
+
+
+# ============================================================
+# SERIALIZATION (PREVIOUS batch rows in holding_batches.positions)
+# ============================================================
+
+def _to_json(row: dict) -> dict:
+    out = {}
+    for k, v in row.items():
+        if isinstance(v, (Decimal, uuid.UUID)):
+            v = str(v)
+        elif isinstance(v, (datetime, date)):
+            v = v.isoformat()
+        out[k] = v
+    return out
+
+
+def _from_json(row: dict) -> dict:
+    out = {}
+    for k, v in row.items():
+        if k not in HOLDINGS.c:
+            continue
+        col_type = HOLDINGS.c[k].type
+        if v is not None:
+            if isinstance(col_type, UUID):
+                v = uuid.UUID(v)
+            elif isinstance(col_type, DateTime):
+                v = datetime.fromisoformat(v)
+            elif isinstance(col_type, Date):
+                v = date.fromisoformat(v)
+            elif isinstance(col_type, Numeric) and col_type.asdecimal:
+                v = Decimal(v)
+        out[k] = v
+    return out
+
+
+# ============================================================
+# SWAP
+# ============================================================
+
+def _lock_broker(session, broker: str):
+    """Serialize concurrent swaps of the same broker (transaction-scoped)."""
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"holdings:{broker}"})
+
+
+def _current_rows(session, broker: str) -> List[dict]:
+    result = session.execute(select(HOLDINGS).where(HOLDINGS.c.broker == broker))
+    return [dict(r) for r in result.mappings()]
+
+
+def _demote_active(session, broker: str, current_rows: List[dict], keep: uuid.UUID):
+    """
+    ACTIVE batch -> PREVIOUS, storing the rows as they are now (transactions may
+    have edited them since the import). Older PREVIOUS batches, except `keep`, are dropped.
+    """
+    session.execute(delete(HoldingBatch).where(
+        HoldingBatch.broker == broker, HoldingBatch.status == PREVIOUS, HoldingBatch.id != keep
+    ))
+    active = session.execute(
+        select(HoldingBatch).where(HoldingBatch.broker == broker, HoldingBatch.status == ACTIVE)
+    ).scalars().all()
+    if not active and not current_rows:
+        return
+    if not active:
+        # Holdings loaded before batches existed: keep them as the rollback point
+        active = [HoldingBatch(id=uuid.uuid4(), broker=broker, source_document="pre-batch holdings")]
+        session.add(active[0])
+    for batch in active[1:]:
+        session.delete(batch)
+    batch = active[0]
+    batch.status = PREVIOUS
+    batch.row_count = len(current_rows)
+    batch.positions = [_to_json(r) for r in current_rows]
+
+
+def _write_rows(session, broker: str, rows: List[dict]):
+    session.execute(delete(HOLDINGS).where(HOLDINGS.c.broker == broker))
+    if rows:
+        # executemany: SQLAlchemy batches the rows into multi-row INSERT statements
+        session.execute(HOLDINGS.insert(), rows)
+
+
+def _invalidate_downstream(broker: str, diff: HoldingsDiff):
+    if not diff.has_changes:
+        return
+
+    stale = [old for old in diff.removed]
+    stale += [old for old, new in diff.changed if _differs(old, new, PRICING_COLUMNS)]
+    if stale:
+        from services.price_service_v5 import invalidate_cache
+        invalidate_cache(list({r.get("isin") or r.get("ticker") for r in stale}))
+
+    from services.portfolio_model import portfolio_model
+    portfolio_model.invalidate()
+
+
+def _swap(broker: str, rows: List[dict], batch_id: uuid.UUID, source_document: Optional[str],
+          rollback: bool, session_factory) -> HoldingsDiff:
+    """One transaction: demote the ACTIVE batch, activate `batch_id`, rewrite the broker's rows."""
+    session = session_factory()
+    try:
+        _lock_broker(session, broker)
+        batch = session.get(HoldingBatch, batch_id)
+        if rollback and (batch is None or batch.status != PREVIOUS):
+            raise ValueError(f"Holdings batch {batch_id} of {broker} is no longer available for rollback")
+
+        current = _current_rows(session, broker)
+        diff = diff_positions(current, rows)
+        for row in rows:
+            row.setdefault("id", uuid.uuid4())
+            row["import_batch_id"] = batch_id
+
+        _demote_active(session, broker, current, keep=batch_id)
+        if batch is None:
+            batch = HoldingBatch(id=batch_id, broker=broker, source_document=source_document)
+            session.add(batch)
+        batch.status = ACTIVE
+        batch.row_count = len(rows)
+        batch.positions = None
+        batch.activated_at = datetime.now()
+
+        _write_rows(session, broker, rows)
+        session.commit()
+        return diff
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def swap_holdings(broker: str, items: List[dict], source_document: Optional[str] = None,
+                  session_factory=SessionLocal) -> SnapshotResult:
+    """
+    Replace all holdings of `broker` with `items` (Holding column dicts) atomically.
+    The replaced set becomes the PREVIOUS batch.
+    """
+    now = datetime.now()
+    rows = [
+        {**item, "broker": broker, "source_document": item.get("source_document", source_document),
+         "last_updated": item.get("last_updated") or now}
+        for item in items
+    ]
+    batch_id = uuid.uuid4()
+
+    diff = _swap(broker, rows, batch_id, source_document, False, session_factory)
+    logger.info(f"[HOLDINGS] {broker}: batch {batch_id} active ({len(rows)} rows) {diff.summary()}")
+    _invalidate_downstream(broker, diff)
+    return SnapshotResult(broker, batch_id, len(rows), diff)
+
+
+def rollback_holdings(broker: str, session_factory=SessionLocal) -> SnapshotResult:
+    """Swap the PREVIOUS batch of `broker` back in (the current set becomes PREVIOUS)."""
+    session = session_factory()
+    try:
+        previous = session.execute(
+            select(HoldingBatch).where(HoldingBatch.broker == broker, HoldingBatch.status == PREVIOUS)
+        ).scalars().first()
+        if previous is None or previous.positions is None:
+            raise ValueError(f"No previous holdings batch for {broker}")
+        batch_id = previous.id
+        rows = [_from_json(r) for r in previous.positions]
+    finally:
+        session.close()
+
+    diff = _swap(broker, rows, batch_id, None, True, session_factory)
+    logger.info(f"[HOLDINGS] {broker}: rolled back to batch {batch_id} {diff.summary()}")
+    _invalidate_downstream(broker, diff)
+    return SnapshotResult(broker, batch_id, len(rows), diff)
@@ -186,8 +186,11 @@ def extract_content_smart(file_path: Path) -> str:
 
 def extract_smart_pdf(pdf_path: Path) -> str:
     """Extracts PDF content, prioritizing tables converted to Markdown."""
+    from ingestion.pipeline.document_text import open_document
+    
     try:
         doc = fitz.open(pdf_path)
+        text_layer = open_document(pdf_path)  # cached page text shared with the IDP pipeline
         full_text = []
 
         for page_num, page in enumerate(doc):
@@ -200,10 +203,8 @@ def extract_smart_pdf(pdf_path: Path) -> str:
                     md = tab.to_markdown()
                     full_text.append(md)
             else:
-                # 2. Fallback to text blocks if no tables
-                blocks = page.get_text("blocks")
-                blocks.sort(key=lambda b: (b[1], b[0])) # Sort by Y, then X
-                page_text = "\n".join([b[4] for b in blocks])
+                # 2. Fallback to the page text (lines in reading order) if no tables
+                page_text = text_layer.page(page_num)
                 full_text.append(f"--- PAGE {page_num+1} TEXT ---")
                 full_text.append(page_text)
                 
@@ -242,8 +243,8 @@ def extract_text(file_path: Path) -> str:
     suffix = file_path.suffix.lower()
     try:
         if suffix == '.pdf':
-            doc = fitz.open(file_path)
-            return "\n".join([p.get_text() for p in doc])
+            from ingestion.pipeline.document_text import open_document
+            return open_document(file_path).text()
         elif suffix == '.csv':
             return pd.read_csv(file_path).to_string(index=False)
         elif suffix in ['.xlsx', '.xls']:
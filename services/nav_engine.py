@@ -0,0 +1,438 @@
+"""
+WAR ROOM - NAV Engine
+Daily portfolio value reconstructed from the transactions table.
+
+- BUY/SELL transactions are replayed per (broker, instrument) into a daily
+  position matrix (dates × instruments) and an average-cost matrix in EUR.
+- Value = positions × daily closes × daily FX (EUR per unit of the
+  instrument's currency), all aligned on a calendar index, so a full history
+  is a handful of matrix operations.
+- Closes and FX rates come from the price history store (Yahoo symbols,
+  EUR{CUR}=X pairs). Before a symbol's first close, and for symbols Yahoo
+  doesn't know, the last trade price is carried forward.
+- Incremental: new/changed transactions replay from their earliest trade
+  date only (earlier rows are reused); new days only value the new rows.
+- backfill_snapshots() writes the series into portfolio_snapshots in bulk.
+
+Closes are assumed to be quoted in the transaction currency.
+"""
+import logging
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+
+from db.database import SessionLocal
+from db.models import Holding, PortfolioSnapshot, Transaction
+
+logger = logging.getLogger(__name__)
+
+CRYPTO_BROKERS = {"BINANCE"}
+SNAPSHOT_CHUNK = 1000
+QTY_EPSILON = 1e-9
+PRICE_LOOKBACK_DAYS = 31   # quotes loaded before the first revalued day, to carry the last close forward
+
+
+@dataclass(frozen=True, order=True)
+class Instrument:
+    broker: str
+    key: str                 # ISIN or ticker
+    symbol: Optional[str]    # Yahoo symbol (None: trade prices only)
+    currency: str
+    asset_type: str
+
+
+def fx_symbol(currency: str) -> Optional[str]:
+    """Yahoo pair giving 1 EUR in `currency` (GBp is priced from GBP)."""
+    if currency in ("EUR", None):
+        return None
+    return f"EUR{'GBP' if currency == 'GBp' else currency.upper()}=X"
+
+
+# ============================================================
+# MATRICES
+# ============================================================
+
+def _calendar(start: date, end: date) -> pd.DatetimeIndex:
+    return pd.date_range(start, end, freq="D")
+
+
+def load_fx(currencies, calendar: pd.DatetimeIndex, history_loader) -> pd.DataFrame:
+    """Daily EUR per unit of each currency (ffilled; static fallback before the first quote)."""
+    from services.forex_service import FALLBACK_RATES
+
+    currencies = sorted(set(currencies) | {"EUR"})
+    pairs = {c: fx_symbol(c) for c in currencies if fx_symbol(c)}
+    closes = history_loader(sorted(set(pairs.values())), calendar[0].date(), calendar[-1].date()) if pairs else pd.DataFrame()
+    closes = closes.reindex(calendar).ffill() if not closes.empty else pd.DataFrame(index=calendar)
+
+    fx = pd.DataFrame(index=calendar, columns=currencies, dtype=float)
+    for c in currencies:
+        pair = pairs.get(c)
+        if pair is None:
+            fx[c] = 1.0
+            continue
+        rate = 1.0 / closes[pair] if pair in closes.columns else pd.Series(np.nan, index=calendar)
+        if c == "GBp":
+            rate = rate / 100
+        fallback = float(FALLBACK_RATES.get(c, Decimal("1")))
+        fx[c] = rate.bfill().fillna(fallback)
+    return fx
+
+
+def load_prices(instruments: List[Instrument], trade_prices: pd.DataFrame,
+                calendar: pd.DatetimeIndex, history_loader) -> pd.DataFrame:
+    """Daily close per instrument column, trade prices filling the gaps."""
+    symbols = sorted({i.symbol for i in instruments if i.symbol})
+    closes = history_loader(symbols, calendar[0].date(), calendar[-1].date()) if symbols else pd.DataFrame()
+    closes = closes.reindex(calendar).ffill() if not closes.empty else pd.DataFrame(index=calendar)
+
+    prices = pd.DataFrame(
+        {i: closes[i.symbol] if i.symbol in closes.columns else np.nan for i in instruments},
+        index=calendar, columns=instruments, dtype=float,
+    )
+    fallback = trade_prices.reindex(index=calendar, columns=instruments).ffill()
+    return prices.combine_first(fallback)[instruments]
+
+
+# ============================================================
+# ENGINE
+# ============================================================
+
+class NavEngine:
+    """Cached daily position/cost matrices, extended or partially replayed on change."""
+
+    def __init__(self, session_factory=SessionLocal, history_loader=None):
+        self._lock = threading.RLock()
+        self._session_factory = session_factory
+        self._history_loader = history_loader
+        self._reset()
+
+    def _reset(self):
+        self.instruments: Dict[tuple, Instrument] = {}
+        self.qty: Optional[pd.DataFrame] = None     # dates × instruments, end-of-day quantity
+        self.cost: Optional[pd.DataFrame] = None    # dates × instruments, average cost in EUR
+        self.series: Optional[pd.DataFrame] = None  # value / cost / pnl / holdings_count per day
+        self.breakdowns: Dict[date, tuple] = {}     # day -> (by broker, by asset type)
+        self.trade_prices: Dict[tuple, float] = {}  # (day, instrument) -> last trade price
+        self.watermark = (None, 0)                  # (max created_at, count) of BUY/SELL transactions
+        self.as_of: Optional[date] = None
+
+    def _load_history(self, symbols, start: date, end: date) -> pd.DataFrame:
+        if self._history_loader is not None:
+            return self._history_loader(symbols, start, end)
+        from services.price_history import get_history
+        return get_history(symbols, start, end)
+
+    # ---------------- transactions ----------------
+
+    def _watermark(self, session) -> tuple:
+        return tuple(session.execute(
+            select(func.max(Transaction.created_at), func.count())
+            .where(Transaction.operation.in_(["BUY", "SELL"]))
+        ).one())
+
+    def _transactions(self, session, since: Optional[date] = None) -> pd.DataFrame:
+        stmt = (
+            select(Transaction.broker, Transaction.ticker, Transaction.isin, Transaction.operation,
+                   Transaction.quantity, Transaction.price, Transaction.total_amount,
+                   Transaction.currency, Transaction.timestamp, Transaction.created_at)
+            .where(Transaction.operation.in_(["BUY", "SELL"]), Transaction.status != "CANCELLED")
+            .order_by(Transaction.timestamp, Transaction.id)
+        )
+        if since is not None:
+            stmt = stmt.where(Transaction.timestamp >= datetime.combine(since, datetime.min.time()))
+        rows = session.execute(stmt).all()
+        frame = pd.DataFrame(rows, columns=["broker", "ticker", "isin", "operation", "quantity", "price",
+                                            "total_amount", "currency", "timestamp", "created_at"])
+        if not frame.empty:
+            frame["day"] = pd.to_datetime([t.date() for t in frame["timestamp"]])
+        return frame
+
+    def _instrument(self, row, asset_types: dict) -> Instrument:
+        from services.analytics_service import normalize_ticker
+
+        key = (row.isin or row.ticker or "").strip().upper()
+        inst = self.instruments.get((row.broker, key))
+        if inst is None:
+            asset_type = "CRYPTO" if row.broker in CRYPTO_BROKERS else asset_types.get(key, "STOCK")
+            inst = Instrument(row.broker, key, normalize_ticker(key, asset_type),
+                              row.currency or "EUR", asset_type)
+            self.instruments[(row.broker, key)] = inst
+        return inst
+
+    def _asset_types(self, session) -> dict:
+        types = {}
+        for isin, ticker, asset_type in session.execute(select(Holding.isin, Holding.ticker, Holding.asset_type)):
+            for k in (isin, ticker):
+                if k and asset_type:
+                    types[k.strip().upper()] = asset_type
+        return types
+
+    # ---------------- replay ----------------
+
+    def _replay(self, txs: pd.DataFrame, start: pd.Timestamp, calendar: pd.DatetimeIndex,
+                fx: pd.DataFrame, asset_types: dict):
+        """
+        Replay `txs` (all trades from `start` on) on top of the state at start - 1 day.
+        Rows before `start` are kept.
+        """
+        # Bulk-resolve new ISINs once (cached in the symbology store) before mapping symbols
+        known = {key for _, key in self.instruments}
+        isins = {(r.isin or "").strip().upper() for r in txs.itertuples(index=False) if r.isin}
+        isins = [i for i in isins if len(i) == 12 and i not in known]
+        if isins:
+            from services.symbology_service import resolve_isins
+            resolve_isins(isins)
+
+        for row in txs.itertuples(index=False):
+            self._instrument(row, asset_types)
+        columns = list(self.instruments.values())
+
+        # Trade prices of the replayed days are rebuilt below
+        self.trade_prices = {k: v for k, v in self.trade_prices.items() if k[0] < start}
+
+        prev = start - pd.Timedelta(days=1)
+        if self.qty is not None and prev in self.qty.index:
+            head_qty = self.qty.loc[:prev].reindex(columns=columns, fill_value=0.0)
+            head_cost = self.cost.loc[:prev].reindex(columns=columns, fill_value=0.0)
+            qty_state = head_qty.iloc[-1].to_dict()
+            cost_state = head_cost.iloc[-1].to_dict()
+        else:
+            head_qty = head_cost = None
+            qty_state = defaultdict(float)
+            cost_state = defaultdict(float)
+
+        # Path-dependent part (average cost) is O(trades); the daily matrices are cumulative sums
+        dq, dc = defaultdict(float), defaultdict(float)
+        for row in txs.itertuples(index=False):
+            inst = self._instrument(row, asset_types)
+            qty = abs(float(row.quantity or 0))
+            held, cost = qty_state.get(inst, 0.0), cost_state.get(inst, 0.0)
+            if row.operation == "BUY":
+                rate = fx.at[row.day, inst.currency] if row.day in fx.index else 1.0
+                new_held, new_cost = held + qty, cost + abs(float(row.total_amount or 0)) * rate
+            else:
+                sold = min(qty, held)   # partial histories can't go short
+                new_held = held - sold
+                new_cost = cost - (cost / held * sold if held > QTY_EPSILON else 0.0)
+                if new_held <= QTY_EPSILON:
+                    new_held, new_cost = 0.0, 0.0
+            dq[(row.day, inst)] += new_held - held
+            dc[(row.day, inst)] += new_cost - cost
+            qty_state[inst], cost_state[inst] = new_held, new_cost
+            if row.price:
+                self.trade_prices[(row.day, inst)] = float(row.price)
+
+        tail_index = calendar[calendar >= start]
+        base_qty = head_qty.iloc[-1] if head_qty is not None else pd.Series(dtype=float)
+        base_cost = head_cost.iloc[-1] if head_cost is not None else pd.Series(dtype=float)
+
+        def cumulative(deltas: dict, base: pd.Series) -> pd.DataFrame:
+            frame = pd.DataFrame(0.0, index=tail_index, columns=columns)
+            if deltas:
+                d = pd.Series(deltas)
+                d.index = pd.MultiIndex.from_tuples(d.index)
+                frame = frame.add(d.unstack().reindex(index=tail_index, columns=columns, fill_value=0.0),
+                                  fill_value=0.0)
+            return frame.cumsum() + base.reindex(columns, fill_value=0.0)
+
+        tail_qty = cumulative(dq, base_qty)
+        tail_cost = cumulative(dc, base_cost)
+        self.qty = pd.concat([head_qty, tail_qty]) if head_qty is not None else tail_qty
+        self.cost = pd.concat([head_cost, tail_cost]) if head_cost is not None else tail_cost
+
+    # ---------------- valuation ----------------
+
+    def _value_rows(self, start: pd.Timestamp, calendar: pd.DatetimeIndex, fx: pd.DataFrame):
+        """Value the rows from `start` on; closes/FX are only loaded for fx.index (start - lookback)."""
+        columns = list(self.instruments.values())
+        trade_prices = pd.Series(self.trade_prices, dtype=float)
+        if not trade_prices.empty:
+            trade_prices.index = pd.MultiIndex.from_tuples(trade_prices.index)
+            trade_prices = trade_prices.unstack()
+        trade_prices = pd.DataFrame(trade_prices).reindex(index=calendar, columns=columns).ffill()
+
+        calendar = fx.index
+        prices = load_prices(columns, trade_prices.loc[calendar], calendar, self._load_history)
+        fx_cols = fx[[i.currency for i in columns]].to_numpy()
+
+        rows = calendar >= start
+        qty = self.qty.loc[calendar[rows], columns].to_numpy()
+        values = np.nan_to_num(qty * prices.loc[calendar[rows]].to_numpy() * fx_cols[rows])
+        cost = self.cost.loc[calendar[rows], columns].to_numpy()
+
+        series = pd.DataFrame({
+            "value": values.sum(axis=1),
+            "cost": cost.sum(axis=1),
+            "holdings_count": (qty > QTY_EPSILON).sum(axis=1),
+        }, index=calendar[rows])
+        series["pnl"] = series["value"] - series["cost"]
+        series["pnl_pct"] = np.where(series["cost"] > 0, series["pnl"] / series["cost"] * 100, 0.0)
+
+        brokers = np.array([i.broker for i in columns])
+        types = np.array([i.asset_type for i in columns])
+        by_broker = {b: values[:, brokers == b].sum(axis=1) for b in np.unique(brokers)}
+        by_type = {t: values[:, types == t].sum(axis=1) for t in np.unique(types)}
+        for n, ts in enumerate(calendar[rows]):
+            self.breakdowns[ts.date()] = (
+                {str(b): round(float(v[n]), 2) for b, v in by_broker.items() if v[n]},
+                {str(t): round(float(v[n]), 2) for t, v in by_type.items() if v[n]},
+            )
+
+        head = self.series.loc[:start - pd.Timedelta(days=1)] if self.series is not None else None
+        self.series = pd.concat([head, series]) if head is not None and not head.empty else series
+
+    # ---------------- public ----------------
+
+    def _replay_start(self, session, watermark: tuple) -> Optional[date]:
+        """Earliest trade date to replay (None: positions unchanged). Resets on deletions."""
+        if watermark == self.watermark:
+            return None
+        last_seen, seen_count = self.watermark
+        if self.qty is not None and last_seen is not None:
+            new_count, new_first = session.execute(
+                select(func.count(), func.min(Transaction.timestamp)).where(
+                    Transaction.operation.in_(["BUY", "SELL"]), Transaction.created_at > last_seen
+                )
+            ).one()
+            if seen_count + new_count == watermark[1]:
+                return new_first.date() if new_first else None
+
+        # First run, or transactions were deleted: full replay
+        self._reset()
+        first = session.execute(
+            select(func.min(Transaction.timestamp)).where(Transaction.operation.in_(["BUY", "SELL"]))
+        ).scalar()
+        return first.date() if first else None
+
+    def update(self, as_of: Optional[date] = None) -> pd.DataFrame:
+        """
+        Bring the NAV series up to `as_of` (default today): replay only from the earliest
+        trade date of new transactions, value only the rows that changed.
+        """
+        as_of = as_of or date.today()
+        with self._lock:
+            session = self._session_factory()
+            try:
+                watermark = self._watermark(session)
+                replay_from = self._replay_start(session, watermark)
+                txs = self._transactions(session, replay_from) if replay_from else None
+                asset_types = self._asset_types(session) if replay_from else {}
+            finally:
+                session.close()
+            self.watermark = watermark
+            if self.qty is None and replay_from is None:
+                return pd.DataFrame()   # no trades at all
+
+            first_day = self.qty.index[0].date() if self.qty is not None else replay_from
+            if replay_from:
+                first_day = min(first_day, replay_from)
+            calendar = _calendar(first_day, max(as_of, first_day))
+
+            # Rows to (re)value: from the replay start, and the last valued day (its close may have settled)
+            value_from = pd.Timestamp(replay_from) if replay_from else None
+            if self.series is not None and not self.series.empty:
+                last = self.series.index[-1]
+                value_from = min(value_from, last) if value_from is not None else last
+            value_from = value_from if value_from is not None else calendar[0]
+
+            # Closes/FX only for those rows (+ a lookback to carry the last quote forward)
+            window = calendar[calendar >= value_from - pd.Timedelta(days=PRICE_LOOKBACK_DAYS)]
+            currencies = {i.currency for i in self.instruments.values()}
+            if txs is not None and not txs.empty:
+                currencies |= set(txs["currency"].fillna("EUR"))
+            fx = load_fx(currencies, window, self._load_history)
+
+            if replay_from:
+                self._replay(txs, pd.Timestamp(replay_from), calendar, fx, asset_types)
+            # Carry positions forward to as_of
+            self.qty = self.qty.reindex(calendar).ffill()
+            self.cost = self.cost.reindex(calendar).ffill()
+
+            self._value_rows(value_from, calendar, fx)
+            self.as_of = as_of
+            logger.info(f"[NAV] {len(self.instruments)} instruments, {len(self.series)} days "
+                        f"(valued from {value_from.date()})")
+            return self.series
+
+    def backfill_snapshots(self, start: Optional[date] = None, overwrite: bool = False) -> int:
+        """
+        Write the reconstructed series into portfolio_snapshots (multi-row upserts).
+        Existing days are kept unless `overwrite` (live 22:00 snapshots stay authoritative).
+        """
+        series = self.update()
+        if series.empty:
+            return 0
+        if start:
+            series = series.loc[pd.Timestamp(start):]
+
+        rows = []
+        for ts, r in series.iterrows():
+            day = ts.date()
+            brokers, types = self.breakdowns.get(day, ({}, {}))
+            rows.append({
+                "snapshot_date": day,
+                "total_value": round(Decimal(str(r["value"])), 2),
+                "total_cost": round(Decimal(str(r["cost"])), 2),
+                "pnl_net": round(Decimal(str(r["pnl"])), 2),
+                "pnl_pct": round(Decimal(str(r["pnl_pct"])), 4),
+                "broker_breakdown": brokers,
+                "asset_breakdown": types,
+                "holdings_count": int(r["holdings_count"]),
+            })
+
+        session = self._session_factory()
+        try:
+            dialect = session.get_bind().dialect.name
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert
+            elif dialect == "sqlite":
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                raise NotImplementedError(f"Snapshot backfill not supported on {dialect}")
+
+            import uuid
+            for row in rows:
+                row["id"] = uuid.uuid4()
+            stmt = insert(PortfolioSnapshot.__table__)
+            if overwrite:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["snapshot_date"],
+                    set_={c: stmt.excluded[c] for c in rows[0] if c not in ("id", "snapshot_date")},
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=["snapshot_date"])
+            result = session.connection().execute(
+                stmt.execution_options(insertmanyvalues_page_size=SNAPSHOT_CHUNK), rows
+            )
+            session.commit()
+            written = result.rowcount if result.rowcount is not None and result.rowcount >= 0 else len(rows)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+        logger.info(f"[NAV] Backfilled portfolio_snapshots: {written}/{len(rows)} days written")
+        return written
+
+    def to_list(self, days: Optional[int] = None) -> List[Dict]:
+        series = self.update()
+        if days:
+            series = series.loc[pd.Timestamp(date.today() - timedelta(days=days)):]
+        return [
+            {"date": str(ts.date()), "value": round(float(r["value"]), 2), "cost": round(float(r["cost"]), 2),
+             "pnl_net": round(float(r["pnl"]), 2), "pnl_pct": round(float(r["pnl_pct"]), 4)}
+            for ts, r in series.iterrows()
+        ]
+
+
+# Singleton
+nav_engine = NavEngine()
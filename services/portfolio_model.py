@@ -0,0 +1,391 @@
+"""
+WAR ROOM - Portfolio Model
+In-process portfolio valuation served by /api/portfolio.
+
+- Keeps one valuation row per holding plus running broker / asset-type totals.
+- Updates only touch what changed:
+    apply_live_values()  price ticks for some holdings
+    refresh_fx()         re-values only holdings whose currency rate moved
+    sync_holdings()      after a transaction/import: diff against the DB, value only new/changed rows
+- Every effective change bumps a version; the serialized payload and its ETag are
+  cached per version (clients can send If-None-Match).
+- Persisted to data/portfolio_snapshot.json only when the version changes.
+"""
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PORTFOLIO_SNAPSHOT = Path(__file__).parent.parent / "data" / "portfolio_snapshot.json"
+
+# Rates shown by the frontend currency toggle (EUR base)
+DISPLAY_CURRENCIES = ("USD", "GBP", "CHF")
+
+# DB fields that change a holding's valuation (used to diff after transactions)
+HOLDING_FIELDS = (
+    "broker", "ticker", "isin", "asset_type", "quantity", "purchase_price",
+    "current_price", "current_value", "currency", "adr_ratio",
+)
+
+
+def value_row(h: dict, ld: dict) -> dict:
+    """Merge one holding with its live valuation (from get_live_values_for_holdings)."""
+    # Calculate fallback cost basis from DB
+    db_cost = float(h.get("quantity", 0) or 0) * float(h.get("purchase_price", 0) or 0)
+
+    row = {
+        **h,
+        "quantity": float(h.get("quantity", 0) or 0),
+        "live_price": ld.get("live_price") or h.get("current_price") or 0,
+        "current_value": ld.get("live_value") or h.get("current_value") or 0,
+        "cost_basis": ld.get("cost_basis") or db_cost,
+        "source": ld.get("source", "DB"),
+        "native_current_value": ld.get("native_current_value"),
+        "exchange_rate_used": ld.get("exchange_rate_used"),
+    }
+
+    # Recalculate P&L if not in ld or if we had to fallback to DB cost
+    if "pnl" in ld:
+        row["pnl"] = ld["pnl"]
+        row["pnl_pct"] = ld["pnl_pct"]
+    else:
+        row["pnl"] = row["current_value"] - row["cost_basis"]
+        row["pnl_pct"] = (row["pnl"] / row["cost_basis"] * 100) if row["cost_basis"] > 0 else 0
+
+    row["day_pl"] = ld.get("day_pl") or 0
+    row["day_change_pct"] = ld.get("day_change_pct") or 0
+    return row
+
+
+def _pct(part: float, base: float) -> float:
+    return (part / base * 100) if base > 0 else 0
+
+
+def _fetch_display_rates() -> dict:
+    try:
+        from services.forex_service import get_exchange_rate
+        rates = {"EUR": 1.0}
+        for currency in DISPLAY_CURRENCIES:
+            rates[currency] = float(get_exchange_rate("EUR", currency))
+        return rates
+    except Exception as e:
+        logger.warning(f"[PORTFOLIO] FX rate fetch error: {e}")
+        return {"EUR": 1.0, "USD": 1.05}  # Fallback
+
+
+class PortfolioModel:
+    def __init__(self, snapshot_path: Path = PORTFOLIO_SNAPSHOT):
+        self.snapshot_path = snapshot_path
+        self._lock = threading.RLock()
+        self._load_gate = threading.Lock()  # single flight for the warm start / first build
+        self._loaded = False
+
+        self.holdings: Dict[str, dict] = {}   # id -> DB holding
+        self.rows: Dict[str, dict] = {}       # id -> valuation row
+        self.broker_totals: Dict[str, dict] = {}
+        self.asset_totals: Dict[str, float] = {}
+        self.currency_rates: Dict[str, float] = {}  # holding currency -> EUR rate used for valuation
+        self.fx_rates: dict = {"EUR": 1.0}
+
+        self.version = 0
+        self.last_updated: Optional[str] = None   # last change of the data
+        self.refreshed_at: Optional[datetime] = None  # last refresh attempt (changed or not)
+        self._payload: Optional[Tuple[int, bytes, str]] = None
+
+    # ------------------------------------------------------------
+    # RUNNING AGGREGATES
+    # ------------------------------------------------------------
+
+    def _accumulate(self, row: dict, sign: int):
+        broker = self.broker_totals.setdefault(row["broker"], {"value": 0, "cost": 0, "day_pl": 0})
+        broker["value"] += sign * row["current_value"]
+        broker["cost"] += sign * row["cost_basis"]
+        broker["day_pl"] += sign * row["day_pl"]
+
+        atype = row.get("asset_type", "Unknown")
+        self.asset_totals[atype] = self.asset_totals.get(atype, 0) + sign * row["current_value"]
+
+    def _put_row(self, hid: str, row: dict) -> bool:
+        old = self.rows.get(hid)
+        if old == row:
+            return False
+        if old is not None:
+            self._accumulate(old, -1)
+        self.rows[hid] = row
+        self._accumulate(row, +1)
+        return True
+
+    def _drop_row(self, hid: str) -> bool:
+        old = self.rows.pop(hid, None)
+        if old is None:
+            return False
+        self._accumulate(old, -1)
+        return True
+
+    def _commit(self, changed: bool):
+        self.refreshed_at = datetime.now()
+        if changed:
+            self.version += 1
+            self.last_updated = self.refreshed_at.strftime("%Y-%m-%d %H:%M:%S")
+            self._payload = None
+        if changed or not self.snapshot_path.exists():
+            self._persist()
+
+    # ------------------------------------------------------------
+    # PAYLOAD / PERSISTENCE
+    # ------------------------------------------------------------
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            # Running totals keep brokers / asset types whose last holding was removed
+            brokers = {r["broker"] for r in self.rows.values()}
+            asset_types = {r.get("asset_type", "Unknown") for r in self.rows.values()}
+
+            broker_totals = {}
+            for name, b in self.broker_totals.items():
+                if name not in brokers:
+                    continue
+                pnl = b["value"] - b["cost"]
+                broker_totals[name] = {
+                    **b,
+                    "pnl": pnl,
+                    "pnl_pct": _pct(pnl, b["cost"]),
+                    "day_change_pct": _pct(b["day_pl"], b["value"] - b["day_pl"]),
+                }
+
+            total_value = sum(b["value"] for b in broker_totals.values())
+            total_cost = sum(b["cost"] for b in broker_totals.values())
+            total_day_pl = sum(r["day_pl"] for r in self.rows.values())
+            total_pnl = total_value - total_cost
+
+            return {
+                "holdings": list(self.rows.values()),
+                "broker_totals": broker_totals,
+                "asset_totals": {a: v for a, v in self.asset_totals.items() if a in asset_types},
+                "total_value": total_value,
+                "total_cost": total_cost,
+                "total_pnl": total_pnl,
+                "total_pnl_pct": _pct(total_pnl, total_cost),
+                "total_day_pl": total_day_pl,
+                "total_day_change_pct": _pct(total_day_pl, total_value - total_day_pl),
+                "count": len(self.rows),
+                "last_updated": self.last_updated,
+                "fx_rates": dict(self.fx_rates),
+                "version": self.version,
+            }
+
+    def payload(self) -> Tuple[bytes, str]:
+        """Serialized JSON of the current version and its ETag (cached per version)."""
+        with self._lock:
+            if self._payload is None or self._payload[0] != self.version:
+                body = json.dumps(self.to_dict(), default=str).encode("utf-8")
+                etag = f'"{self.version}-{hashlib.sha1(body).hexdigest()[:12]}"'
+                self._payload = (self.version, body, etag)
+            return self._payload[1], self._payload[2]
+
+    def _persist(self):
+        # Atomic write to prevent corruption
+        body, _ = self.payload()
+        temp_path = self.snapshot_path.with_suffix('.tmp')
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(body)
+            temp_path.replace(self.snapshot_path)
+        except Exception as e:
+            logger.error(f"[PORTFOLIO] Failed to save snapshot {self.snapshot_path}: {e}")
+            if temp_path.exists():
+                temp_path.unlink()
+
+    def _load_from_disk(self) -> Optional[bool]:
+        """
+        Warm start from the last persisted snapshot (prices refreshed later).
+        File and DB are read without the lock; it is only taken to install the rows.
+        Returns None if there is no usable snapshot, else whether the DB has holdings
+        the snapshot lacks (the caller syncs them once the model is serving).
+        """
+        if not self.snapshot_path.exists():
+            return None
+        try:
+            with open(self.snapshot_path, 'r') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"[PORTFOLIO] Unreadable snapshot, rebuilding: {e}")
+            return None
+
+        from services.portfolio_service import get_all_holdings
+        db_holdings = {h["id"]: h for h in get_all_holdings()}
+
+        with self._lock:
+            self.rows, self.broker_totals, self.asset_totals = {}, {}, {}
+            for row in data.get("holdings", []):
+                if row.get("id") in db_holdings:
+                    self._put_row(row["id"], row)
+            self.holdings = {hid: h for hid, h in db_holdings.items() if hid in self.rows}
+            self.fx_rates = data.get("fx_rates") or self.fx_rates
+            self.version = int(data.get("version") or 0)
+            self.last_updated = data.get("last_updated")
+            self.refreshed_at = None  # unknown age: let the caller refresh
+            self._payload = None
+            self._loaded = True
+            # Holdings added to the DB after the snapshot was written
+            return len(db_holdings) != len(self.rows)
+
+    # ------------------------------------------------------------
+    # UPDATES
+    # ------------------------------------------------------------
+
+    def rebuild(self) -> dict:
+        """Full recomputation (first start, manual refresh)."""
+        from services.portfolio_service import get_all_holdings
+        from services.price_service_v5 import get_live_values_for_holdings
+        from services.forex_service import get_rates_for_currencies
+
+        holdings = get_all_holdings()
+        live_data = get_live_values_for_holdings(holdings) if holdings else {}
+        currencies = {h.get("currency", "EUR") for h in holdings}
+        currency_rates = {c: float(r) for c, r in get_rates_for_currencies(list(currencies)).items()}
+        fx_rates = _fetch_display_rates()
+
+        with self._lock:
+            self.holdings = {h["id"]: h for h in holdings}
+            self.rows, self.broker_totals, self.asset_totals = {}, {}, {}
+            for h in holdings:
+                self._put_row(h["id"], value_row(h, live_data.get(h["id"], {})))
+            self.currency_rates = currency_rates
+            self.fx_rates = fx_rates
+            self._loaded = True
+            self._commit(True)
+        return self.to_dict()
+
+    def apply_live_values(self, live_data: dict) -> int:
+        """Price tick: re-value the given holdings (id -> live values). Returns rows changed."""
+        changed = 0
+        with self._lock:
+            for hid, ld in live_data.items():
+                h = self.holdings.get(hid)
+                if h is not None and self._put_row(hid, value_row(h, ld)):
+                    changed += 1
+            self._commit(changed > 0)
+        return changed
+
+    def refresh_prices(self, holding_ids: List[str] = None) -> int:
+        """Fetch live values (quote cache aware) for some/all holdings and apply them."""
+        from services.price_service_v5 import get_live_values_for_holdings
+
+        with self._lock:
+            ids = holding_ids if holding_ids is not None else list(self.holdings)
+            holdings = [self.holdings[i] for i in ids if i in self.holdings]
+        if not holdings:
+            self._commit(False)
+            return 0
+        return self.apply_live_values(get_live_values_for_holdings(holdings))
+
+    def refresh_fx(self) -> int:
+        """Re-value only holdings whose currency rate moved; update the display rates."""
+        from services.forex_service import get_rates_for_currencies
+
+        with self._lock:
+            currencies = {h.get("currency", "EUR") for h in self.holdings.values()}
+        rates = {c: float(r) for c, r in get_rates_for_currencies(list(currencies)).items()}
+        display = _fetch_display_rates()
+
+        with self._lock:
+            moved = {c for c, r in rates.items() if self.currency_rates.get(c) != r}
+            self.currency_rates.update(rates)
+            display_changed = display != self.fx_rates
+            self.fx_rates = display
+            ids = [hid for hid, h in self.holdings.items() if h.get("currency", "EUR") in moved]
+
+        changed = self.refresh_prices(ids) if ids else 0
+        if display_changed and not changed:
+            with self._lock:
+                self._commit(True)
+        return changed
+
+    def sync_holdings(self) -> int:
+        """
+        After a transaction / import: diff DB holdings against the model and
+        value only added or changed holdings. Returns the number of rows touched.
+        """
+        from services.portfolio_service import get_all_holdings
+        from services.price_service_v5 import get_live_values_for_holdings
+
+        db_holdings = {h["id"]: h for h in get_all_holdings()}
+
+        def fingerprint(h):
+            return tuple(h.get(f) for f in HOLDING_FIELDS)
+
+        with self._lock:
+            removed = [hid for hid in self.rows if hid not in db_holdings]
+            dirty = [
+                h for hid, h in db_holdings.items()
+                if hid not in self.rows or fingerprint(h) != fingerprint(self.holdings.get(hid, {}))
+            ]
+
+        live_data = get_live_values_for_holdings(dirty) if dirty else {}
+
+        with self._lock:
+            touched = sum(1 for hid in removed if self._drop_row(hid))
+            for hid in removed:
+                self.holdings.pop(hid, None)
+            for h in dirty:
+                self.holdings[h["id"]] = h
+                if self._put_row(h["id"], value_row(h, live_data.get(h["id"], {}))):
+                    touched += 1
+            self._commit(touched > 0)
+        if touched:
+            logger.info(f"[PORTFOLIO] Synced holdings: {len(removed)} removed, {len(dirty)} added/changed")
+        return touched
+
+    # ------------------------------------------------------------
+    # ACCESS
+    # ------------------------------------------------------------
+
+    def ensure_loaded(self):
+        """Warm start from disk, or build synchronously on the very first run."""
+        if self._loaded:
+            if not self.snapshot_path.exists():
+                # Ingestion scripts delete the snapshot to signal that the DB changed
+                logger.info("[PORTFOLIO] Snapshot removed externally, syncing holdings...")
+                self.sync_holdings()
+            return
+        # Concurrent first requests wait here for ONE load/build; price ticks and
+        # readers of an already loaded model only ever take _lock
+        with self._load_gate:
+            if self._loaded:
+                return
+            stale = self._load_from_disk()
+            if stale is None:
+                logger.info("[PORTFOLIO] First run: building portfolio synchronously...")
+                self.rebuild()
+                return
+        if stale:
+            self.sync_holdings()  # catch-up quotes fetched outside both locks
+
+    def invalidate(self):
+        """
+        Holdings changed in the DB. In the API process the model re-syncs now;
+        elsewhere (ingestion scripts) the snapshot file is removed, which the
+        API process picks up on its next request.
+        """
+        if self._loaded:
+            self.sync_holdings()
+        elif self.snapshot_path.exists():
+            try:
+                self.snapshot_path.unlink()
+            except Exception as e:
+                logger.warning(f"[PORTFOLIO] Failed to remove snapshot: {e}")
+
+    def age_seconds(self) -> float:
+        """Seconds since the last refresh (inf if never refreshed in this process)."""
+        if self.refreshed_at is None:
+            return float("inf")
+        return (datetime.now() - self.refreshed_at).total_seconds()
+
+
+portfolio_model = PortfolioModel()
@@ -4,64 +4,60 @@ Queries data from the new holdings-based schema.
 """
 from decimal import Decimal
 from typing import Dict, List, Optional
-from sqlalchemy import func
-from db.database import SessionLocal
+from sqlalchemy import func, literal, select, tuple_, union_all
+from db.database import acquire_session, session_scope
 from db.models import Holding, Transaction
 
+# Columns returned by get_all_holdings (projection, no ORM hydration)
+HOLDING_COLUMNS = (
+    Holding.id, Holding.broker, Holding.ticker, Holding.isin, Holding.name, Holding.asset_type,
+    Holding.quantity, Holding.current_price, Holding.purchase_price, Holding.current_value,
+    Holding.currency, Holding.source_document, Holding.last_updated,
+    Holding.share_class, Holding.adr_ratio, Holding.nominal_value, Holding.market,
+)
+
+# grouping(broker, asset_type, currency) bitmask -> dimension of the GROUPING SETS row
+_GROUPING_DIMENSION = {7: "total", 3: "by_broker", 5: "by_asset_type", 6: "by_currency"}
+
+
+def _pct(value: Decimal, total: Decimal) -> float:
+    return round(float(value / total) * 100, 2) if total else 0.0
+
 
 class PortfolioService:
     """
     Service for portfolio analytics using the new schema.
+    Uses the request's shared session when called inside db.database.request_session().
     """
     
-    def __init__(self):
-        self.session = SessionLocal()
+    def __init__(self, session=None):
+        if session is not None:
+            self.session, self._owned = session, False
+        else:
+            self.session, self._owned = acquire_session()
     
     def close(self):
-        self.session.close()
+        if self._owned:
+            self.session.close()
 
     def get_anonymous_portfolio_context(self) -> dict:
         """
         Generates an anonymized (percentage-based) portfolio summary for AI Council.
         Masks absolute Euro values.
         """
-        total_value = self.get_total_value()
+        agg = self.get_aggregates(top_n=15)
+        total_value = agg["total_value"]
         if total_value == 0:
             return {"error": "Portfolio is empty"}
 
-        holdings = self.session.query(Holding).all()
-        
-        # 1. Asset Allocation (by Type)
-        by_type_raw = self.get_value_by_asset_type()
-        allocation = {k: round(float(v / total_value) * 100, 2) for k, v in by_type_raw.items()}
-        
-        # 2. Top Positions (by Weight)
-        positions = []
-        for h in holdings:
-            weight = (h.current_value / total_value) * 100
-            positions.append({
-                "ticker": h.ticker,
-                "name": h.name,
-                "type": h.asset_type,
-                "weight_pct": round(float(weight), 2)
-            })
-        
-        # Sort by weight desc and take top 15
-        positions.sort(key=lambda x: x['weight_pct'], reverse=True)
-        top_positions = positions[:15]
-        
-        # 3. Currency Exposure
-        currencies = {}
-        for h in holdings:
-            curr = h.currency
-            currencies[curr] = currencies.get(curr, 0) + h.current_value
-        currency_exposure = {k: round(float(v / total_value) * 100, 2) for k, v in currencies.items()}
-
         return {
             "total_value_masked": "CONFIDENTIAL",
-            "allocation": allocation,
-            "currency_exposure": currency_exposure,
-            "top_holdings": top_positions,
+            "allocation": {k: _pct(v, total_value) for k, v in agg["by_asset_type"].items()},
+            "currency_exposure": {k: _pct(v, total_value) for k, v in agg["by_currency"].items()},
+            "top_holdings": [
+                {"ticker": p["ticker"], "name": p["name"], "type": p["asset_type"], "weight_pct": p["weight_pct"]}
+                for p in agg["top_holdings"]
+            ],
             "note": "Values are percentage weights of Total Portfolio."
         }
     
@@ -69,6 +65,77 @@ class PortfolioService:
     # AGGREGATES
     # =========================================
     
+    def get_aggregates(self, top_n: int = 15) -> dict:
+        """
+        Totals, value by broker / asset type / currency and the top-N positions
+        by weight, in ONE round-trip:
+            GROUPING SETS ((), (broker), (asset_type), (currency))
+            UNION ALL
+            top-N holdings ranked with ROW_NUMBER() OVER (ORDER BY current_value DESC)
+        """
+        grouped = select(
+            func.grouping(Holding.broker, Holding.asset_type, Holding.currency).label("g"),
+            Holding.broker.label("k1"),
+            Holding.asset_type.label("k2"),
+            Holding.currency.label("k3"),
+            func.sum(Holding.current_value).label("value"),
+            func.count().label("n"),
+        ).group_by(func.grouping_sets(
+            tuple_(), tuple_(Holding.broker), tuple_(Holding.asset_type), tuple_(Holding.currency)
+        ))
+
+        stmt = grouped
+        if top_n > 0:
+            ranked = select(
+                Holding.ticker, Holding.name, Holding.asset_type, Holding.current_value,
+                func.row_number().over(order_by=(Holding.current_value.desc(), Holding.ticker)).label("rn"),
+            ).subquery()
+            # Top rows are tagged with g = -rank
+            top = select(
+                (-ranked.c.rn).label("g"),
+                ranked.c.ticker.label("k1"),
+                ranked.c.asset_type.label("k2"),
+                ranked.c.name.label("k3"),
+                ranked.c.current_value.label("value"),
+                literal(1).label("n"),
+            ).where(ranked.c.rn <= top_n)
+            stmt = union_all(grouped, top)
+
+        result = {
+            "total_value": Decimal("0"),
+            "holdings_count": 0,
+            "by_broker": {},
+            "by_asset_type": {},
+            "by_currency": {},
+            "top_holdings": [],
+        }
+        top_rows = []
+        for row in self.session.execute(stmt):
+            if row.g < 0:
+                top_rows.append(row)
+                continue
+            dimension = _GROUPING_DIMENSION.get(row.g)
+            if dimension == "total":
+                result["total_value"] = row.value or Decimal("0")
+                result["holdings_count"] = row.n
+            elif dimension == "by_broker":
+                result["by_broker"][row.k1] = row.value or Decimal("0")
+            elif dimension == "by_asset_type":
+                result["by_asset_type"][row.k2] = row.value or Decimal("0")
+            elif dimension == "by_currency":
+                result["by_currency"][row.k3] = row.value or Decimal("0")
+
+        total = result["total_value"]
+        for row in sorted(top_rows, key=lambda r: -r.g):
+            result["top_holdings"].append({
+                "ticker": row.k1,
+                "name": row.k3,
+                "asset_type": row.k2,
+                "value": row.value,
+                "weight_pct": _pct(row.value, total),
+            })
+        return result
+    
     def get_total_value(self) -> Decimal:
         """Get total portfolio value across all brokers."""
         result = self.session.query(
@@ -100,7 +167,7 @@ class PortfolioService:
     
     def get_all_holdings(self) -> List[dict]:
         """Get all holdings as list of dicts."""
-        holdings = self.session.query(Holding).all()
+        holdings = self.session.execute(select(*HOLDING_COLUMNS)).all()
         return [
             {
                 "id": str(h.id),
@@ -126,8 +193,8 @@ class PortfolioService:
     
     def get_holdings_by_broker(self, broker: str) -> List[dict]:
         """Get holdings for a specific broker."""
-        holdings = self.session.query(Holding).filter(
-            Holding.broker == broker
+        holdings = self.session.execute(
+            select(*HOLDING_COLUMNS).where(Holding.broker == broker)
         ).all()
         return [
             {
@@ -157,20 +224,16 @@ class PortfolioService:
     # =========================================
     
     def get_portfolio_summary(self) -> dict:
-        """Get complete portfolio summary."""
-        total_value = self.get_total_value()
-        by_broker = self.get_value_by_broker()
-        by_type = self.get_value_by_asset_type()
-        holdings_count = self.get_holdings_count()
-        brokers = self.get_brokers()
+        """Get complete portfolio summary (single aggregation query)."""
+        agg = self.get_aggregates(top_n=0)
         
         return {
-            "total_value": float(total_value),
-            "holdings_count": holdings_count,
-            "brokers_count": len(brokers),
-            "brokers": brokers,
-            "by_broker": {k: float(v) for k, v in by_broker.items()},
-            "by_asset_type": {k: float(v) for k, v in by_type.items()},
+            "total_value": float(agg["total_value"]),
+            "holdings_count": agg["holdings_count"],
+            "brokers_count": len(agg["by_broker"]),
+            "brokers": list(agg["by_broker"]),
+            "by_broker": {k: float(v) for k, v in agg["by_broker"].items()},
+            "by_asset_type": {k: float(v) for k, v in agg["by_asset_type"].items()},
         }
 
 
@@ -180,31 +243,22 @@ class PortfolioService:
 
 def get_portfolio_summary() -> dict:
     """Convenience function to get portfolio summary."""
-    service = PortfolioService()
-    summary = service.get_portfolio_summary()
-    service.close()
-    return summary
+    with session_scope() as session:
+        return PortfolioService(session).get_portfolio_summary()
 
 
 def get_all_holdings() -> List[dict]:
     """Convenience function to get all holdings."""
-    service = PortfolioService()
-    holdings = service.get_all_holdings()
-    service.close()
-    return holdings
+    with session_scope() as session:
+        return PortfolioService(session).get_all_holdings()
 
 
 def get_holdings_by_broker(broker: str) -> List[dict]:
     """Convenience function to get holdings for a broker."""
-    service = PortfolioService()
-    holdings = service.get_holdings_by_broker(broker)
-    service.close()
-    return holdings
+    with session_scope() as session:
+        return PortfolioService(session).get_holdings_by_broker(broker)
 
 def get_anonymous_portfolio_context() -> dict:
     """Convenience function for Council Context."""
-    service = PortfolioService()
-    ctx = service.get_anonymous_portfolio_context()
-    service.close()
-    return ctx
-
+    with session_scope() as session:
+        return PortfolioService(session).get_anonymous_portfolio_context()
@@ -0,0 +1,300 @@
+"""
+WAR ROOM - Price History Store
+Local daily OHLC time-series cache (price_history table, PK symbol + date).
+
+- get_history(symbols, start, end) serves slices from the DB. Only the dates
+  outside each symbol's downloaded range (price_history_ranges) are fetched
+  from Yahoo, in ONE batched yf.download per distinct missing range.
+  Downloads lock only the symbols being fetched; covered reads never wait.
+- Today's bar is still moving: a range ending today is topped up again once
+  PRICE_HISTORY_TTL_MINUTES have passed.
+- top_up() extends every stored symbol to today; the scheduler runs it nightly.
+
+Shared by benchmarks, correlation, risk metrics and backtests.
+"""
+import os
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import select
+
+from db.database import SessionLocal
+from db.models import PriceHistory, PriceHistoryRange
+
+logger = logging.getLogger(__name__)
+
+PRICE_HISTORY_TTL = timedelta(minutes=int(os.getenv("PRICE_HISTORY_TTL_MINUTES", "360")))
+DOWNLOAD_BATCH = int(os.getenv("PRICE_HISTORY_BATCH", "50"))   # symbols per yf.download call
+DOWNLOAD_TIMEOUT = 20
+TAIL_GRACE_DAYS = 4
+FIELDS = ("open", "high", "low", "close", "volume")
+
+# Per-symbol download locks: a request only waits for in-flight downloads of the
+# symbols it is itself missing; reads with nothing missing never wait
+_symbol_locks: Dict[str, threading.Lock] = {}
+_symbol_locks_guard = threading.Lock()
+
+
+# ============================================================
+# MISSING RANGES
+# ============================================================
+
+def _missing_ranges(coverage: Optional[PriceHistoryRange], start: date, end: date,
+                    now: datetime) -> List[Tuple[date, date]]:
+    """Date ranges (inclusive) of [start, end] not downloaded yet for one symbol."""
+    if coverage is None or coverage.first_date is None:
+        if coverage is not None and now - coverage.fetched_at < PRICE_HISTORY_TTL:
+            return []   # Yahoo had nothing recently: don't hammer it
+        return [(start, end)]
+
+    ranges = []
+    if start < coverage.first_date:
+        ranges.append((start, coverage.first_date - timedelta(days=1)))
+    if end > coverage.last_date or end == now.date():
+        lo = min(coverage.last_date + timedelta(days=1), end)
+        # Short tails (weekend, holidays, today's moving bar) are re-asked at most once per TTL
+        if (end - lo).days > TAIL_GRACE_DAYS or now - coverage.fetched_at >= PRICE_HISTORY_TTL:
+            ranges.append((lo, end))
+    return ranges
+
+
+def _download(symbols: List[str], start: date, end: date) -> Dict[str, pd.DataFrame]:
+    """One yf.download for many symbols -> {symbol: DataFrame[open..volume]} (empty symbols omitted)."""
+    import yfinance as yf
+
+    data = yf.download(
+        symbols,
+        start=start,
+        end=end + timedelta(days=1),  # yfinance end is exclusive
+        progress=False,
+        auto_adjust=True,
+        threads=False,  # Critical for backend stability
+        group_by="ticker",
+        timeout=DOWNLOAD_TIMEOUT,
+    )
+    frames = {}
+    if data is None or data.empty:
+        return frames
+
+    for symbol in symbols:
+        if isinstance(data.columns, pd.MultiIndex):
+            if symbol not in data.columns.get_level_values(0):
+                continue
+            frame = data[symbol]
+        else:
+            frame = data
+        frame = frame.rename(columns=str.lower).dropna(subset=["close"])
+        if not frame.empty:
+            frames[symbol] = frame
+    return frames
+
+
+def _upsert_bars(session, symbol: str, frame: pd.DataFrame):
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Price history upsert not supported on {dialect}")
+
+    rows = []
+    for idx, bar in frame.iterrows():
+        row = {"symbol": symbol, "date": idx.date() if hasattr(idx, "date") else idx}
+        for f in FIELDS:
+            value = bar.get(f)
+            row[f] = None if value is None or pd.isna(value) else float(value)
+        rows.append(row)
+
+    stmt = insert(PriceHistory.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["symbol", "date"],
+        set_={f: stmt.excluded[f] for f in FIELDS},
+    )
+    session.execute(stmt, rows)
+
+
+# ============================================================
+# FETCH
+# ============================================================
+
+@contextmanager
+def _symbols_locked(symbols: List[str]):
+    """Hold the download locks of `symbols` (taken in sorted order: no lock cycles)."""
+    with _symbol_locks_guard:
+        locks = [_symbol_locks.setdefault(s, threading.Lock()) for s in sorted(symbols)]
+    for lock in locks:
+        lock.acquire()
+    try:
+        yield
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+
+
+def _plan(session, symbols: List[str], start: date, end: date,
+          now: datetime) -> Tuple[dict, Dict[Tuple[date, date], List[str]]]:
+    """Coverage rows and symbols grouped by missing range: one download per (range, batch)."""
+    coverage = {
+        c.symbol: c for c in session.execute(
+            select(PriceHistoryRange).where(PriceHistoryRange.symbol.in_(symbols))
+        ).scalars()
+    }
+    wanted: Dict[Tuple[date, date], List[str]] = {}
+    for symbol in symbols:
+        for rng in _missing_ranges(coverage.get(symbol), start, end, now):
+            wanted.setdefault(rng, []).append(symbol)
+    return coverage, wanted
+
+
+def _fetch_batch(batch: List[str], start: date, end: date, session_factory) -> set:
+    """
+    Download the missing ranges of one batch (caller holds its symbol locks).
+    Coverage is re-read first: a concurrent request may have fetched them meanwhile.
+    """
+    session = session_factory()
+    try:
+        now = datetime.now()
+        coverage, wanted = _plan(session, batch, start, end, now)
+        fetched = set()
+        for (lo, hi), group in wanted.items():
+            try:
+                frames = _download(group, lo, hi)
+            except Exception as e:
+                logger.error(f"[PRICE_HISTORY] Download {lo}..{hi} failed for {len(group)} symbols: {e}")
+                continue
+
+            for symbol in group:
+                fetched.add(symbol)
+                frame = frames.get(symbol)
+                if frame is not None:
+                    _upsert_bars(session, symbol, frame)
+                _extend_coverage(session, coverage, symbol, lo, hi, frame is not None, bool(frames), now)
+
+        session.commit()
+        return fetched
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def ensure_history(symbols: Iterable[str], start: date, end: Optional[date] = None,
+                   session_factory=SessionLocal) -> int:
+    """
+    Download whatever part of [start, end] is missing for `symbols`.
+    Returns the number of symbols that needed a download.
+    """
+    symbols = sorted({s for s in symbols if s})
+    end = min(end or date.today(), date.today())
+    if not symbols or start > end:
+        return 0
+
+    # Plan without any lock: fully covered requests return straight away
+    session = session_factory()
+    try:
+        _, wanted = _plan(session, symbols, start, end, datetime.now())
+    finally:
+        session.close()
+    if not wanted:
+        return 0
+
+    fetched = set()
+    for group in wanted.values():
+        for i in range(0, len(group), DOWNLOAD_BATCH):
+            batch = [s for s in group[i:i + DOWNLOAD_BATCH] if s not in fetched]
+            if not batch:
+                continue  # already fetched with another range of the same call
+            with _symbols_locked(batch):
+                fetched |= _fetch_batch(batch, start, end, session_factory)
+
+    logger.info(f"[PRICE_HISTORY] Downloaded {len(fetched)} symbols over {len(wanted)} range(s)")
+    return len(fetched)
+
+
+def _extend_coverage(session, coverage: dict, symbol: str, lo: date, hi: date,
+                     has_data: bool, reachable: bool, now: datetime):
+    entry = coverage.get(symbol)
+    if entry is None:
+        entry = PriceHistoryRange(symbol=symbol, fetched_at=now)
+        session.add(entry)
+        coverage[symbol] = entry
+    entry.fetched_at = now
+    if entry.first_date is None:
+        if has_data:
+            entry.first_date, entry.last_date = lo, hi
+        return
+    if not has_data and not reachable:
+        return  # Nothing came back for the whole batch: maybe Yahoo, not the calendar
+    # Ranges are adjacent to the known one: an empty answer (holidays, pre-listing) still covers it
+    entry.first_date = min(entry.first_date, lo)
+    entry.last_date = max(entry.last_date, hi)
+
+
+# ============================================================
+# READ
+# ============================================================
+
+def get_history(symbols: Iterable[str], start: date, end: Optional[date] = None,
+                field: str = "close", session_factory=SessionLocal) -> pd.DataFrame:
+    """
+    Daily `field` for `symbols` between start and end (inclusive), fetching gaps first.
+    Returns a DataFrame indexed by date (DatetimeIndex), one column per symbol with data.
+    """
+    if field not in FIELDS:
+        raise ValueError(f"Unknown price field: {field}")
+    symbols = list(dict.fromkeys(s for s in symbols if s))
+    end = end or date.today()
+    if not symbols:
+        return pd.DataFrame()
+
+    try:
+        ensure_history(symbols, start, end, session_factory=session_factory)
+    except Exception as e:
+        logger.error(f"[PRICE_HISTORY] Top-up failed, serving stored data: {e}")
+
+    session = session_factory()
+    try:
+        column = getattr(PriceHistory, field)
+        rows = session.execute(
+            select(PriceHistory.date, PriceHistory.symbol, column)
+            .where(PriceHistory.symbol.in_(symbols), PriceHistory.date.between(start, end))
+            .order_by(PriceHistory.date)
+        ).all()
+    finally:
+        session.close()
+
+    if not rows:
+        return pd.DataFrame()
+    frame = pd.DataFrame(rows, columns=["date", "symbol", field])
+    frame["date"] = pd.to_datetime(frame["date"])
+    table = frame.pivot(index="date", columns="symbol", values=field)
+    return table[[s for s in symbols if s in table.columns]]
+
+
+def tracked_symbols(session_factory=SessionLocal) -> List[str]:
+    session = session_factory()
+    try:
+        return list(session.execute(select(PriceHistoryRange.symbol)).scalars())
+    finally:
+        session.close()
+
+
+def top_up(extra_symbols: Iterable[str] = (), lookback_days: int = 365,
+           session_factory=SessionLocal) -> int:
+    """
+    Nightly job: extend every stored symbol (plus `extra_symbols`) to today.
+    New symbols start `lookback_days` back.
+    """
+    known = set(tracked_symbols(session_factory))
+    new = set(extra_symbols) - known
+    # Known symbols only miss their tail: start=today keeps ensure_history from back-filling them
+    count = ensure_history(known, date.today(), session_factory=session_factory)
+    count += ensure_history(new, date.today() - timedelta(days=lookback_days), session_factory=session_factory)
+    logger.info(f"[PRICE_HISTORY] Nightly top-up: {len(known)} stored + {len(new)} new symbols, {count} downloaded")
+    return count
@@ -15,6 +15,11 @@ import sys
 from pathlib import Path
 from decimal import Decimal
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import sqlite3
+import atexit
+import time
 import requests
 import logging
 import json
@@ -26,72 +31,208 @@ logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger(__name__)
 
 # ============================================================
-# CACHE (10 minutes TTL, File Persistent)
+# CACHE (10 minutes TTL, write-behind to SQLite)
 # ============================================================
-CACHE_FILE = os.path.join(str(Path(__file__).parent.parent), "data", "prices_cache.json")
+# The in-memory dict is authoritative. _set_cached only marks keys dirty;
+# flush_price_cache() writes the dirty entries in one SQLite transaction,
+# either from the background flusher (every CACHE_FLUSH_INTERVAL seconds)
+# or explicitly at the end of a refresh.
+CACHE_FILE = os.path.join(str(Path(__file__).parent.parent), "data", "prices_cache.json")  # Legacy, migrated once
+CACHE_DB = os.path.join(str(Path(__file__).parent.parent), "data", "prices_cache.db")
+CACHE_FLUSH_INTERVAL = 30  # seconds
 _cache_ttl = timedelta(minutes=10)
 
+_cache_lock = threading.RLock()  # Quote workers, refresher thread and API requests share the caches
+_dirty_keys = set()
+_flush_lock = threading.Lock()
+_flusher_started = False
+
+
+def _connect_cache_db():
+    os.makedirs(os.path.dirname(CACHE_DB), exist_ok=True)
+    conn = sqlite3.connect(CACHE_DB, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS price_cache ("
+        " key TEXT PRIMARY KEY,"
+        " price TEXT NOT NULL,"
+        " ts REAL NOT NULL,"
+        " change_pct REAL NOT NULL DEFAULT 0)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_price_cache_ts ON price_cache (ts)")
+    return conn
+
+
+def _load_legacy_json_cache() -> dict:
+    """Read the old prices_cache.json (pre-SQLite format)."""
+    loaded = {}
+    try:
+        with open(CACHE_FILE, 'r') as f:
+            data = json.load(f)
+        for k, v in data.items():
+            # Format: [value_float, timestamp_iso, change_pct_float]
+            # Backwards compatibility: if list len is 2, change_pct = 0.0
+            change_pct = v[2] if len(v) > 2 else 0.0
+            loaded[k] = (Decimal(str(v[0])), datetime.fromisoformat(v[1]), float(change_pct))
+    except Exception as e:
+        logger.warning(f"Failed to read legacy price cache: {e}")
+    return loaded
+
+
 def _load_cache_from_disk():
-    """Load cache from JSON file, converting types back."""
-    if os.path.exists(CACHE_FILE):
+    """Load only the still-fresh entries from the SQLite store."""
+    migrate = not os.path.exists(CACHE_DB) and os.path.exists(CACHE_FILE)
+    try:
+        conn = _connect_cache_db()
         try:
-            with open(CACHE_FILE, 'r') as f:
-                data = json.load(f)
-                loaded = {}
-                for k, v in data.items():
-                    # Format: [value_float, timestamp_iso, change_pct_float]
-                    # Backwards compatibility: if list len is 2, change_pct = 0.0
-                    val = v[0]
-                    ts_str = v[1]
-                    change_pct = v[2] if len(v) > 2 else 0.0
-                    
-                    loaded[k] = (Decimal(str(val)), datetime.fromisoformat(ts_str), float(change_pct))
-                return loaded
-        except Exception as e:
-            logger.warning(f"Failed to load price cache: {e}")
+            if migrate:
+                legacy = _load_legacy_json_cache()
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO price_cache (key, price, ts, change_pct) VALUES (?, ?, ?, ?)",
+                        [(k, str(v), ts.timestamp(), float(c)) for k, (v, ts, c) in legacy.items()]
+                    )
+                logger.info(f"Migrated {len(legacy)} entries from {CACHE_FILE}")
+            
+            min_ts = (datetime.now() - _cache_ttl).timestamp()
+            rows = conn.execute(
+                "SELECT key, price, ts, change_pct FROM price_cache WHERE ts >= ?", (min_ts,)
+            ).fetchall()
+        finally:
+            conn.close()
+        return {k: (Decimal(p), datetime.fromtimestamp(ts), float(c)) for k, p, ts, c in rows}
+    except Exception as e:
+        logger.warning(f"Failed to load price cache: {e}")
     return {}
 
-def _save_cache_to_disk(cache):
-    """Save cache to JSON file, serializing types."""
-    try:
-        data = {}
-        for k, v in cache.items():
-            val, ts, change_pct = v
-            # Store as float for JSON, ISO for datetime
-            data[k] = (float(val), ts.isoformat(), float(change_pct))
-        
-        # Ensure dir
-        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
-        with open(CACHE_FILE, 'w') as f:
-            json.dump(data, f)
-    except Exception as e:
-        logger.warning(f"Failed to save price cache: {e}")
+
+def flush_price_cache():
+    """
+    Persist dirty price entries in a single atomic transaction.
+    Also prunes rows that can no longer be served (older than the TTL).
+    Only the snapshot of the dirty rows is taken under _cache_lock: the SQLite
+    write runs outside it, so quote workers never wait on disk I/O.
+    Returns the number of entries written.
+    """
+    # Serializes flushers (background thread, atexit) so an older snapshot never lands last
+    with _flush_lock:
+        with _cache_lock:
+            if not _dirty_keys:
+                return 0
+            keys = set(_dirty_keys)
+            _dirty_keys.clear()
+            rows = []
+            for k in keys:
+                entry = _price_cache.get(k)
+                if entry:
+                    val, ts, change_pct = entry
+                    rows.append((k, str(val), ts.timestamp(), float(change_pct)))
+        try:
+            conn = _connect_cache_db()
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO price_cache (key, price, ts, change_pct) VALUES (?, ?, ?, ?)",
+                        rows
+                    )
+                    conn.execute(
+                        "DELETE FROM price_cache WHERE ts < ?",
+                        ((datetime.now() - _cache_ttl).timestamp(),)
+                    )
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.warning(f"Failed to save price cache: {e}")
+            with _cache_lock:
+                _dirty_keys.update(keys)  # retried on the next flush
+            return 0
+    return len(rows)
+
+
+def _background_flusher():
+    while True:
+        time.sleep(CACHE_FLUSH_INTERVAL)
+        flush_price_cache()
+
+
+def _ensure_flusher():
+    global _flusher_started
+    if _flusher_started:
+        return
+    _flusher_started = True
+    threading.Thread(target=_background_flusher, name="price-cache-flusher", daemon=True).start()
+    atexit.register(flush_price_cache)
+
 
 _price_cache = _load_cache_from_disk()
-_figi_cache = {}  # Keep in-memory only for now
 
 def _get_cached(cache: dict, key: str):
-    if key in cache:
-        value, ts, change_pct = cache[key]
+    entry = cache.get(key)
+    if entry:
+        value, ts, change_pct = entry
         if datetime.now() - ts < _cache_ttl:
             return value, change_pct
         else:
             # Expired
-            del cache[key]
+            cache.pop(key, None)
     return None, 0.0
 
 
 def _set_cached(cache: dict, key: str, value, change_pct=0.0):
-    cache[key] = (value, datetime.now(), change_pct)
-    # Persist only price cache
-    if cache is _price_cache:
-        _save_cache_to_disk(cache)
+    with _cache_lock:
+        cache[key] = (value, datetime.now(), change_pct)
+        # Persist only price cache (write-behind)
+        if cache is _price_cache:
+            _dirty_keys.add(key)
+            _ensure_flusher()
 
 
 def clear_cache():
-    """Clear all caches."""
-    _price_cache.clear()
-    _figi_cache.clear()
+    """Clear all caches (memory and the persisted price store)."""
+    with _flush_lock, _cache_lock:  # no in-flight flush can re-write cleared rows
+        _price_cache.clear()
+        _dirty_keys.clear()
+        try:
+            conn = _connect_cache_db()
+            try:
+                with conn:
+                    conn.execute("DELETE FROM price_cache")
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.warning(f"Failed to clear price cache: {e}")
+
+
+def invalidate_cache(symbols: list):
+    """Drop cached quotes for specific ISINs / tickers (memory and persisted store)."""
+    keys = [f"yahoo_{s}" for s in symbols if s]
+    if not keys:
+        return
+    with _flush_lock, _cache_lock:
+        for k in keys:
+            _price_cache.pop(k, None)
+            _dirty_keys.discard(k)
+        try:
+            conn = _connect_cache_db()
+            try:
+                with conn:
+                    conn.executemany("DELETE FROM price_cache WHERE key = ?", [(k,) for k in keys])
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.warning(f"Failed to invalidate price cache: {e}")
+
+
+# ============================================================
+# PROVIDER RATE LIMITS (max concurrent requests per provider)
+# ============================================================
+QUOTE_WORKERS = int(os.getenv("PRICE_QUOTE_WORKERS", "8"))
+
+_provider_slots = {
+    'yahoo': threading.BoundedSemaphore(int(os.getenv("PRICE_YAHOO_CONCURRENCY", "6"))),
+    'alphavantage': threading.BoundedSemaphore(1),  # Free tier: 5 req/min
+    'coingecko': threading.BoundedSemaphore(2),
+}
 
 
 # ============================================================
@@ -229,71 +370,19 @@ def clean_ticker(ticker: str) -> str:
 # ============================================================
 # OPENFIGI - ISIN TO TICKER MAPPING
 # ============================================================
+from services.symbology_service import resolve_isin, resolve_isins
 
 def get_ticker_from_isin(isin: str) -> dict:
     """
     Use OpenFIGI API to get ticker information from ISIN.
-    Returns: {'ticker': str, 'exchange': str, 'name': str} or None
+    Returns: {'ticker': str, 'exchange': str, 'name': str, 'figi': str, 'yahoo_symbol': str} or None
     
-    OpenFIGI is Bloomberg's free FIGI lookup service.
+    OpenFIGI is Bloomberg's free FIGI lookup service. Results are persisted
+    by the symbology service (see services/symbology_service.py).
     """
     if not isin:
         return None
-    
-    # Check cache
-    cached_data, _ = _get_cached(_figi_cache, isin)
-    if cached_data:
-        return cached_data
-    
-    try:
-        url = "https://api.openfigi.com/v3/mapping"
-        headers = {"Content-Type": "application/json"}
-        
-        # Request mapping for this ISIN
-        payload = [{"idType": "ID_ISIN", "idValue": isin}]
-        
-        resp = requests.post(url, json=payload, headers=headers, timeout=10)
-        
-        if resp.status_code != 200:
-            return None
-        
-        data = resp.json()
-        if not data or not data[0].get('data'):
-            return None
-        
-        # Get first result (often multiple exchanges)
-        results = data[0]['data']
-        
-        # Prefer certain exchanges
-        preferred_exchanges = ['US', 'NA', 'LN', 'GY', 'IM', 'PA', 'MC', 'AS', 'SW', 'HK']
-        
-        best_match = None
-        for r in results:
-            ticker = r.get('ticker', '')
-            exchange = r.get('exchCode', '')
-            
-            if not best_match:
-                best_match = r
-            
-            # Prefer US stocks for ADRs
-            if exchange in preferred_exchanges:
-                best_match = r
-                break
-        
-        if best_match:
-            result = {
-                'ticker': best_match.get('ticker', ''),
-                'exchange': best_match.get('exchCode', ''),
-                'name': best_match.get('name', ''),
-                'figi': best_match.get('figi', ''),
-            }
-            _set_cached(_figi_cache, isin, result)
-            return result
-        
-    except Exception as e:
-        logger.debug(f"OpenFIGI error for {isin}: {e}")
-    
-    return None
+    return resolve_isin(isin)
 
 
 def isin_to_yahoo_ticker(isin: str, original_ticker: str = None, asset_type: str = None) -> str:
@@ -316,39 +405,9 @@ def isin_to_yahoo_ticker(isin: str, original_ticker: str = None, asset_type: str
     
     # *** PRIORITY: Try OpenFIGI first when ISIN is available ***
     figi_result = get_ticker_from_isin(isin)
-    if figi_result and figi_result.get('ticker'):
-        ticker = figi_result['ticker']
-        exchange = figi_result.get('exchange', '')
-        
-        exchange_suffixes = {
-            'IM': '.MI', 'MI': '.MI', # Milan
-            'GY': '.DE', 'DE': '.DE', 'ET': '.DE', # Germany
-            'LN': '.L',  'LO': '.L', # London
-            'PA': '.PA', 'FP': '.PA', # Paris
-            'AS': '.AS', 'NA': '.AS', # Amsterdam
-            'MC': '.MC', 'SM': '.MC', # Madrid
-            'SW': '.SW', 'VX': '.SW', # Swiss
-            'HK': '.HK', # Hong Kong
-            'TK': '.T',  'JP': '.T', # Tokyo
-            'CO': '.CO', 'DC': '.CO', # Copenhagen
-            'ST': '.ST', 'SS': '.ST', # Stockholm
-            'OL': '.OL', 'NO': '.OL', # Oslo
-            'HE': '.HE', 'FH': '.HE', # Helsinki
-        }
-        
-        # US exchanges don't need suffix in Yahoo
-        if exchange in ['US', 'UN', 'UQ', 'UA', 'UW', 'NA', 'OQ']:
-            if exchange == 'NA' and isin.startswith('NL'):
-                # Handle edge case where NA is Amsterdam but OpenFIGI mapped as North America (rare)
-                pass 
-            else:
-                logger.debug(f"ISIN {isin} -> {ticker} via OpenFIGI (US/NA)")
-                return ticker
-        
-        suffix = exchange_suffixes.get(exchange.upper(), '')
-        resolved = f"{ticker}{suffix}" if suffix else ticker
-        logger.debug(f"ISIN {isin} -> {resolved} via OpenFIGI (Exch: {exchange})")
-        return resolved
+    if figi_result and figi_result.get('yahoo_symbol'):
+        logger.debug(f"ISIN {isin} -> {figi_result['yahoo_symbol']} via OpenFIGI (Exch: {figi_result.get('exchange')})")
+        return figi_result['yahoo_symbol']
     
     # Fallback: Derive exchange from ISIN country prefix
     isin_prefix = isin[:2].upper() if isin else ''
@@ -469,9 +528,12 @@ def get_yahoo_price(ticker: str, isin: str = None) -> tuple:
         logger.info(f"Fetching {isin or ticker}: attempting {tickers_to_try}")
         
         for try_ticker in tickers_to_try:
-            stock = yf.Ticker(try_ticker)
-            # Fetch 5d to ensure we have previous close even on Mondays/Holidays
-            hist = stock.history(period="5d")
+            with _provider_slots['yahoo']:
+                stock = yf.Ticker(try_ticker)
+                # Fetch 5d to ensure we have previous close even on Mondays/Holidays
+                hist = stock.history(period="5d")
+                # One info round-trip per ticker (previous close fallback + currency)
+                info = (stock.info or {}) if not hist.empty else {}
             
             if not hist.empty:
                 current_close = Decimal(str(hist['Close'].iloc[-1]))
@@ -483,7 +545,7 @@ def get_yahoo_price(ticker: str, isin: str = None) -> tuple:
                 
                 # Fallback to stock.info if hist only has 1 row (market just opened) or hist prev is missing
                 if not prev_close or prev_close <= 0:
-                    info_prev = stock.info.get('regularMarketPreviousClose') or stock.info.get('previousClose')
+                    info_prev = info.get('regularMarketPreviousClose') or info.get('previousClose')
                     if info_prev:
                         prev_close = Decimal(str(info_prev))
                 
@@ -491,7 +553,7 @@ def get_yahoo_price(ticker: str, isin: str = None) -> tuple:
                 if prev_close and prev_close > 0:
                     change_pct = float((current_close - prev_close) / prev_close * 100)
                 
-                currency = stock.info.get('currency', 'USD')
+                currency = info.get('currency', 'USD')
                 
                 # Convert to EUR using Forex Service
                 fx_rate = get_exchange_rate(currency, 'EUR')
@@ -528,7 +590,8 @@ def get_alphavantage_price(ticker: str, api_key: str = None) -> tuple:
             "apikey": api_key
         }
         
-        resp = requests.get(url, params=params, timeout=10)
+        with _provider_slots['alphavantage']:
+            resp = requests.get(url, params=params, timeout=10)
         if resp.status_code != 200:
             return None, "AlphaVantage (error)", False, 0.0
         
@@ -553,10 +616,50 @@ def get_alphavantage_price(ticker: str, api_key: str = None) -> tuple:
         return None, "AlphaVantage (error)", False, 0.0
 
 
+# ============================================================
+# PRICE EVENTS (in-process bus, consumed by the alert engine)
+# ============================================================
+
+def _publish_price(ticker: str, price, source: str, change_pct: float = 0.0,
+                   isin: str = None, asset_type: str = None):
+    """Publish a fresh quote. Cached answers are not new ticks and are skipped."""
+    from services.event_bus import bus, PriceEvent, PRICE_TOPIC
+
+    if not price or "(cached)" in source or not bus.has_subscribers(PRICE_TOPIC):
+        return
+    bus.publish(PRICE_TOPIC, PriceEvent(
+        ticker=ticker.upper(), price=float(price), source=source,
+        asset_type=asset_type, isin=isin, change_pct=change_pct or 0.0,
+    ))
+
+
 # ============================================================
 # COINGECKO (crypto)
 # ============================================================
 
+def _coingecko_url(symbols: list):
+    """Build the batch /simple/price URL. Returns (id_map, url) or (None, None)."""
+    id_map = {CRYPTO_IDS[s.upper()]: s for s in symbols if s.upper() in CRYPTO_IDS}
+    if not id_map:
+        return None, None
+    ids_str = ','.join(id_map.keys())
+    url = f"https://api.coingecko.com/api/v3/simple/price?ids={ids_str}&vs_currencies=eur&include_24hr_change=true"
+    return id_map, url
+
+
+def _parse_coingecko(id_map: dict, data: dict) -> dict:
+    result = {}
+    for cg_id, symbol in id_map.items():
+        if cg_id in data and 'eur' in data[cg_id]:
+            result[symbol] = {
+                'price': Decimal(str(data[cg_id]['eur'])),
+                'change_24h': float(data[cg_id].get('eur_24h_change', 0.0))
+            }
+            _publish_price(symbol, result[symbol]['price'], 'CoinGecko',
+                           result[symbol]['change_24h'], asset_type='CRYPTO')
+    return result
+
+
 def get_coingecko_prices(symbols: list) -> dict:
     """
     Get crypto prices from CoinGecko.
@@ -566,26 +669,36 @@ def get_coingecko_prices(symbols: list) -> dict:
     # cache_key = "coingecko_batch"
     
     try:
-        id_map = {CRYPTO_IDS[s.upper()]: s for s in symbols if s.upper() in CRYPTO_IDS}
+        id_map, url = _coingecko_url(symbols)
         if not id_map:
             return {}
         
-        ids_str = ','.join(id_map.keys())
-        url = f"https://api.coingecko.com/api/v3/simple/price?ids={ids_str}&vs_currencies=eur&include_24hr_change=true"
+        with _provider_slots['coingecko']:
+            resp = requests.get(url, timeout=10)
+        if resp.status_code != 200:
+            return {}
+        
+        return _parse_coingecko(id_map, resp.json())
         
-        resp = requests.get(url, timeout=10)
+    except Exception as e:
+        logger.debug(f"CoinGecko error: {e}")
+        return {}
+
+
+async def get_coingecko_prices_async(symbols: list) -> dict:
+    """Async variant of get_coingecko_prices over the shared httpx client."""
+    from services.async_runtime import get_http_client
+    
+    try:
+        id_map, url = _coingecko_url(symbols)
+        if not id_map:
+            return {}
+        
+        resp = await get_http_client().get(url, timeout=10)
         if resp.status_code != 200:
             return {}
         
-        data = resp.json()
-        result = {}
-        for cg_id, symbol in id_map.items():
-            if cg_id in data and 'eur' in data[cg_id]:
-                result[symbol] = {
-                    'price': Decimal(str(data[cg_id]['eur'])),
-                    'change_24h': float(data[cg_id].get('eur_24h_change', 0.0))
-                }
-        return result
+        return _parse_coingecko(id_map, resp.json())
         
     except Exception as e:
         logger.debug(f"CoinGecko error: {e}")
@@ -624,16 +737,19 @@ def get_price(ticker: str, isin: str, asset_type: str,
         if isin:
             price, source, success, change = get_yahoo_price(ticker, isin)
             if success and price:
+                _publish_price(ticker, price, source, change, isin, asset_type)
                 return price, source, True, change
         
         # 2. Yahoo Ticker
         price, source, success, change = get_yahoo_price(ticker)
         if success and price:
+            _publish_price(ticker, price, source, change, isin, asset_type)
             return price, source, True, change
         
         # 3. AlphaVantage
         price, source, success, change = get_alphavantage_price(ticker)
         if success and price:
+            _publish_price(ticker, price, source, change, isin, asset_type)
             return price, source, True, change
     
     # FALLBACK
@@ -664,13 +780,102 @@ def get_live_price_for_ticker(ticker: str, asset_type: str = "STOCK") -> dict:
     return None
 
 
+# ============================================================
+# QUOTE ENGINE (distinct symbols, bounded concurrency)
+# ============================================================
+
+def _quote_key(h: dict) -> tuple:
+    """
+    Dedup key for a holding's quote.
+    Holdings sharing the same ISIN across brokers resolve to one quote.
+    """
+    asset_type = h.get('asset_type', '')
+    isin = h.get('isin')
+    if isin:
+        return (asset_type, isin.upper())
+    return (asset_type, (h.get('ticker') or '').upper())
+
+
+def fetch_quotes(holdings: list, crypto_data: dict = None, max_workers: int = None) -> dict:
+    """
+    Fetch live quotes for the distinct symbol set of the given holdings.
+    
+    Symbols are deduplicated first (see _quote_key), then fetched in a bounded
+    worker pool; per-provider limits are enforced by _provider_slots.
+    The DB fallback is NOT applied here (it depends on each holding's own
+    purchase price), see _apply_fallback.
+    Crypto holdings are quoted in ONE batched CoinGecko call, unless the caller
+    already fetched them (`crypto_data`, see get_coingecko_prices).
+    
+    Returns dict: quote_key -> (price_eur, source_string, is_live_bool, change_pct_1d)
+    """
+    if crypto_data is None:
+        crypto_tickers = list(dict.fromkeys(
+            h.get('ticker') for h in holdings if h.get('asset_type') == 'CRYPTO' and h.get('ticker')
+        ))
+        crypto_data = get_coingecko_prices(crypto_tickers) if crypto_tickers else {}
+    
+    # 1. Resolve distinct symbol set (batched crypto quotes go straight in)
+    crypto_quotes = {}
+    symbols = {}
+    for h in holdings:
+        asset_type = h.get('asset_type', '')
+        ticker = h.get('ticker', '')
+        if asset_type == 'CASH':
+            continue
+        if asset_type == 'CRYPTO' and ticker in crypto_data:
+            quote = crypto_data[ticker]
+            crypto_quotes[_quote_key(h)] = (quote['price'], 'CoinGecko', True, quote['change_24h'])
+            continue
+        key = _quote_key(h)
+        if key not in symbols:
+            symbols[key] = (ticker, h.get('isin'), asset_type)
+    
+    if not symbols:
+        return crypto_quotes
+    
+    # Resolve the whole ISIN universe up front (batched OpenFIGI jobs, persisted)
+    resolve_isins([isin for _, isin, _ in symbols.values() if isin])
+    
+    # 2. Fetch in bulk with bounded concurrency
+    workers = max(1, min(max_workers or QUOTE_WORKERS, len(symbols)))
+    
+    def _fetch(item):
+        key, (ticker, isin, asset_type) = item
+        try:
+            return key, get_price(ticker, isin, asset_type, None)
+        except Exception as e:
+            logger.debug(f"Quote error for {ticker}: {e}")
+            return key, (Decimal('0'), 'NOT_FOUND', False, 0.0)
+    
+    if workers == 1:
+        return {**crypto_quotes, **dict(_fetch(item) for item in symbols.items())}
+    
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="quote") as pool:
+        quotes = dict(pool.map(_fetch, symbols.items()))
+    
+    logger.info(f"Quote engine: {len(quotes)} distinct symbols for {len(holdings)} holdings ({workers} workers)")
+    return {**crypto_quotes, **quotes}
+
+
+def _apply_fallback(quote: tuple, fallback_price: Decimal = None) -> tuple:
+    """Same fallback rules as get_price, applied per holding."""
+    price, source, is_live, change_pct = quote
+    if is_live and price:
+        return quote
+    if fallback_price and fallback_price > 0:
+        return fallback_price, 'FALLBACK:DB', False, 0.0
+    return Decimal('0'), 'NOT_FOUND', False, 0.0
+
+
 # ============================================================
 # BATCH PROCESSING FOR DASHBOARD
 # ============================================================
 
-def get_live_values_for_holdings(holdings: list) -> dict:
+def get_live_values_for_holdings(holdings: list, max_workers: int = None) -> dict:
     """
     Calculate live values, P&L, and Daily change.
+    Quotes are fetched once per distinct symbol via fetch_quotes.
     """
     result = {}
     
@@ -678,6 +883,9 @@ def get_live_values_for_holdings(holdings: list) -> dict:
     crypto_tickers = [h['ticker'] for h in holdings if h.get('asset_type') == 'CRYPTO']
     crypto_data = get_coingecko_prices(crypto_tickers) if crypto_tickers else {}
     
+    # Fetch every remaining distinct symbol concurrently
+    quotes = fetch_quotes(holdings, crypto_data, max_workers=max_workers)
+    
     # Pre-fetch exchange rates for all holding currencies
     all_currencies = list(set([h.get('currency', 'EUR') for h in holdings]))
     fx_rates = get_rates_for_currencies(all_currencies)
@@ -725,7 +933,8 @@ def get_live_values_for_holdings(holdings: list) -> dict:
             cost_basis = quantity * purchase_price_eur if purchase_price else Decimal('0')
             
         else:
-            live_price, source, is_live, day_change_pct = get_price(ticker, isin, asset_type, purchase_price)
+            quote = quotes.get(_quote_key(h), (None, 'NOT_FOUND', False, 0.0))
+            live_price, source, is_live, day_change_pct = _apply_fallback(quote, purchase_price)
             
             # ---------------------------------------------------------
             # SMART ADR LOGIC
@@ -792,6 +1001,8 @@ def get_live_values_for_holdings(holdings: list) -> dict:
             'currency': h_currency
         }
     
+    # Persist the whole refresh in one write
+    flush_price_cache()
     return result
 
 
@@ -0,0 +1,291 @@
+"""
+WAR ROOM - Risk Metrics
+Vectorised risk analytics on the daily NAV series (portfolio_snapshots).
+
+- Daily returns are flow-adjusted: the change in invested cost (total_cost)
+  is treated as a deposit/withdrawal, so buying more doesn't count as gain.
+- Every metric is one NumPy pass over the return array: rolling windows use
+  cumulative sums, drawdowns use np.maximum.accumulate.
+    rolling volatility / Sharpe / Sortino, drawdown curve + durations,
+    historical & parametric VaR / CVaR, beta vs each BENCHMARKS entry,
+    per-broker / per-asset-type return and risk contributions.
+- Results are cached per snapshot state (last date, count and value/cost sums).
+"""
+import os
+import logging
+import threading
+from datetime import date, timedelta
+from statistics import NormalDist
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+
+from db.database import SessionLocal
+from db.models import PortfolioSnapshot
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS = 252
+RISK_FREE_RATE = float(os.getenv("RISK_FREE_RATE", "0.04"))
+ROLLING_WINDOWS = (30, 90, 365)   # observations (snapshots are daily)
+VAR_LEVELS = (0.95, 0.99)
+MAX_CACHED = 32
+
+
+# ============================================================
+# VECTOR PRIMITIVES
+# ============================================================
+
+def flow_adjusted_returns(values: np.ndarray, costs: Optional[np.ndarray] = None) -> np.ndarray:
+    """r_t = (V_t - V_t-1 - flow_t) / V_t-1, flow = change in invested cost (NaN where V_t-1 <= 0)."""
+    values = np.asarray(values, dtype=float)
+    gain = np.diff(values)
+    if costs is not None:
+        gain = gain - np.diff(np.asarray(costs, dtype=float))
+    prev = values[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(prev > 0, gain / prev, np.nan)
+
+
+def rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    """Mean of the last `window` values (NaN until the window is full)."""
+    out = np.full(len(x), np.nan)
+    if len(x) >= window:
+        c = np.cumsum(np.insert(x, 0, 0.0))
+        out[window - 1:] = (c[window:] - c[:-window]) / window
+    return out
+
+
+def rolling_std(x: np.ndarray, window: int) -> np.ndarray:
+    """Sample std over the last `window` values from running sums of x and x²."""
+    mean = rolling_mean(x, window)
+    mean_sq = rolling_mean(x * x, window)
+    var = np.maximum(mean_sq - mean ** 2, 0.0) * window / max(window - 1, 1)
+    return np.sqrt(var)
+
+
+def rolling_ratios(returns: np.ndarray, window: int, rf: float = RISK_FREE_RATE,
+                   periods: float = TRADING_DAYS) -> Dict[str, np.ndarray]:
+    """Annualized rolling volatility, Sharpe and Sortino (`periods` returns per year)."""
+    excess = returns - rf / periods
+    mean = rolling_mean(excess, window)
+    vol = rolling_std(returns, window)
+    downside = np.sqrt(rolling_mean(np.minimum(excess, 0.0) ** 2, window))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(vol > 0, mean / vol * np.sqrt(periods), np.nan)
+        sortino = np.where(downside > 0, mean / downside * np.sqrt(periods), np.nan)
+    return {"volatility": vol * np.sqrt(periods), "sharpe": sharpe, "sortino": sortino}
+
+
+def drawdowns(returns: np.ndarray) -> Dict[str, np.ndarray]:
+    """Drawdown curve of the compounded returns and days since the last peak."""
+    wealth = np.cumprod(1.0 + np.insert(returns, 0, 0.0))
+    peak = np.maximum.accumulate(wealth)
+    dd = wealth / peak - 1.0
+    idx = np.arange(len(wealth))
+    last_peak = np.maximum.accumulate(np.where(dd >= 0, idx, 0))
+    return {"drawdown": dd, "duration": idx - last_peak}
+
+
+def value_at_risk(returns: np.ndarray, levels: Sequence[float] = VAR_LEVELS) -> Dict[str, Dict[str, float]]:
+    """1-day historical and parametric (normal) VaR / CVaR as positive loss fractions."""
+    out = {}
+    mu, sigma = returns.mean(), returns.std(ddof=1)
+    sorted_r = np.sort(returns)
+    for level in levels:
+        alpha = 1.0 - level
+        cut = np.quantile(sorted_r, alpha)
+        tail = sorted_r[sorted_r <= cut]
+        z = NormalDist().inv_cdf(alpha)
+        out[f"{int(level * 100)}"] = {
+            "historical_var": -cut,
+            "historical_cvar": -tail.mean() if len(tail) else -cut,
+            "parametric_var": -(mu + z * sigma),
+            "parametric_cvar": -(mu - sigma * NormalDist().pdf(z) / alpha),
+        }
+    return out
+
+
+def beta(returns: np.ndarray, market: np.ndarray) -> Optional[float]:
+    """OLS beta over the days both series have a return."""
+    mask = ~(np.isnan(returns) | np.isnan(market))
+    if mask.sum() < 10:
+        return None
+    r, m = returns[mask], market[mask]
+    var = m.var(ddof=1)
+    return float(np.cov(r, m, ddof=1)[0, 1] / var) if var > 0 else None
+
+
+def contributions(group_values: np.ndarray, total_values: np.ndarray, labels: List[str]) -> Dict[str, Dict]:
+    """
+    Per-group share of portfolio return and risk.
+    group_values: dates × groups values; each group's daily contribution is ΔV_g / V_total(t-1).
+    Risk share = cov(contribution_g, portfolio return) / var(portfolio return) (sums to 100%).
+    Breakdowns carry no per-group cost, so these are not flow-adjusted.
+    """
+    prev = total_values[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        contrib = np.diff(group_values, axis=0) / prev[:, None]
+    contrib = contrib[prev > 0]
+    if len(contrib) < 2:
+        return {}
+    port = contrib.sum(axis=1)
+    centered = contrib - contrib.mean(axis=0)
+    port_var = port.var(ddof=1)
+    risk = centered.T @ (port - port.mean()) / (len(port) - 1) / port_var if port_var > 0 else np.zeros(len(labels))
+    total_return = contrib.sum(axis=0)
+    return {
+        label: {"return_contribution_pct": round(float(total_return[i]) * 100, 2),
+                "risk_contribution_pct": round(float(risk[i]) * 100, 2)}
+        for i, label in enumerate(labels)
+    }
+
+
+def _tail(series: np.ndarray, digits: int = 4):
+    """Last finite value, rounded (None if the window never filled)."""
+    finite = series[np.isfinite(series)]
+    return round(float(finite[-1]), digits) if len(finite) else None
+
+
+# ============================================================
+# PORTFOLIO
+# ============================================================
+
+def _breakdown_matrix(rows: List[Optional[dict]]) -> tuple:
+    frame = pd.DataFrame([r or {} for r in rows]).fillna(0.0)
+    return frame.to_numpy(dtype=float), [str(c) for c in frame.columns]
+
+
+def compute_risk_metrics(dates: np.ndarray, values: np.ndarray, costs: np.ndarray,
+                         broker_rows: Optional[List[dict]] = None, asset_rows: Optional[List[dict]] = None,
+                         benchmarks: Optional[Dict[str, pd.Series]] = None, rf: float = RISK_FREE_RATE,
+                         windows: Sequence[int] = ROLLING_WINDOWS) -> Dict:
+    """All metrics for one NAV series (dates ascending). Pure function of its inputs."""
+    returns = flow_adjusted_returns(values, costs)
+    valid = np.isfinite(returns)
+    r = np.where(valid, returns, 0.0)
+    clean = returns[valid]
+    if len(clean) < 2:
+        return {"sharpe_ratio": None, "volatility": None, "max_drawdown": None,
+                "message": "Insufficient return data"}
+
+    # Snapshots are calendar-daily (weekends included): annualize by the observed frequency
+    span_days = (pd.Timestamp(dates[-1]) - pd.Timestamp(dates[0])).days
+    periods = len(returns) * 365.25 / span_days if span_days > 0 else TRADING_DAYS
+    ann_vol = clean.std(ddof=1) * np.sqrt(periods)
+    ann_ret = clean.mean() * periods
+    downside = np.sqrt(np.mean(np.minimum(clean - rf / periods, 0.0) ** 2)) * np.sqrt(periods)
+
+    dd = drawdowns(r)
+    trough = int(np.argmin(dd["drawdown"]))
+
+    rolling = {}
+    for w in windows:
+        if len(r) >= w:
+            ratios = rolling_ratios(r, w, rf, periods)
+            rolling[f"{w}d"] = {k: _tail(v) for k, v in ratios.items()}
+
+    betas = {}
+    if benchmarks:
+        index = pd.DatetimeIndex(dates[1:])
+        for name, closes in benchmarks.items():
+            market = closes.reindex(index.union(closes.index)).ffill().pct_change().reindex(index)
+            b = beta(returns, market.to_numpy(dtype=float))
+            betas[name] = round(b, 3) if b is not None else None
+
+    result = {
+        "sharpe_ratio": round(float((ann_ret - rf) / ann_vol), 2) if ann_vol > 0 else 0,
+        "sortino_ratio": round(float((ann_ret - rf) / downside), 2) if downside > 0 else None,
+        "volatility": round(float(ann_vol) * 100, 2),               # As percentage
+        "annual_return": round(float(ann_ret) * 100, 2),
+        "max_drawdown": round(float(-dd["drawdown"].min()) * 100, 2),  # As percentage
+        "max_drawdown_date": str(pd.Timestamp(dates[trough]).date()),
+        "max_drawdown_duration_days": int(dd["duration"].max()),
+        "current_drawdown": round(float(-dd["drawdown"][-1]) * 100, 2),
+        "current_drawdown_days": int(dd["duration"][-1]),
+        "var": {k: {m: round(float(v) * 100, 2) for m, v in d.items()} for k, d in value_at_risk(clean).items()},
+        "rolling": rolling,
+        "beta": betas,
+        "risk_free_rate": rf,
+        "data_points": len(values),
+        "period_days": int(span_days),
+    }
+    if broker_rows:
+        matrix, labels = _breakdown_matrix(broker_rows)
+        result["by_broker"] = contributions(matrix, values, labels)
+    if asset_rows:
+        matrix, labels = _breakdown_matrix(asset_rows)
+        result["by_asset_type"] = contributions(matrix, values, labels)
+    return result
+
+
+class RiskMetricsService:
+    """Loads the NAV series once per as-of date and caches the computed metrics."""
+
+    def __init__(self, session_factory=SessionLocal):
+        self._session_factory = session_factory
+        self._lock = threading.Lock()
+        self._cache: Dict[tuple, Dict] = {}
+
+    def _benchmarks(self, start: date, end: date) -> Dict[str, pd.Series]:
+        from services.analytics_service import BENCHMARKS
+        from services.price_history import get_history
+
+        closes = get_history(BENCHMARKS.values(), start - timedelta(days=7), end)
+        return {name: closes[sym].dropna() for name, sym in BENCHMARKS.items() if sym in closes.columns}
+
+    def get(self, days: int = 365, rf: float = RISK_FREE_RATE) -> Dict:
+        session = self._session_factory()
+        try:
+            # Content sums catch in-place rewrites (today's snapshot re-saved,
+            # backfill overwrites) that leave the max date and the count unchanged
+            as_of, count, value_sum, cost_sum = session.execute(
+                select(func.max(PortfolioSnapshot.snapshot_date), func.count(),
+                       func.sum(PortfolioSnapshot.total_value), func.sum(PortfolioSnapshot.total_cost))
+            ).one()
+            key = (as_of, count, value_sum, cost_sum, days, rf)
+            with self._lock:
+                if key in self._cache:
+                    return self._cache[key]
+
+            cutoff = (as_of or date.today()) - timedelta(days=days)
+            rows = session.execute(
+                select(PortfolioSnapshot.snapshot_date, PortfolioSnapshot.total_value, PortfolioSnapshot.total_cost,
+                       PortfolioSnapshot.broker_breakdown, PortfolioSnapshot.asset_breakdown)
+                .where(PortfolioSnapshot.snapshot_date >= cutoff)
+                .order_by(PortfolioSnapshot.snapshot_date)
+            ).all()
+        finally:
+            session.close()
+
+        if len(rows) < 2:
+            return {
+                "sharpe_ratio": None,
+                "volatility": None,
+                "max_drawdown": None,
+                "message": "Insufficient data (need at least 2 snapshots)"
+            }
+
+        dates = np.array([pd.Timestamp(r[0]) for r in rows], dtype="datetime64[ns]")
+        values = np.array([float(r[1]) for r in rows])
+        costs = np.array([float(r[2] or 0) for r in rows])
+        try:
+            benchmarks = self._benchmarks(rows[0][0], rows[-1][0])
+        except Exception as e:
+            logger.warning(f"[RISK] Benchmarks unavailable: {e}")
+            benchmarks = {}
+
+        result = compute_risk_metrics(dates, values, costs, [r[3] for r in rows], [r[4] for r in rows],
+                                      benchmarks, rf)
+        result["as_of"] = str(as_of)
+        with self._lock:
+            if len(self._cache) >= MAX_CACHED:
+                self._cache.clear()
+            self._cache[key] = result
+        return result
+
+
+# Singleton
+risk_metrics_service = RiskMetricsService()
@@ -2,13 +2,19 @@
 WAR ROOM - Scheduled Tasks Service
 Uses APScheduler for automated background jobs.
 """
+import os
 import logging
 from datetime import datetime
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+
+from services.async_runtime import run_blocking
 
 logger = logging.getLogger(__name__)
 
+CRYPTO_POLL_SECONDS = int(os.getenv("CRYPTO_POLL_SECONDS", "60"))
+
 # Global scheduler instance
 scheduler = AsyncIOScheduler()
 
@@ -21,14 +27,23 @@ async def scheduled_intelligence_scan():
     
     try:
         # Build portfolio context
-        holdings = get_all_holdings()
+        holdings = await run_blocking(get_all_holdings)
         tickers = ", ".join([h.get('ticker', '') for h in holdings[:15]]) if holdings else ""
         context = f"Portfolio: {tickers}"
         
-        engine = IntelligenceEngine(portfolio_context=context)
-        new_items = engine.run_cycle()
+        # The scan (scrapers + LLM) is blocking: keep it off the event loop
+        engine = await run_blocking(IntelligenceEngine, portfolio_context=context)
+        new_items = await run_blocking(engine.run_cycle)
         
         logger.info(f"[SCHEDULER] Scan complete. Found {len(new_items)} new items.")
+        scan = engine.last_scan or {}
+        for report in scan.get("sources", []):
+            logger.info(
+                f"[SCHEDULER]   {report['kind']:<7} {report['source']:<30} {report['status']:<12} "
+                f"{report['items']:>3} items  {report['seconds']}s"
+            )
+        if scan.get("scoring"):
+            logger.info(f"[SCHEDULER]   scoring: {scan['scoring']}")
         return len(new_items)
     except Exception as e:
         logger.error(f"[SCHEDULER] Scan failed: {e}")
@@ -65,6 +80,15 @@ def setup_scheduled_jobs():
         replace_existing=True
     )
     
+    # Crypto trades 24/7: poll CoinGecko for alert tickers, quotes reach the alerts as bus events
+    scheduler.add_job(
+        scheduled_crypto_poll,
+        IntervalTrigger(seconds=CRYPTO_POLL_SECONDS),
+        id="crypto_poll",
+        name=f"Crypto Price Poll (every {CRYPTO_POLL_SECONDS}s)",
+        replace_existing=True
+    )
+    
     # Daily portfolio snapshot at 22:00 CET (after market close)
     scheduler.add_job(
         scheduled_daily_snapshot,
@@ -83,7 +107,16 @@ def setup_scheduled_jobs():
         replace_existing=True
     )
     
-    logger.info("[SCHEDULER] Scheduled jobs configured: 08:00/18:00 scans, 08:00 Telegram report, 5-min alerts, 22:00 snapshot")
+    # Nightly price history top-up at 23:30 CET (US close included)
+    scheduler.add_job(
+        scheduled_price_history_topup,
+        CronTrigger(hour=23, minute=30),
+        id="price_history_topup",
+        name="Price History Top-up",
+        replace_existing=True
+    )
+    
+    logger.info("[SCHEDULER] Scheduled jobs configured: 08:00/18:00 scans, 08:00 Telegram report, 5-min alerts, crypto poll, 22:00 snapshot, 23:30 price history")
 
 
 async def scheduled_alert_check():
@@ -101,20 +134,61 @@ async def scheduled_alert_check():
         return 0
 
 
+async def scheduled_crypto_poll():
+    """Quotes crypto alert tickers; live alerts react to the published ticks."""
+    from services.alert_engine import alert_book, crypto_alert_tickers
+    from services.price_service_v5 import get_coingecko_prices_async
+    
+    try:
+        await alert_book.ensure_loaded()
+        symbols = crypto_alert_tickers()
+        if symbols:
+            await get_coingecko_prices_async(symbols)
+        return len(symbols)
+    except Exception as e:
+        logger.error(f"[SCHEDULER] Crypto poll failed: {e}")
+        return 0
+
+
 async def scheduled_daily_snapshot():
     """Saves a daily portfolio snapshot at 22:00."""
     from services.analytics_service import save_daily_snapshot
     
     logger.info(f"[SCHEDULER] Saving daily portfolio snapshot...")
     try:
-        result = save_daily_snapshot()
+        result = await run_blocking(save_daily_snapshot)
         logger.info(f"[SCHEDULER] Snapshot saved: {result}")
+        
+        # Fill any missing past days from the transaction replay (incremental, live days untouched)
+        from services.nav_engine import nav_engine
+        filled = await run_blocking(nav_engine.backfill_snapshots)
+        if filled:
+            logger.info(f"[SCHEDULER] NAV backfill wrote {filled} missing day(s)")
         return result
     except Exception as e:
         logger.error(f"[SCHEDULER] Snapshot failed: {e}")
         return None
 
 
+async def scheduled_price_history_topup():
+    """Extends the local price history (benchmarks + every stored symbol) to today at 23:30."""
+    from services.price_history import top_up
+    from services.analytics_service import BENCHMARKS
+    
+    logger.info(f"[SCHEDULER] Topping up price history...")
+    try:
+        count = await run_blocking(top_up, BENCHMARKS.values())
+        logger.info(f"[SCHEDULER] Price history topped up: {count} symbols downloaded")
+        
+        # Roll the live correlation states forward by the new close
+        from services.covariance_engine import covariance_engine
+        await run_blocking(covariance_engine.advance_all)
+        return count
+    except Exception as e:
+        logger.error(f"[SCHEDULER] Price history top-up failed: {e}")
+        return 0
+
+
 async def scheduled_daily_telegram_report():
     """Sends daily morning portfolio report via Telegram at 08:00."""
     from services.telegram_notifier import send_daily_portfolio_report
@@ -125,10 +199,10 @@ async def scheduled_daily_telegram_report():
     logger.info(f"[SCHEDULER] Preparing daily Telegram report...")
     try:
         # Get latest snapshot for P&L comparison
-        snapshot = get_latest_snapshot()
+        snapshot = await run_blocking(get_latest_snapshot)
         
         # Get current holdings for top mover calculation
-        holdings = get_all_holdings()
+        holdings = await run_blocking(get_all_holdings)
         
         if not holdings:
             logger.warning("[SCHEDULER] No holdings found for daily report.")
@@ -0,0 +1,283 @@
+"""
+WAR ROOM - Symbology Service
+Persistent ISIN -> (FIGI, ticker, exchange, Yahoo symbol) resolution.
+
+- Backed by SQLite (data/symbology.db) with an in-memory layer in front.
+- Long TTL for resolved ISINs, shorter TTL for negative results (unknown ISINs).
+- Misses are resolved in bulk through OpenFIGI mapping jobs (many ISINs per POST).
+
+Single resolver used by price_service_v5 (isin_to_yahoo_ticker, resolve_asset_info),
+market_data_service and analytics_service.
+"""
+import os
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+SYMBOLOGY_DB = os.path.join(str(Path(__file__).parent.parent), "data", "symbology.db")
+OPENFIGI_URL = "https://api.openfigi.com/v3/mapping"
+OPENFIGI_API_KEY = os.getenv("OPENFIGI_API_KEY")
+
+POSITIVE_TTL = timedelta(days=30)  # ISIN -> listing mappings rarely change
+NEGATIVE_TTL = timedelta(days=3)   # Retry unknown ISINs every few days
+
+# OpenFIGI limits: 10 jobs/request without key, 100 with key
+BATCH_SIZE = 100 if OPENFIGI_API_KEY else 10
+
+# Prefer certain exchanges when OpenFIGI returns several listings
+PREFERRED_EXCHANGES = ['US', 'NA', 'LN', 'GY', 'IM', 'PA', 'MC', 'AS', 'SW', 'HK']
+
+# Bloomberg exchange code -> Yahoo suffix
+EXCHANGE_SUFFIXES = {
+    'IM': '.MI', 'MI': '.MI', # Milan
+    'GY': '.DE', 'DE': '.DE', 'ET': '.DE', # Germany
+    'LN': '.L',  'LO': '.L', # London
+    'PA': '.PA', 'FP': '.PA', # Paris
+    'AS': '.AS', 'NA': '.AS', # Amsterdam
+    'MC': '.MC', 'SM': '.MC', # Madrid
+    'SW': '.SW', 'VX': '.SW', # Swiss
+    'HK': '.HK', # Hong Kong
+    'TK': '.T',  'JP': '.T', # Tokyo
+    'CO': '.CO', 'DC': '.CO', # Copenhagen
+    'ST': '.ST', 'SS': '.ST', # Stockholm
+    'OL': '.OL', 'NO': '.OL', # Oslo
+    'HE': '.HE', 'FH': '.HE', # Helsinki
+}
+
+# US exchanges don't need suffix in Yahoo
+US_EXCHANGES = ['US', 'UN', 'UQ', 'UA', 'UW', 'NA', 'OQ']
+
+_lock = threading.RLock()
+_memory: Dict[str, dict] = {}  # isin -> record (found=False for negative entries)
+_openfigi_slot = threading.BoundedSemaphore(2)
+
+
+def _connect():
+    os.makedirs(os.path.dirname(SYMBOLOGY_DB), exist_ok=True)
+    conn = sqlite3.connect(SYMBOLOGY_DB, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS isin_map ("
+        " isin TEXT PRIMARY KEY,"
+        " found INTEGER NOT NULL,"
+        " figi TEXT, ticker TEXT, exchange TEXT, name TEXT, yahoo_symbol TEXT,"
+        " updated_at REAL NOT NULL)"
+    )
+    return conn
+
+
+def figi_to_yahoo_symbol(ticker: str, exchange: str, isin: str = None) -> str:
+    """Convert an OpenFIGI (ticker, exchCode) pair to Yahoo Finance format."""
+    if not ticker:
+        return ticker
+    exchange = (exchange or '').upper()
+
+    if exchange in US_EXCHANGES:
+        # Edge case: NA is Amsterdam for Dutch ISINs, not North America
+        if not (exchange == 'NA' and isin and isin.startswith('NL')):
+            return ticker
+
+    suffix = EXCHANGE_SUFFIXES.get(exchange, '')
+    return f"{ticker}{suffix}" if suffix else ticker
+
+
+def _pick_listing(results: List[dict]) -> Optional[dict]:
+    """Pick the best listing among OpenFIGI results (first preferred exchange, else first)."""
+    best_match = None
+    for r in results:
+        if not best_match:
+            best_match = r
+        if r.get('exchCode', '') in PREFERRED_EXCHANGES:
+            return r
+    return best_match
+
+
+def _is_fresh(record: dict) -> bool:
+    ttl = POSITIVE_TTL if record['found'] else NEGATIVE_TTL
+    return datetime.now() - record['updated_at'] < ttl
+
+
+def _row_to_record(row) -> dict:
+    isin, found, figi, ticker, exchange, name, yahoo_symbol, updated_at = row
+    return {
+        'isin': isin,
+        'found': bool(found),
+        'figi': figi or '',
+        'ticker': ticker or '',
+        'exchange': exchange or '',
+        'name': name or '',
+        'yahoo_symbol': yahoo_symbol or '',
+        'updated_at': datetime.fromtimestamp(updated_at),
+    }
+
+
+def _load_from_db(isins: List[str]) -> Dict[str, dict]:
+    if not isins:
+        return {}
+    loaded = {}
+    try:
+        conn = _connect()
+        try:
+            # SQLite default max variables is 999
+            for i in range(0, len(isins), 500):
+                chunk = isins[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    "SELECT isin, found, figi, ticker, exchange, name, yahoo_symbol, updated_at "
+                    f"FROM isin_map WHERE isin IN ({placeholders})", chunk
+                ).fetchall()
+                for row in rows:
+                    record = _row_to_record(row)
+                    loaded[record['isin']] = record
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning(f"[SYMBOLOGY] Failed to read store: {e}")
+    return loaded
+
+
+def _save_to_db(records: List[dict]):
+    if not records:
+        return
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO isin_map "
+                    "(isin, found, figi, ticker, exchange, name, yahoo_symbol, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(r['isin'], int(r['found']), r['figi'], r['ticker'], r['exchange'],
+                      r['name'], r['yahoo_symbol'], r['updated_at'].timestamp()) for r in records]
+                )
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning(f"[SYMBOLOGY] Failed to write store: {e}")
+
+
+def _openfigi_headers() -> dict:
+    headers = {"Content-Type": "application/json"}
+    if OPENFIGI_API_KEY:
+        headers["X-OPENFIGI-APIKEY"] = OPENFIGI_API_KEY
+    return headers
+
+
+def _parse_jobs(chunk: List[str], jobs: List[dict], now: datetime) -> List[dict]:
+    """Turn one OpenFIGI mapping response (jobs in request order) into store records."""
+    records = []
+    for isin, job in zip(chunk, jobs):
+        if job.get('error'):
+            continue
+        best = _pick_listing(job.get('data') or [])
+        if best:
+            ticker = best.get('ticker', '')
+            exchange = best.get('exchCode', '')
+            records.append({
+                'isin': isin, 'found': True,
+                'figi': best.get('figi', ''),
+                'ticker': ticker,
+                'exchange': exchange,
+                'name': best.get('name', ''),
+                'yahoo_symbol': figi_to_yahoo_symbol(ticker, exchange, isin),
+                'updated_at': now,
+            })
+        else:
+            # "No identifier found." -> negative cache
+            records.append({
+                'isin': isin, 'found': False, 'figi': '', 'ticker': '', 'exchange': '',
+                'name': '', 'yahoo_symbol': '', 'updated_at': now,
+            })
+    return records
+
+
+def _fetch_openfigi(isins: List[str]) -> List[dict]:
+    """
+    Resolve ISINs through OpenFIGI in batched mapping jobs.
+    Returns records for every ISIN that got a definite answer (found or not found).
+    ISINs hit by HTTP/rate-limit errors are left out so they are retried later.
+    """
+    now = datetime.now()
+    records = []
+    for i in range(0, len(isins), BATCH_SIZE):
+        chunk = isins[i:i + BATCH_SIZE]
+        payload = [{"idType": "ID_ISIN", "idValue": isin} for isin in chunk]
+        try:
+            with _openfigi_slot:
+                resp = requests.post(OPENFIGI_URL, json=payload, headers=_openfigi_headers(), timeout=15)
+            if resp.status_code != 200:
+                logger.warning(f"[SYMBOLOGY] OpenFIGI HTTP {resp.status_code} for {len(chunk)} ISINs")
+                continue
+            records.extend(_parse_jobs(chunk, resp.json(), now))
+        except Exception as e:
+            logger.debug(f"[SYMBOLOGY] OpenFIGI error: {e}")
+            continue
+
+    logger.info(f"[SYMBOLOGY] OpenFIGI resolved {len(records)}/{len(isins)} ISINs")
+    return records
+
+
+def _lookup_cached(wanted: List[str]) -> Dict[str, dict]:
+    """Fresh records from memory, then disk (promoted to memory)."""
+    with _lock:
+        found = {i: _memory[i] for i in wanted if i in _memory and _is_fresh(_memory[i])}
+        missing = [i for i in wanted if i not in found]
+        for isin, record in _load_from_db(missing).items():
+            if _is_fresh(record):
+                _memory[isin] = record
+                found[isin] = record
+    return found
+
+
+def _store(records: List[dict]):
+    _save_to_db(records)
+    with _lock:
+        for record in records:
+            _memory[record['isin']] = record
+
+
+def _normalize(isins: List[str]) -> List[str]:
+    return list(dict.fromkeys(i.strip().upper() for i in isins if i))
+
+
+def _public_view(wanted: List[str], found: Dict[str, dict]) -> Dict[str, Optional[dict]]:
+    return {i: (found[i] if i in found and found[i]['found'] else None) for i in wanted}
+
+
+def resolve_isins(isins: List[str]) -> Dict[str, Optional[dict]]:
+    """
+    Bulk resolve ISINs. Returns isin -> record, or None if unknown/unresolved.
+    Record: {'isin', 'figi', 'ticker', 'exchange', 'name', 'yahoo_symbol', ...}
+    """
+    wanted = _normalize(isins)
+    if not wanted:
+        return {}
+
+    found = _lookup_cached(wanted)
+    missing = [i for i in wanted if i not in found]
+    if missing:
+        fetched = _fetch_openfigi(missing)
+        _store(fetched)
+        found.update({r['isin']: r for r in fetched})
+
+    return _public_view(wanted, found)
+
+
+def resolve_isin(isin: str) -> Optional[dict]:
+    """Resolve a single ISIN (see resolve_isins)."""
+    if not isin:
+        return None
+    return resolve_isins([isin]).get(isin.strip().upper())
+
+
+def clear_memory():
+    """Drop the in-memory layer (the persistent store is kept)."""
+    with _lock:
+        _memory.clear()
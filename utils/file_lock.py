@@ -0,0 +1,38 @@
+import os
+import time
+from contextlib import contextmanager
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Exclusive inter-process lock held on `path` (created if missing) for the
+    duration of the block. Blocks until acquired.
+    Locks are per open file, so two handles in the same process exclude each other
+    too; the lock is not re-entrant.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if os.name == 'nt':
+            import msvcrt
+            while True:
+                try:
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after ~10s: keep waiting
+                    time.sleep(0.1)
+            try:
+                yield
+            finally:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)